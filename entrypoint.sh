@@ -2,4 +2,9 @@
 
 
 python ./manage.py migrate
+# Metrics files of the previous run would be aggregated with the new workers
+if [ -n "$PROMETHEUS_MULTIPROC_DIR" ]; then
+  rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+  mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+fi
 exec $@
\ No newline at end of file
@@ -0,0 +1,115 @@
+"""
+Native async versions of the read endpoints, served next to the sync viewsets under ASGI.
+
+They answer the same query parameters with the same payload as their sync counterparts,
+but wait on the cache inside the event loop and only hand the database work to a thread.
+"""
+import functools
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions, status
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.views import exception_handler
+
+from resvy.query_budget import query_budget
+from .availability import acheck_availability_for_dates
+from .catalog import aget_table_catalog
+from .renderers import ORJSONRenderer
+from .row_serializers import table_availability_data
+from .serializers import AvailabilityDateRangeSerializer
+from .views import ReservationView
+
+
+def render(data, status_code=status.HTTP_200_OK):
+    return HttpResponse(ORJSONRenderer().render(data), status=status_code, content_type='application/json')
+
+
+def _get_authenticators():
+    return [authentication_class() for authentication_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+
+
+def _authenticate(request, permission):
+    for authenticator in _get_authenticators():
+        result = authenticator.authenticate(request)
+        if result is not None:
+            break
+    else:
+        raise exceptions.NotAuthenticated()
+    user, _token = result
+    if not user.has_perm(permission):
+        raise exceptions.PermissionDenied()
+    return user
+
+
+def _handle_exception(request, exc: exceptions.APIException):
+    response = render(exception_handler(exc, {'request': request}).data, exc.status_code)
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        response['WWW-Authenticate'] = _get_authenticators()[0].authenticate_header(request)
+    return response
+
+
+def async_api_view(permission):
+    """
+    Make an async view behave like the GET handler of a DRF view requiring `permission`.
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapped(request, *args, **kwargs):
+            try:
+                if request.method != 'GET':
+                    raise exceptions.MethodNotAllowed(request.method)
+                request.user = await sync_to_async(_authenticate)(request, permission)
+                return await view(request, *args, **kwargs)
+            except exceptions.APIException as exc:
+                return _handle_exception(request, exc)
+        return wrapped
+    return decorator
+
+
+@query_budget(5)
+@async_api_view('reservations.can_manage_tables')
+async def table_availability(request):
+    """
+    Async version of `TableView.availability`.
+    """
+    number_of_persons = request.GET.get('number_of_persons', 'invalid')
+    if not number_of_persons.isdigit():
+        return render(_('Only digits are acceptable'), status.HTTP_400_BAD_REQUEST)
+
+    catalog = await aget_table_catalog()
+    fit_table_size = catalog.fit_table_size(int(number_of_persons))
+    if fit_table_size is None:
+        return render(_('There are no tables fit this number on one table'), status.HTTP_400_BAD_REQUEST)
+
+    date_range = AvailabilityDateRangeSerializer(data=request.GET)
+    date_range.is_valid(raise_exception=True)
+    dates = date_range.validated_data['dates']
+
+    tables = catalog.get_tables(fit_table_size)
+    availability = await acheck_availability_for_dates(tables, dates)
+
+    data = []
+    for date in dates:
+        data.extend(table_availability_data(tables, date, availability[date]))
+    return render(data)
+
+
+def _list_reservations(request: Request):
+    view = ReservationView(request=request, args=(), kwargs={}, format_kwarg=None, action='list')
+    return view.list(request).data
+
+
+# Same budget as `ReservationView.list`
+@query_budget(6)
+@async_api_view('reservations.can_manage_reservation')
+async def reservation_list(request):
+    """
+    Async version of `ReservationView.list`, filtering, ordering and both pagination modes included.
+    """
+    drf_request = Request(request)
+    drf_request.user = request.user
+    return render(await sync_to_async(_list_reservations)(drf_request))
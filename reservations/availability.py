@@ -0,0 +1,313 @@
+import datetime
+import heapq
+import itertools
+import time
+from bisect import bisect_right
+from operator import itemgetter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+
+from reservations.cache import (
+    acquire_schedule_lock,
+    aget_cached_schedules,
+    cache_schedules,
+    get_cached_schedules,
+    get_stale_schedules,
+    release_schedule_locks,
+)
+from reservations.models import Reservation
+from reservations.utils import get_start_reservation_time
+from resvy.metrics import count_cache_lookups
+
+
+def get_availability_boundary(date=None):
+    """
+    Return the (start, end) time window in which tables can still be booked on `date`, today by default.
+
+    The start is the opening time for future dates and the current time for today,
+    dates in the past have no window at all.
+    """
+    today = timezone.now().date()
+    date = date or today
+    end_time = settings.RESERVATION_ENDS_AT_TIME
+    if date > today:
+        return settings.RESERVATION_STARTING_FROM_TIME, end_time
+    if date < today:
+        return end_time, end_time
+    return get_start_reservation_time(timezone.now().time()), end_time
+
+
+class TableSchedule:
+    """
+    Interval index of the reservations of one table on one date.
+
+    Busy intervals are kept as two parallel sorted lists of start and end times.
+    Overlapping or touching reservations are merged while building the index, so
+    both lists stay sorted and every lookup is a bisect instead of a linear scan.
+    """
+
+    def __init__(self, table_id, date, reservations=()):
+        self.table_id = table_id
+        self.date = date
+        self.starts = []
+        self.ends = []
+        for from_time, to_time in sorted(reservations):
+            if self.ends and from_time <= self.ends[-1]:
+                self.ends[-1] = max(self.ends[-1], to_time)
+            else:
+                self.starts.append(from_time)
+                self.ends.append(to_time)
+
+    @classmethod
+    def from_intervals(cls, table_id, date, starts, ends):
+        """
+        Rebuild a schedule from already merged and sorted start/end lists.
+        """
+        schedule = cls(table_id, date)
+        schedule.starts = list(starts)
+        schedule.ends = list(ends)
+        return schedule
+
+    def __len__(self):
+        return len(self.starts)
+
+    def overlaps(self, from_time, to_time) -> bool:
+        """
+        Check if [from_time, to_time) intersects any reservation in O(log n).
+        """
+        # First busy interval which ends after the requested window starts
+        index = bisect_right(self.ends, from_time)
+        return index < len(self.starts) and self.starts[index] < to_time
+
+    def is_available(self, from_time, to_time, start_time, end_time) -> bool:
+        """
+        Check if [from_time, to_time) lies within [start_time, end_time] and is not reserved.
+        """
+        return start_time <= from_time < to_time <= end_time and not self.overlaps(from_time, to_time)
+
+    def add(self, from_time, to_time):
+        """
+        Insert a reservation which does not overlap the schedule, keeping both lists sorted.
+        """
+        index = bisect_right(self.ends, from_time)
+        self.starts.insert(index, from_time)
+        self.ends.insert(index, to_time)
+
+    def free_slots(self, start_time, end_time):
+        """
+        Return the free (from_time, to_time) gaps between start_time and end_time.
+        """
+        slots = []
+        cursor = start_time
+        for index in range(bisect_right(self.ends, start_time), len(self.starts)):
+            if self.starts[index] >= end_time:
+                break
+            if self.starts[index] > cursor:
+                slots.append((cursor, self.starts[index]))
+            cursor = max(cursor, self.ends[index])
+        if cursor < end_time:
+            slots.append((cursor, end_time))
+        return slots
+
+
+def query_schedules(table_dates):
+    """
+    Build the schedules of the given (table id, date) pairs from the database with a single query.
+    """
+    table_ids = {table_id for table_id, _ in table_dates}
+    dates = {date for _, date in table_dates}
+    reservations = Reservation.objects.filter(
+        table_id__in=table_ids, date__in=dates
+    ).order_by('table_id', 'date', 'from_time').values_list('table_id', 'date', 'from_time', 'to_time')
+
+    grouped = {
+        table_date: [(from_time, to_time) for _, _, from_time, to_time in rows]
+        for table_date, rows in itertools.groupby(reservations, key=itemgetter(0, 1))
+    }
+    return {
+        (table_id, date): TableSchedule(table_id, date, grouped.get((table_id, date), ()))
+        for table_id, date in table_dates
+    }
+
+
+def _query_and_cache_schedules(table_dates, versions):
+    schedules = query_schedules(table_dates)
+    cache_schedules(schedules.values(), versions)
+    return schedules
+
+
+def _from_cached(cached):
+    return {
+        (table_id, date): TableSchedule.from_intervals(table_id, date, *intervals)
+        for (table_id, date), intervals in cached.items()
+    }
+
+
+def _wait_for_schedules(table_dates):
+    """
+    Poll the cache until the workers holding the locks publish the schedules or the wait times out.
+    """
+    schedules = {}
+    deadline = time.monotonic() + settings.AVAILABILITY_LOCK_WAIT
+    while len(schedules) < len(table_dates) and time.monotonic() < deadline:
+        time.sleep(settings.AVAILABILITY_LOCK_POLL_INTERVAL)
+        pending = [table_date for table_date in table_dates if table_date not in schedules]
+        schedules.update(_from_cached(get_cached_schedules(pending)[0]))
+    return schedules
+
+
+def load_schedules_for_dates(table_ids, dates, allow_stale=False):
+    """
+    Return a mapping of (table id, date) -> `TableSchedule` for every given table on every given date.
+
+    The schedules come from the `AVAILABILITY_BACKEND`, `allow_stale` lets it serve a slightly outdated schedule
+    rather than waiting for a fresh one.
+    """
+    from reservations.backends import get_availability_backend
+
+    return get_availability_backend().load_schedules_for_dates(table_ids, dates, allow_stale)
+
+
+async def aload_schedules_for_dates(table_ids, dates, allow_stale=False):
+    """
+    Async version of `load_schedules_for_dates`.
+    """
+    from reservations.backends import get_availability_backend
+
+    return await get_availability_backend().aload_schedules_for_dates(table_ids, dates, allow_stale)
+
+
+def load_cached_schedules_for_dates(table_ids, dates, allow_stale=False):
+    """
+    `load_schedules_for_dates` through the shared cache.
+
+    Schedules are served from cache when possible and the missing ones are loaded with
+    a single query. On a miss only one worker per (table, date) rebuilds the schedule
+    from the database, the others wait for it to be published. If it is not published
+    in time they fall back to the last known schedule when `allow_stale` is set,
+    otherwise they load it themselves.
+    """
+    table_dates = [(table_id, date) for date in dates for table_id in table_ids]
+    cached, versions = get_cached_schedules(table_dates)
+    schedules = _from_cached(cached)
+    missing = [table_date for table_date in table_dates if table_date not in schedules]
+    count_cache_lookups('schedules', len(schedules), len(missing))
+    if not missing:
+        return schedules
+
+    leading = [table_date for table_date in missing if acquire_schedule_lock(*table_date)]
+    if leading:
+        try:
+            schedules.update(_query_and_cache_schedules(leading, versions))
+        finally:
+            release_schedule_locks(leading)
+
+    waiting = [table_date for table_date in missing if table_date not in schedules]
+    if not waiting:
+        return schedules
+
+    schedules.update(_wait_for_schedules(waiting))
+    missing = [table_date for table_date in waiting if table_date not in schedules]
+    if missing and allow_stale:
+        schedules.update(_from_cached(get_stale_schedules(missing)))
+        missing = [table_date for table_date in missing if table_date not in schedules]
+    if missing:
+        schedules.update(_query_and_cache_schedules(missing, versions))
+    return schedules
+
+
+async def aload_cached_schedules_for_dates(table_ids, dates, allow_stale=False):
+    """
+    Async version of `load_cached_schedules_for_dates`.
+
+    Cache hits are served without leaving the event loop, only the misses go through
+    the sync loader (locking, database query) in a worker thread.
+    """
+    table_dates = [(table_id, date) for date in dates for table_id in table_ids]
+    schedules = _from_cached((await aget_cached_schedules(table_dates))[0])
+    missing = [table_date for table_date in table_dates if table_date not in schedules]
+    # The misses are counted by the sync loader which looks them up again
+    count_cache_lookups('schedules', len(schedules), 0)
+    if missing:
+        missing_table_ids = list({table_id: None for table_id, _ in missing})
+        missing_dates = list({date: None for _, date in missing})
+        loaded = await sync_to_async(load_cached_schedules_for_dates)(missing_table_ids, missing_dates, allow_stale)
+        schedules.update({table_date: loaded[table_date] for table_date in missing})
+    return schedules
+
+
+def load_schedules(table_ids, date, allow_stale=False):
+    """
+    Return a mapping of table id -> `TableSchedule` for every given table on `date`.
+    """
+    schedules = load_schedules_for_dates(table_ids, [date], allow_stale=allow_stale)
+    return {table_id: schedule for (table_id, _), schedule in schedules.items()}
+
+
+def load_schedule(table_id, date):
+    return load_schedules([table_id], date)[table_id]
+
+
+def check_availability_for_dates(tables, dates):
+    """
+    Return a mapping of date -> table id -> list of free slots for every given table
+    on every given date, loaded with a single query.
+    """
+    table_ids = [table.pk for table in tables]
+    schedules = load_schedules_for_dates(table_ids, dates, allow_stale=True)
+    return _free_slots_by_date(table_ids, dates, schedules)
+
+
+async def acheck_availability_for_dates(tables, dates):
+    """
+    Async version of `check_availability_for_dates`.
+    """
+    table_ids = [table.pk for table in tables]
+    schedules = await aload_schedules_for_dates(table_ids, dates, allow_stale=True)
+    return _free_slots_by_date(table_ids, dates, schedules)
+
+
+def _free_slots_by_date(table_ids, dates, schedules):
+    availability = {}
+    for date in dates:
+        start_time, end_time = get_availability_boundary(date)
+        availability[date] = {
+            table_id: schedules[table_id, date].free_slots(start_time, end_time) for table_id in table_ids
+        }
+    return availability
+
+
+def check_availability_for_tables(tables):
+    """
+    Batch version of `check_availability_for_table`: return a mapping of
+    table id -> list of free slots today for all the given tables.
+    """
+    today = timezone.now().date()
+    return check_availability_for_dates(tables, [today])[today]
+
+
+def find_first_available(tables, schedules, date, duration, earliest_time=None, limit=5):
+    """
+    Return up to `limit` (table, from_time, to_time) candidates where a reservation of
+    `duration` fits on `date`, ranked by the smallest table and then the earliest start.
+
+    Each table contributes its earliest fitting gap and a heap keeps the best `limit` of them.
+    """
+    start_time, end_time = get_availability_boundary(date)
+    if earliest_time is not None:
+        start_time = max(start_time, earliest_time)
+
+    def candidates():
+        for table in tables:
+            for from_time, to_time in schedules[table.pk].free_slots(start_time, end_time):
+                finish = datetime.datetime.combine(date, from_time) + duration
+                if finish <= datetime.datetime.combine(date, to_time):
+                    yield table.number_of_seats, from_time, table.number, table, finish.time()
+                    break
+
+    return [
+        (table, from_time, to_time)
+        for _, from_time, _, table, to_time in heapq.nsmallest(limit, candidates(), key=lambda item: item[:3])
+    ]
@@ -0,0 +1,120 @@
+"""
+Storage engines of the table schedules behind the availability checks, selected by `AVAILABILITY_BACKEND`.
+
+Every backend answers `load_schedules_for_dates` with the same `TableSchedule` objects, so they can be swapped
+without touching the callers and checked against each other by the conformance tests. The writes do not go through
+the backend, `invalidate_schedules` publishes new versions of the schedules they touch, which the caching backends
+check instead.
+"""
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from reservations.availability import (
+    TableSchedule,
+    aload_cached_schedules_for_dates,
+    load_cached_schedules_for_dates,
+    query_schedules,
+)
+from reservations.cache import get_schedule_versions
+
+_backends = {}
+
+
+class AvailabilityBackend:
+    def load_schedules_for_dates(self, table_ids, dates, allow_stale=False):
+        """
+        Return a mapping of (table id, date) -> `TableSchedule` for every given table on every given date.
+
+        The caller owns the returned schedules and may add reservations to them.
+        """
+        raise NotImplementedError
+
+    async def aload_schedules_for_dates(self, table_ids, dates, allow_stale=False):
+        return await sync_to_async(self.load_schedules_for_dates)(table_ids, dates, allow_stale)
+
+
+class SQLAvailabilityBackend(AvailabilityBackend):
+    """
+    Reference backend: every lookup is one query on the reservations.
+    """
+
+    def load_schedules_for_dates(self, table_ids, dates, allow_stale=False):
+        return query_schedules([(table_id, date) for date in dates for table_id in table_ids])
+
+
+class InMemoryAvailabilityBackend(AvailabilityBackend):
+    """
+    Interval indexes kept in this process, per table and date, dropped when their version published in cache changes.
+
+    Lookups cost one cache round trip for the versions and no query once the schedules are loaded. Without a shared
+    cache there is no version to compare with and the schedules are loaded on every call.
+    """
+
+    def __init__(self):
+        # (table id, date) -> (version, TableSchedule)
+        self.schedules = {}
+        self._lock = threading.Lock()
+
+    def load_schedules_for_dates(self, table_ids, dates, allow_stale=False):
+        self.forget_past_dates()
+        table_dates = [(table_id, date) for date in dates for table_id in table_ids]
+        versions = get_schedule_versions(table_dates)
+        schedules = {}
+        for table_date in table_dates:
+            version, schedule = self.schedules.get(table_date, (None, None))
+            if version is not None and version == versions.get(table_date):
+                schedules[table_date] = schedule
+
+        missing = [table_date for table_date in table_dates if table_date not in schedules]
+        if missing:
+            loaded = query_schedules(missing)
+            self.keep(loaded, versions)
+            schedules.update(loaded)
+        # Copies, so the caller adding reservations to them does not alter the index
+        return {
+            table_date: TableSchedule.from_intervals(schedule.table_id, schedule.date, schedule.starts, schedule.ends)
+            for table_date, schedule in schedules.items()
+        }
+
+    def forget_past_dates(self):
+        today = timezone.now().date()
+        with self._lock:
+            for table_date in [table_date for table_date in self.schedules if table_date[1] < today]:
+                del self.schedules[table_date]
+
+    def keep(self, schedules, versions):
+        """
+        Index the freshly loaded `schedules` under their `versions` read before loading them.
+        """
+        today = timezone.now().date()
+        with self._lock:
+            for table_date, schedule in schedules.items():
+                version = versions.get(table_date)
+                if version is not None and table_date[1] >= today:
+                    self.schedules[table_date] = (version, schedule)
+
+
+class CachedAvailabilityBackend(AvailabilityBackend):
+    """
+    Schedules shared by all workers in the cache, Redis in production, rebuilt by a single worker on a miss.
+    """
+
+    def load_schedules_for_dates(self, table_ids, dates, allow_stale=False):
+        return load_cached_schedules_for_dates(table_ids, dates, allow_stale)
+
+    async def aload_schedules_for_dates(self, table_ids, dates, allow_stale=False):
+        return await aload_cached_schedules_for_dates(table_ids, dates, allow_stale)
+
+
+def get_availability_backend() -> AvailabilityBackend:
+    """
+    Return the instance of the `AVAILABILITY_BACKEND` of this process.
+    """
+    path = settings.AVAILABILITY_BACKEND
+    if path not in _backends:
+        _backends[path] = import_string(path)()
+    return _backends[path]
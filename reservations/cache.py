@@ -0,0 +1,215 @@
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+SCHEDULE_KEY_PREFIX = 'availability:schedule'
+STALE_SCHEDULE_KEY_PREFIX = 'availability:stale-schedule'
+SCHEDULE_LOCK_KEY_PREFIX = 'availability:lock'
+SCHEDULE_VERSION_KEY_PREFIX = 'availability:version'
+CATALOG_VERSION_KEY = 'tables:catalog:version'
+
+
+def schedule_key(table_id, date):
+    return f'{SCHEDULE_KEY_PREFIX}:{table_id}:{date}'
+
+
+def stale_schedule_key(table_id, date):
+    return f'{STALE_SCHEDULE_KEY_PREFIX}:{table_id}:{date}'
+
+
+def schedule_lock_key(table_id, date):
+    return f'{SCHEDULE_LOCK_KEY_PREFIX}:{table_id}:{date}'
+
+
+def schedule_version_key(table_id, date):
+    return f'{SCHEDULE_VERSION_KEY_PREFIX}:{table_id}:{date}'
+
+
+def _get_many(key_func, table_dates):
+    keys = {key_func(table_id, date): (table_id, date) for table_id, date in table_dates}
+    found = cache.get_many(keys, version=settings.AVAILABILITY_CACHE_VERSION)
+    return {keys[key]: intervals for key, intervals in found.items()}
+
+
+def _schedule_keys(table_dates):
+    return [key for table_id, date in table_dates
+            for key in (schedule_key(table_id, date), schedule_version_key(table_id, date))]
+
+
+def _current_schedules(table_dates, found):
+    """
+    Split the `found` schedule and version keys into the schedules cached under their current version and the
+    mapping of (table id, date) -> version.
+    """
+    versions = {
+        (table_id, date): found[schedule_version_key(table_id, date)] for table_id, date in table_dates
+        if schedule_version_key(table_id, date) in found
+    }
+    schedules = {}
+    for table_id, date in table_dates:
+        cached = found.get(schedule_key(table_id, date))
+        if cached is not None and versions.get((table_id, date)) is not None and cached[0] == versions[table_id, date]:
+            schedules[table_id, date] = cached[1:]
+    return schedules, versions
+
+
+def get_cached_schedules(table_dates):
+    """
+    Return a mapping of (table id, date) -> (starts, ends) for the schedules cached under their current version,
+    and the mapping of (table id, date) -> current version, publishing the missing ones.
+
+    The versions are read before the missing schedules are loaded, `cache_schedules` stores them under these.
+    """
+    schedules, versions = _current_schedules(
+        table_dates, cache.get_many(_schedule_keys(table_dates), version=settings.AVAILABILITY_CACHE_VERSION),
+    )
+    missing = [table_date for table_date in table_dates if table_date not in versions]
+    if missing:
+        versions.update(get_schedule_versions(missing))
+    return schedules, versions
+
+
+async def aget_cached_schedules(table_dates):
+    """
+    Async version of `get_cached_schedules`, which does not publish the missing versions.
+    """
+    found = await cache.aget_many(_schedule_keys(table_dates), version=settings.AVAILABILITY_CACHE_VERSION)
+    return _current_schedules(table_dates, found)
+
+
+def get_stale_schedules(table_dates):
+    """
+    Return a mapping of (table id, date) -> (starts, ends) for the last schedules cached, even under an older version.
+    """
+    return _get_many(stale_schedule_key, table_dates)
+
+
+def cache_schedules(schedules, versions=None):
+    """
+    Cache the `schedules` under their `versions` read before loading them, the current ones by default.
+
+    A schedule loaded before a write was visible is then cached under a version the write replaced, and never served.
+    """
+    schedules = list(schedules)
+    if versions is None:
+        versions = get_schedule_versions([(schedule.table_id, schedule.date) for schedule in schedules])
+    cache.set_many(
+        {
+            schedule_key(schedule.table_id, schedule.date):
+                (versions[schedule.table_id, schedule.date], schedule.starts, schedule.ends)
+            for schedule in schedules if versions.get((schedule.table_id, schedule.date)) is not None
+        },
+        timeout=settings.AVAILABILITY_CACHE_TIMEOUT,
+        version=settings.AVAILABILITY_CACHE_VERSION,
+    )
+    # Invalidation does not touch the stale copy, it is only served while another worker rebuilds the schedule
+    cache.set_many(
+        {stale_schedule_key(schedule.table_id, schedule.date): (schedule.starts, schedule.ends)
+         for schedule in schedules},
+        timeout=settings.AVAILABILITY_CACHE_TIMEOUT * 2,
+        version=settings.AVAILABILITY_CACHE_VERSION,
+    )
+
+
+def acquire_schedule_lock(table_id, date) -> bool:
+    """
+    Try to become the only worker rebuilding the schedule of a table on a date.
+
+    `cache.add` is atomic on Redis (SET NX), the lock expires by itself if its holder dies.
+    """
+    return cache.add(
+        schedule_lock_key(table_id, date), True,
+        timeout=settings.AVAILABILITY_LOCK_TIMEOUT,
+        version=settings.AVAILABILITY_CACHE_VERSION,
+    )
+
+
+def release_schedule_locks(table_dates):
+    cache.delete_many(
+        [schedule_lock_key(table_id, date) for table_id, date in table_dates],
+        version=settings.AVAILABILITY_CACHE_VERSION,
+    )
+
+
+def get_schedule_versions(table_dates):
+    """
+    Return a mapping of (table id, date) -> version of its schedule shared by all workers, publishing the missing
+    ones.
+    """
+    keys = {schedule_version_key(table_id, date): (table_id, date) for table_id, date in table_dates}
+    found = cache.get_many(keys, version=settings.AVAILABILITY_CACHE_VERSION)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        for key in missing:
+            cache.add(key, uuid.uuid4().hex, timeout=settings.AVAILABILITY_CACHE_TIMEOUT,
+                      version=settings.AVAILABILITY_CACHE_VERSION)
+        found.update(cache.get_many(missing, version=settings.AVAILABILITY_CACHE_VERSION))
+    return {keys[key]: version for key, version in found.items()}
+
+
+def invalidate_schedules(table_dates):
+    """
+    Publish new versions of the given (table id, date) pairs, right away and once more after the current transaction
+    commits, so none of their cached schedules is served again.
+
+    A reader which read a version before either of them caches its schedule under that version, which is no longer
+    current. The schedules of the other tables on the same dates are left alone.
+    """
+    keys = [schedule_version_key(table_id, date) for table_id, date in set(table_dates) if table_id and date]
+    if not keys:
+        return
+
+    def publish():
+        cache.set_many({key: uuid.uuid4().hex for key in keys}, timeout=settings.AVAILABILITY_CACHE_TIMEOUT,
+                       version=settings.AVAILABILITY_CACHE_VERSION)
+
+    publish()
+    transaction.on_commit(publish)
+
+
+def clear_schedules():
+    """
+    Drop every cached schedule, stale copy and version, whatever their table and date.
+    """
+    if not hasattr(cache, 'delete_pattern'):
+        # Only django-redis deletes by pattern, the local memory and dummy caches used otherwise are cleared whole
+        cache.clear()
+        return
+    for prefix in (SCHEDULE_KEY_PREFIX, STALE_SCHEDULE_KEY_PREFIX, SCHEDULE_VERSION_KEY_PREFIX):
+        cache.delete_pattern(f'{prefix}:*', version=settings.AVAILABILITY_CACHE_VERSION)
+
+
+def get_catalog_version():
+    """
+    Return the version of the table catalog shared by all workers, publishing one if there is none yet.
+    """
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+async def aget_catalog_version():
+    """
+    Async version of `get_catalog_version`.
+    """
+    version = await cache.aget(CATALOG_VERSION_KEY)
+    if version is None:
+        await cache.aadd(CATALOG_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+        version = await cache.aget(CATALOG_VERSION_KEY)
+    return version
+
+
+def invalidate_table_catalog():
+    """
+    Publish a new catalog version so every worker rebuilds its in-memory catalog on its next lookup.
+    """
+
+    def publish():
+        cache.set(CATALOG_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+
+    publish()
+    transaction.on_commit(publish)
@@ -0,0 +1,64 @@
+from bisect import bisect_left
+
+from asgiref.sync import sync_to_async
+
+from reservations.cache import aget_catalog_version, get_catalog_version
+from reservations.models import Table
+
+_catalog = None
+
+
+class TableCatalog:
+    """
+    In-memory snapshot of the tables grouped by their number of seats.
+
+    Seats are capped at 12 so the sorted list of distinct sizes is tiny, finding the
+    smallest size which fits a party is a bisect over it.
+    """
+
+    def __init__(self, tables, version=None):
+        self.version = version
+        self.tables = {}
+        for table in tables:
+            self.tables.setdefault(table.number_of_seats, []).append(table)
+        self.sizes = sorted(self.tables)
+
+    def fit_table_size(self, persons):
+        """
+        Return the smallest number of seats which can accept `persons`, None if no table is big enough.
+        """
+        index = bisect_left(self.sizes, persons)
+        return self.sizes[index] if index < len(self.sizes) else None
+
+    def get_tables(self, number_of_seats):
+        return list(self.tables.get(number_of_seats, ()))
+
+    def get_tables_for(self, persons):
+        """
+        Return every table which can accept `persons`, smallest tables first.
+        """
+        return [table for size in self.sizes[bisect_left(self.sizes, persons):] for table in self.tables[size]]
+
+
+def get_table_catalog() -> TableCatalog:
+    """
+    Return the catalog held by this process, rebuilding it when the version published in cache changed.
+
+    Without a shared cache there is no version to compare with and the catalog is rebuilt on every call.
+    """
+    global _catalog
+    version = get_catalog_version()
+    if _catalog is None or version is None or _catalog.version != version:
+        tables = Table.objects.filter(number_of_seats__isnull=False).order_by('number_of_seats', 'number')
+        _catalog = TableCatalog(tables, version)
+    return _catalog
+
+
+async def aget_table_catalog() -> TableCatalog:
+    """
+    Async version of `get_table_catalog`, the database is only reached when the catalog has to be rebuilt.
+    """
+    version = await aget_catalog_version()
+    if _catalog is None or version is None or _catalog.version != version:
+        return await sync_to_async(get_table_catalog)()
+    return _catalog
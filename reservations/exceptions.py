@@ -0,0 +1,28 @@
+from django.db import IntegrityError
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions, status
+
+from reservations.models import OVERLAPPING_RESERVATION_CONSTRAINT, RESERVATION_DURATION_CONSTRAINT
+
+
+class ReservationConflict(exceptions.APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = _('This table is already reserved during the requested time')
+    default_code = 'reservation_conflict'
+
+
+def get_violated_constraint(error: IntegrityError):
+    diag = getattr(error.__cause__, 'diag', None)
+    return getattr(diag, 'constraint_name', None)
+
+
+def raise_for_reservation_constraint(error: IntegrityError):
+    """
+    Translate a reservation constraint violation raised by the database into an API error.
+    """
+    constraint = get_violated_constraint(error)
+    if constraint == OVERLAPPING_RESERVATION_CONSTRAINT:
+        raise ReservationConflict()
+    if constraint == RESERVATION_DURATION_CONSTRAINT:
+        raise exceptions.ValidationError(_('Invalid from_time and to_time'), code='invalid_time_range')
+    raise error
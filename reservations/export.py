@@ -0,0 +1,82 @@
+import asyncio
+import csv
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.db import connections
+from rest_framework.settings import api_settings
+
+EXPORT_FIELDS = ('id', 'date', 'from_time', 'to_time', 'table', 'persons')
+EXPORT_COLUMNS = ('id', 'date', 'from_time', 'to_time', 'table_id', 'persons')
+EXPORT_ORDERING = ('date', 'from_time', 'id')
+
+
+def iter_row_batches(queryset, chunk_size):
+    """
+    Yield lists of up to `chunk_size` plain rows, read through a single server-side cursor.
+    """
+    rows = queryset.order_by(*EXPORT_ORDERING).values_list(*EXPORT_COLUMNS).iterator(chunk_size=chunk_size)
+    while batch := list(islice(rows, chunk_size)):
+        yield batch
+
+
+def _format_rows(rows):
+    time_format = api_settings.TIME_FORMAT
+    for pk, date, from_time, to_time, table_id, persons in rows:
+        yield pk, date.isoformat(), from_time.strftime(time_format), to_time.strftime(time_format), table_id, persons
+
+
+def to_ndjson(batches):
+    for batch in batches:
+        yield ''.join(json.dumps(dict(zip(EXPORT_FIELDS, row))) + '\n' for row in _format_rows(batch))
+
+
+def to_csv(batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    for batch in batches:
+        writer.writerows(_format_rows(batch))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _in_event_loop():
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def iterate_in_thread(iterable):
+    """
+    Consume a blocking iterable from a dedicated thread, which owns its own database connection.
+    """
+    iterator = iter(iterable)
+    sentinel = object()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        try:
+            while (item := executor.submit(next, iterator, sentinel).result()) is not sentinel:
+                yield item
+        finally:
+            executor.submit(iterator.close).result()
+            executor.submit(connections.close_all).result()
+
+
+def stream(iterable):
+    """
+    Make a database backed iterable safe to use as streaming content under both WSGI and ASGI.
+
+    Django 4.0 iterates streaming responses inside the event loop under ASGI, where the ORM
+    refuses to run, so there the iterable is consumed from a thread instead.
+    """
+    if _in_event_loop():
+        yield from iterate_in_thread(iterable)
+    else:
+        yield from iterable
@@ -6,8 +6,8 @@ from .models import Reservation
 
 
 class ReservationDateFilter(FilterSet):
-    from_time = DateFilter(lookup_expr="gte", widget=DateInput(attrs={'type': 'date'}))
-    to_time = DateFilter(lookup_expr="lte", widget=DateInput(attrs={'type': 'date'}))
+    from_time = DateFilter(field_name='date', lookup_expr="gte", widget=DateInput(attrs={'type': 'date'}))
+    to_time = DateFilter(field_name='date', lookup_expr="lte", widget=DateInput(attrs={'type': 'date'}))
 
     class Meta:
         model = Reservation
@@ -0,0 +1,387 @@
+"""
+Live floor state of today kept in Redis, answering which tables are free right now and until when.
+
+For a date the state is made of:
+- `<prefix>:tables`, a hash of table id -> 'number:seats'
+- `<prefix>:sizes`, a sorted set of the distinct numbers of seats
+- `<prefix>:table:<id>`, the reservations of a table as 'from:to' members scored by their end
+- `<prefix>:seats:<n>`, the free tables of n seats scored by the time they become busy
+- `<prefix>:occupied`, the occupied tables scored by the time they become free
+- `<prefix>:sequence`, the number of reservation and table writes applied
+
+Times are seconds since midnight. A table only moves between the free and occupied sets when a reservation starts
+or ends, the Lua scripts move the tables whose score is past on the next lookup, so a walk-in lookup is a few
+O(log n) range queries in a single round trip and no Postgres query. The scripts build their keys themselves,
+which requires a single Redis node rather than a cluster.
+
+Reservation and table writes are applied after their transaction commits. A state missing for today is built from
+the database on the first lookup, the `rebuild-floor-state` command rebuilds it from scratch. A build only marks the
+state as built when no write was applied since it read the database, it starts over otherwise, so a write it missed
+is not overwritten by its older copy of the reservations.
+"""
+import datetime
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+from reservations.availability import get_availability_boundary, load_schedules
+from reservations.catalog import get_table_catalog
+from reservations.models import Reservation, Table
+
+logger = logging.getLogger(__name__)
+
+FLOOR_KEY_PREFIX = 'floor'
+FLOOR_BUILD_LOCK_TIMEOUT = 30
+FLOOR_BUILD_ATTEMPTS = 3
+
+# Shared by every script: ARGV[1] key prefix, ARGV[2] now, ARGV[3] closing time, ARGV[4] expiry timestamp
+_FUNCTIONS = """
+local prefix, now, closing, expire_at = ARGV[1], tonumber(ARGV[2]), tonumber(ARGV[3]), ARGV[4]
+local tables_key, sizes_key, occupied_key = prefix .. ':tables', prefix .. ':sizes', prefix .. ':occupied'
+local sequence_key = prefix .. ':sequence'
+
+local function free_key(info)
+    return prefix .. ':seats:' .. string.match(info, ':(%d+)$')
+end
+
+local function refresh(id)
+    local info = redis.call('HGET', tables_key, id)
+    if not info then
+        return
+    end
+    local free_until = closing
+    local next = redis.call('ZRANGEBYSCORE', prefix .. ':table:' .. id, '(' .. now, '+inf', 'LIMIT', 0, 1)[1]
+    if next then
+        local from_time, to_time = string.match(next, '^(%d+):(%d+)$')
+        if tonumber(from_time) <= now then
+            redis.call('ZREM', free_key(info), id)
+            redis.call('ZADD', occupied_key, to_time, id)
+            redis.call('EXPIREAT', occupied_key, expire_at)
+            return
+        end
+        free_until = math.min(tonumber(from_time), closing)
+    end
+    redis.call('ZREM', occupied_key, id)
+    redis.call('ZADD', free_key(info), free_until, id)
+    redis.call('EXPIREAT', free_key(info), expire_at)
+end
+
+local function count_write()
+    redis.call('INCR', sequence_key)
+    redis.call('EXPIREAT', sequence_key, expire_at)
+end
+
+local function remove(id)
+    local info = redis.call('HGET', tables_key, id)
+    if info then
+        redis.call('ZREM', free_key(info), id)
+        redis.call('HDEL', tables_key, id)
+    end
+    redis.call('ZREM', occupied_key, id)
+end
+"""
+
+_SCRIPTS = {
+    # ARGV[5] table id, ARGV[6] number of removed reservations, then the removed and the added reservations
+    'update_reservations': _FUNCTIONS + """
+local id, removed = ARGV[5], tonumber(ARGV[6])
+local key = prefix .. ':table:' .. id
+count_write()
+for index = 7, 6 + removed do
+    redis.call('ZREM', key, ARGV[index])
+end
+for index = 7 + removed, #ARGV do
+    redis.call('ZADD', key, string.match(ARGV[index], ':(%d+)$'), ARGV[index])
+end
+redis.call('EXPIREAT', key, expire_at)
+refresh(id)
+""",
+    # ARGV[5] table id, ARGV[6] 'number:seats' of the table, empty to remove it
+    'update_table': _FUNCTIONS + """
+local id, info = ARGV[5], ARGV[6]
+count_write()
+remove(id)
+if info == '' then
+    redis.call('DEL', prefix .. ':table:' .. id)
+    return
+end
+local seats = string.match(info, ':(%d+)$')
+redis.call('HSET', tables_key, id, info)
+redis.call('ZADD', sizes_key, seats, seats)
+redis.call('EXPIREAT', tables_key, expire_at)
+redis.call('EXPIREAT', sizes_key, expire_at)
+refresh(id)
+""",
+    # ARGV[5] sequence read before loading the state from the database
+    # Place every table once its reservations are loaded and mark the state as built, unless a write was applied since
+    'refresh_all': _FUNCTIONS + """
+if (redis.call('GET', sequence_key) or '0') ~= ARGV[5] then
+    return 0
+end
+for _, id in ipairs(redis.call('HKEYS', tables_key)) do
+    refresh(id)
+end
+redis.call('SET', prefix .. ':built', 1, 'EXAT', expire_at)
+return 1
+""",
+    # ARGV[5] number of persons, ARGV[6] lowest accepted free until, ARGV[7] limit
+    # Return id, 'number:seats', free until of each table, smallest tables and tightest fit first
+    'walk_in': _FUNCTIONS + """
+if redis.call('EXISTS', prefix .. ':built') == 0 then
+    return false
+end
+for _, id in ipairs(redis.call('ZRANGEBYSCORE', occupied_key, '-inf', now)) do
+    refresh(id)
+end
+local due = now < closing and now or '(' .. closing
+local limit, found = tonumber(ARGV[7]), {}
+for _, seats in ipairs(redis.call('ZRANGEBYSCORE', sizes_key, ARGV[5], '+inf')) do
+    local key = prefix .. ':seats:' .. seats
+    for _, id in ipairs(redis.call('ZRANGEBYSCORE', key, '-inf', due)) do
+        refresh(id)
+    end
+    local rows = redis.call('ZRANGEBYSCORE', key, ARGV[6], '+inf', 'WITHSCORES', 'LIMIT', 0, limit - #found / 3)
+    for index = 1, #rows, 2 do
+        table.insert(found, rows[index])
+        table.insert(found, redis.call('HGET', tables_key, rows[index]))
+        table.insert(found, rows[index + 1])
+    end
+    if #found / 3 >= limit then
+        break
+    end
+end
+return found
+""",
+}
+
+_registered = {}
+
+
+def to_seconds(value: datetime.time):
+    return value.hour * 3600 + value.minute * 60 + value.second
+
+
+def from_seconds(seconds):
+    seconds = int(seconds)
+    return datetime.time(seconds // 3600, seconds % 3600 // 60, seconds % 60)
+
+
+def floor_prefix(date):
+    return f'{FLOOR_KEY_PREFIX}:{date}'
+
+
+def table_member(table_id):
+    # Zero padded so members with the same score come in the order of their ids
+    return f'{table_id:010d}'
+
+
+def reservation_member(from_time, to_time):
+    return f'{to_seconds(from_time)}:{to_seconds(to_time)}'
+
+
+def get_expire_at(date):
+    # The state of a date outlives it by a day, so lookups around midnight still find it
+    return int(datetime.datetime.combine(
+        date + datetime.timedelta(days=2), datetime.time.min, tzinfo=datetime.timezone.utc,
+    ).timestamp())
+
+
+def _run(name, date, *args):
+    if name not in _registered:
+        _registered[name] = get_redis_connection('default').register_script(_SCRIPTS[name])
+    start_time, end_time = get_availability_boundary(date)
+    common = [floor_prefix(date), to_seconds(start_time), to_seconds(end_time), get_expire_at(date)]
+    return _registered[name](args=common + list(args))
+
+
+def _on_commit(apply, date):
+    """
+    Apply a change to the floor state of `date` once the transaction commits, if `date` is today.
+    """
+    if not settings.FLOOR_STATE_ENABLED or date != timezone.now().date():
+        return
+
+    def run():
+        try:
+            apply()
+        except RedisError:
+            logger.exception('Failed to update the floor state of %s', date)
+            # Have the next lookup rebuild the state rather than serve it without this change
+            try:
+                get_redis_connection('default').delete(f'{floor_prefix(date)}:built')
+            except RedisError:
+                pass
+
+    transaction.on_commit(run)
+
+
+def record_reservations(added=(), removed=()):
+    """
+    Apply created, moved and deleted reservations, as (table id, date, from time, to time), to the floor state.
+    """
+    changes = {}
+    for key, reservations in (('removed', removed), ('added', added)):
+        for table_id, date, from_time, to_time in reservations:
+            # Fields deferred when the reservation was loaded are unknown, and were not changed by the save
+            if None not in (table_id, date, from_time, to_time):
+                entry = changes.setdefault((table_id, date), {'removed': [], 'added': []})
+                entry[key].append(reservation_member(from_time, to_time))
+    for (table_id, date), entry in changes.items():
+        _on_commit(lambda table_id=table_id, date=date, entry=entry: _run(
+            'update_reservations', date, table_member(table_id), len(entry['removed']),
+            *entry['removed'], *entry['added'],
+        ), date)
+
+
+def record_table(table: Table, deleted=False):
+    """
+    Add, update or remove a table in today's floor state.
+    """
+    date = timezone.now().date()
+    # Django clears the pk of deleted instances, read it before the transaction commits
+    member = table_member(table.pk)
+    info = '' if deleted or table.number_of_seats is None else f'{table.number}:{table.number_of_seats}'
+    _on_commit(lambda: _run('update_table', date, member, info), date)
+
+
+def _delete_matching(connection, pattern, keep=()):
+    keys = [key for key in connection.scan_iter(match=pattern, count=1000) if key.decode() not in keep]
+    for start in range(0, len(keys), 1000):
+        connection.delete(*keys[start:start + 1000])
+
+
+def clear_floor_state():
+    """
+    Drop the floor state of every date, the next lookup builds it again from the database.
+    """
+    if settings.FLOOR_STATE_ENABLED:
+        _delete_matching(get_redis_connection('default'), f'{FLOOR_KEY_PREFIX}:*')
+
+
+def _query_floor_state(date):
+    """
+    Return iterators on the (id, number, seats) of the tables and the (table id, from, to) of the reservations
+    of `date`.
+    """
+    tables = Table.objects.filter(number_of_seats__isnull=False).values_list('id', 'number', 'number_of_seats')
+    reservations = Reservation.objects.filter(date=date).values_list('table_id', 'from_time', 'to_time')
+    return tables.iterator(), reservations.iterator()
+
+
+def _load_floor_state(connection, date):
+    prefix = floor_prefix(date)
+    tables, reservations = _query_floor_state(date)
+    pipeline = connection.pipeline(transaction=False)
+    keys = {f'{prefix}:tables', f'{prefix}:sizes'}
+    table_ids = set()
+    for table_id, number, number_of_seats in tables:
+        table_ids.add(table_id)
+        pipeline.hset(f'{prefix}:tables', table_member(table_id), f'{number}:{number_of_seats}')
+        pipeline.zadd(f'{prefix}:sizes', {number_of_seats: number_of_seats})
+    for table_id, from_time, to_time in reservations:
+        if table_id in table_ids:
+            key = f'{prefix}:table:{table_member(table_id)}'
+            keys.add(key)
+            pipeline.zadd(key, {reservation_member(from_time, to_time): to_seconds(to_time)})
+    for key in keys:
+        pipeline.expireat(key, get_expire_at(date))
+    pipeline.execute()
+    return len(table_ids)
+
+
+def build_floor_state(date, replace=False):
+    """
+    Load the floor state of `date` from the database, replacing the current one or merged into it.
+
+    Return the number of tables, or None when writes kept being applied during every attempt and the state was
+    dropped, the next lookup builds it again.
+    """
+    connection = get_redis_connection('default')
+    prefix = floor_prefix(date)
+    # The lock of the build and the count of the writes outlive the state
+    keep = {f'{prefix}:building', f'{prefix}:sequence'}
+    for attempt in range(FLOOR_BUILD_ATTEMPTS):
+        if replace or attempt:
+            _delete_matching(connection, f'{prefix}:*', keep)
+        # Read before the database, a write applied since then makes the loaded reservations outdated
+        sequence = connection.get(f'{prefix}:sequence') or 0
+        tables = _load_floor_state(connection, date)
+        if _run('refresh_all', date, sequence):
+            return tables
+    logger.warning('The floor state of %s changed during %d builds, dropping it', date, FLOOR_BUILD_ATTEMPTS)
+    _delete_matching(connection, f'{prefix}:*', keep)
+    return None
+
+
+def _build_floor_state_once(date):
+    """
+    Build the missing floor state of `date` unless another worker is already building it.
+    """
+    connection = get_redis_connection('default')
+    lock = f'{floor_prefix(date)}:building'
+    if not connection.set(lock, 1, nx=True, ex=FLOOR_BUILD_LOCK_TIMEOUT):
+        return False
+    try:
+        build_floor_state(date)
+    finally:
+        connection.delete(lock)
+    return True
+
+
+def find_walk_in_tables_in_floor_state(persons, min_until, limit):
+    """
+    Return up to `limit` (table, free until) of the tables free right now, None when the state is not built.
+    """
+    now = to_seconds(get_availability_boundary()[0])
+    rows = _run('walk_in', timezone.now().date(), persons, f'({now}' if min_until <= now else min_until, limit)
+    if rows is None:
+        return None
+    candidates = []
+    for index in range(0, len(rows), 3):
+        number, number_of_seats = rows[index + 1].decode().split(':')
+        table = Table(pk=int(rows[index]), number=int(number), number_of_seats=int(number_of_seats))
+        candidates.append((table, from_seconds(rows[index + 2])))
+    return candidates
+
+
+def find_walk_in_tables_in_schedules(persons, min_until, limit):
+    """
+    Same answer as `find_walk_in_tables_in_floor_state`, computed from the table catalog and schedules.
+    """
+    start_time, end_time = get_availability_boundary()
+    tables = get_table_catalog().get_tables_for(persons)
+    schedules = load_schedules([table.pk for table in tables], timezone.now().date(), allow_stale=True)
+    now = to_seconds(start_time)
+    candidates = []
+    for table in tables:
+        slots = schedules[table.pk].free_slots(start_time, end_time)
+        if slots and slots[0][0] == start_time:
+            free_until = to_seconds(slots[0][1])
+            if free_until > now and free_until >= min_until:
+                candidates.append((table.number_of_seats, free_until, table.pk, table))
+    return [(table, from_seconds(free_until)) for _, free_until, _, table in sorted(candidates)[:limit]]
+
+
+def find_walk_in_tables(persons, duration: datetime.timedelta, limit):
+    """
+    Return up to `limit` (table, free until) of the tables of at least `persons` seats free right now
+    for at least `duration`, smallest tables first and then the ones which become busy the soonest.
+
+    Served from the floor state when it is enabled, building it on the first lookup of the day,
+    and from the schedules when it is disabled, being built by another worker or Redis fails.
+    """
+    min_until = to_seconds(get_availability_boundary()[0]) + int(duration.total_seconds())
+    if settings.FLOOR_STATE_ENABLED:
+        try:
+            candidates = find_walk_in_tables_in_floor_state(persons, min_until, limit)
+            if candidates is None and _build_floor_state_once(timezone.now().date()):
+                candidates = find_walk_in_tables_in_floor_state(persons, min_until, limit)
+            if candidates is not None:
+                return candidates
+        except RedisError:
+            logger.exception('Failed to read the floor state')
+    return find_walk_in_tables_in_schedules(persons, min_until, limit)
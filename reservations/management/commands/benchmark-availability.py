@@ -0,0 +1,131 @@
+import datetime
+import io
+import json
+import random
+import time
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from reservations.cache import invalidate_schedules
+from reservations.management.commands.benchmark import LATENCY_KEYS, PERCENTILES, percentile
+from reservations.models import Table
+
+BACKENDS = (
+    'reservations.backends.SQLAvailabilityBackend',
+    'reservations.backends.InMemoryAvailabilityBackend',
+    'reservations.backends.CachedAvailabilityBackend',
+)
+
+
+def build_lookups(rng, table_ids, dates, count, tables_per_lookup, days_per_lookup):
+    """
+    Return `count` random (table ids, dates) lookups, the same ones for every backend given the same seed.
+    """
+    lookups = []
+    for _ in range(count):
+        first_day = rng.randrange(len(dates) - days_per_lookup + 1)
+        lookups.append((sorted(rng.sample(table_ids, tables_per_lookup)),
+                        dates[first_day:first_day + days_per_lookup]))
+    return lookups
+
+
+def measure(backend, lookups):
+    """
+    Run the `lookups` against `backend` one after the other, return the (seconds, number of queries) of each.
+    """
+    samples = []
+    for table_ids, dates in lookups:
+        counter = [0]
+
+        def count_queries(execute, sql, params, many, context):
+            counter[0] += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count_queries):
+            started = time.perf_counter()
+            backend.load_schedules_for_dates(table_ids, dates)
+            samples.append((time.perf_counter() - started, counter[0]))
+    return samples
+
+
+def summarize_lookups(samples):
+    latencies = sorted(seconds * 1000 for seconds, _queries in samples)
+    return {
+        'lookups': len(samples),
+        'mean_ms': round(sum(latencies) / len(latencies), 3),
+        **{key: round(percentile(latencies, percent), 3) for key, percent in zip(LATENCY_KEYS, PERCENTILES)},
+        'queries_per_lookup': round(sum(queries for _seconds, queries in samples) / len(samples), 2),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Command to compare the latency of the availability backends loading the same schedules, in a throwaway '
+        'database seeded with generate-reservations, and report it as JSON. The in-memory and cached backends need '
+        'a shared cache (REDIS_ENABLED), without one they load every schedule from the database'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backends', nargs='+', default=BACKENDS, help='Dotted paths of the backends to compare')
+        parser.add_argument('--lookups', type=int, default=500, help='Measured lookups per backend')
+        parser.add_argument('--warmup', type=int, default=50, help='Lookups per backend run before measuring')
+        parser.add_argument('--lookup-tables', type=int, default=20, help='Tables per lookup')
+        parser.add_argument('--lookup-days', type=int, default=1, help='Consecutive dates per lookup')
+        parser.add_argument('--tables', type=int, default=100)
+        parser.add_argument('--reservations', type=int, default=20_000)
+        parser.add_argument('--days', type=int, default=30)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', type=str, help='Write the JSON report to this file instead of stdout')
+        parser.add_argument('--keepdb', action='store_true', help='Keep the benchmark database between runs')
+
+    def run(self, options, today):
+        call_command(
+            'generate-reservations', '--tables', str(options['tables']), '--reservations',
+            str(options['reservations']), '--days', str(options['days']), '--seed', str(options['seed']),
+            '--start-date', today.isoformat(), '--workers', '1', '--clear', stdout=io.StringIO(),
+        )
+        table_ids = list(Table.objects.order_by('pk').values_list('pk', flat=True))
+        dates = [today + datetime.timedelta(days=day) for day in range(options['days'])]
+        lookups = build_lookups(random.Random(options['seed']), table_ids, dates,
+                                options['warmup'] + options['lookups'], options['lookup_tables'],
+                                options['lookup_days'])
+
+        report = {}
+        for path in options['backends']:
+            # Every backend starts cold, the warmup lookups fill its cache
+            invalidate_schedules((table_id, date) for date in dates for table_id in table_ids)
+            backend = import_string(path)()
+            measure(backend, lookups[:options['warmup']])
+            report[path.rsplit('.', 1)[-1]] = summarize_lookups(measure(backend, lookups[options['warmup']:]))
+        return report
+
+    def handle(self, *args, **options):
+        if min(options['lookups'], options['lookup_tables'], options['lookup_days'], options['tables']) < 1:
+            raise CommandError('--lookups, --lookup-tables, --lookup-days and --tables must be positive')
+        if options['lookup_tables'] > options['tables'] or options['lookup_days'] > options['days']:
+            raise CommandError('A lookup can not span more tables or days than seeded')
+
+        today = timezone.now().date()
+        database_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False, keepdb=options['keepdb'])
+        try:
+            backends = self.run(options, today)
+        finally:
+            connection.creation.destroy_test_db(database_name, verbosity=0, keepdb=options['keepdb'])
+
+        output = json.dumps({
+            'config': {key: options[key] for key in ('lookups', 'lookup_tables', 'lookup_days', 'tables',
+                                                     'reservations', 'days', 'seed')},
+            'cache': settings.CACHES['default']['BACKEND'],
+            'backends': backends,
+        }, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as report_file:
+                report_file.write(output + '\n')
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,301 @@
+import asyncio
+import contextvars
+import datetime
+import io
+import json
+import math
+import random
+import time
+from collections import defaultdict
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.asgi import get_asgi_application
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.urls import reverse
+from django.utils import timezone
+
+from reservations.cache import invalidate_table_catalog
+from reservations.models import Table
+from users.models import Role, User
+
+EXPECTED_STATUS = {
+    'login': 200,
+    'table_availability': 200,
+    'reservation_list': 200,
+    'reservation_create': 201,
+    'table_delete': 204,
+}
+PERCENTILES = (50, 95, 99)
+LATENCY_KEYS = tuple(f'p{percent}_ms' for percent in PERCENTILES)
+BENCHMARK_EMPLOYEE_NO = '9000'
+BENCHMARK_PASSWORD = 'B3nchmark'
+SPARE_TABLE_SEATS = 4
+SLOT = datetime.timedelta(minutes=15)
+
+_query_counter = contextvars.ContextVar('benchmark_query_counter', default=None)
+
+
+def count_queries(execute, sql, params, many, context):
+    counter = _query_counter.get()
+    if counter is not None:
+        counter[0] += 1
+    return execute(sql, params, many, context)
+
+
+def install_query_counter(sender, connection, **kwargs):
+    connection.execute_wrappers.append(count_queries)
+
+
+async def asgi_request(application, method, path, query='', body=b'', headers=()):
+    """
+    Send one request to the ASGI `application` in-process and return its (status, body).
+    """
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': query.encode(),
+        'root_path': '',
+        'headers': [
+            (name.encode(), value.encode()) for name, value in (*headers, ('content-length', str(len(body))))
+        ],
+        'client': ('127.0.0.1', 0),
+        'server': ('localhost', 80),
+    }
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    response = {'status': None, 'body': []}
+
+    async def receive():
+        return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+        elif message['type'] == 'http.response.body':
+            response['body'].append(message.get('body', b''))
+
+    await application(scope, receive, send)
+    return response['status'], b''.join(response['body'])
+
+
+async def run_requests(application, requests, concurrency, headers=()):
+    """
+    Send the (endpoint, method, path, query, body) `requests` from `concurrency` concurrent clients.
+
+    Return the (endpoint, status, seconds, number of queries) of every request and the elapsed seconds.
+    """
+    pending = iter(requests)
+    results = []
+
+    async def client():
+        for endpoint, method, path, query, body in pending:
+            counter = [0]
+            token = _query_counter.set(counter)
+            started = time.perf_counter()
+            status, _content = await asgi_request(application, method, path, query, body, headers)
+            results.append((endpoint, status, time.perf_counter() - started, counter[0]))
+            _query_counter.reset(token)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return results, time.perf_counter() - started
+
+
+def percentile(values, percent):
+    """
+    Nearest-rank percentile of the sorted `values`.
+    """
+    return values[max(0, math.ceil(percent / 100 * len(values)) - 1)]
+
+
+def get_slots(now):
+    """
+    Return the 'HH:MM' bounds of the slots left today, the first one starting at least a slot after `now`.
+
+    The reservations are created for the current date of the server, the slots stay in the future while the
+    requests are sent.
+    """
+    opening = datetime.datetime.combine(now.date(), settings.RESERVATION_STARTING_FROM_TIME, tzinfo=now.tzinfo)
+    closing = datetime.datetime.combine(now.date(), settings.RESERVATION_ENDS_AT_TIME, tzinfo=now.tzinfo)
+    first_slot = max(0, math.ceil((now + SLOT - opening) / SLOT))
+    return [(opening + SLOT * slot).strftime('%H:%M')
+            for slot in range(first_slot, int((closing - opening) / SLOT) + 1)]
+
+
+def summarize(results, elapsed):
+    """
+    Build the report of the `run_requests` results, per endpoint and in total.
+    """
+    by_endpoint = defaultdict(list)
+    for endpoint, status, seconds, queries in results:
+        by_endpoint[endpoint].append((status, seconds, queries))
+
+    endpoints = {}
+    for endpoint, samples in by_endpoint.items():
+        latencies = sorted(seconds * 1000 for _status, seconds, _queries in samples)
+        endpoints[endpoint] = {
+            'requests': len(samples),
+            'errors': sum(status != EXPECTED_STATUS.get(endpoint) for status, _seconds, _queries in samples),
+            'rps': round(len(samples) / elapsed, 2),
+            'mean_ms': round(sum(latencies) / len(latencies), 3),
+            **{key: round(percentile(latencies, percent), 3) for key, percent in zip(LATENCY_KEYS, PERCENTILES)},
+            'queries_per_request': round(sum(queries for _status, _seconds, queries in samples) / len(samples), 2),
+        }
+    return {
+        'total': {'requests': len(results), 'elapsed_s': round(elapsed, 3), 'rps': round(len(results) / elapsed, 2)},
+        'endpoints': endpoints,
+    }
+
+
+def compare_to_baseline(report, baseline, threshold):
+    """
+    Return the regressions of `report` against `baseline`, allowing `threshold` (a ratio) of noise.
+
+    Latencies may not grow nor throughput drop by more than the threshold, the number of queries may not grow at all.
+    """
+    regressions = []
+    for endpoint, expected in baseline['endpoints'].items():
+        actual = report['endpoints'].get(endpoint)
+        if actual is None:
+            regressions.append(f'{endpoint}: missing from the report')
+            continue
+        for key in LATENCY_KEYS:
+            if actual[key] > expected[key] * (1 + threshold):
+                regressions.append(f'{endpoint}: {key} {actual[key]} > {expected[key]}')
+        if actual['rps'] < expected['rps'] * (1 - threshold):
+            regressions.append(f'{endpoint}: rps {actual["rps"]} < {expected["rps"]}')
+        if actual['queries_per_request'] > expected['queries_per_request']:
+            regressions.append(f'{endpoint}: queries_per_request {actual["queries_per_request"]} > '
+                               f'{expected["queries_per_request"]}')
+    return regressions
+
+
+class Command(BaseCommand):
+    help = (
+        'Command to benchmark the API hot paths against the ASGI application, in a throwaway database seeded '
+        'with generate-reservations, and report latency percentiles, throughput and queries per request as JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Measured requests per endpoint')
+        parser.add_argument('--warmup', type=int, default=10, help='Requests per endpoint sent before measuring')
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--tables', type=int, default=100)
+        parser.add_argument('--reservations', type=int, default=20_000)
+        parser.add_argument('--days', type=int, default=30)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', type=str, help='Write the JSON report to this file instead of stdout')
+        parser.add_argument('--baseline', type=str, help='JSON report to compare with, fails on regressions')
+        parser.add_argument('--threshold', type=float, default=0.1,
+                            help='Tolerated latency growth and throughput drop against the baseline, as a ratio')
+        parser.add_argument('--keepdb', action='store_true', help='Keep the benchmark database between runs')
+        parser.add_argument('--host', type=str, default='localhost', help='Host header, must be in ALLOWED_HOSTS')
+
+    def seed(self, options, today, slots):
+        call_command(
+            'generate-reservations', '--tables', str(options['tables']), '--reservations',
+            str(options['reservations']), '--days', str(options['days']), '--seed', str(options['seed']),
+            '--start-date', today.isoformat(), '--workers', '1', '--clear', stdout=io.StringIO(),
+        )
+
+        # Empty tables to book and to delete, the booked ones are sliced in the `slots` left today
+        count = options['requests'] + options['warmup']
+        first_number = Table.objects.order_by('-number').values_list('number', flat=True).first() + 1
+        tables = Table.objects.bulk_create(
+            Table(number=number, number_of_seats=SPARE_TABLE_SEATS)
+            for number in range(first_number, first_number + math.ceil(count / (len(slots) - 1)) + count)
+        )
+        invalidate_table_catalog()
+        booked_slots = [(table.pk, from_time, to_time)
+                        for table in tables[count:] for from_time, to_time in zip(slots, slots[1:])]
+
+        user, _created = User.objects.update_or_create(employee_no=BENCHMARK_EMPLOYEE_NO, defaults={
+            'first_name': 'Benchmark', 'password': make_password(BENCHMARK_PASSWORD), 'is_active': True,
+        })
+        user.groups.set([Role.objects.get(name=Role.ADMIN)])
+        return [table.pk for table in tables[:count]], booked_slots[:count]
+
+    def build_requests(self, deleted_tables, booked_slots):
+        login = json.dumps({'employee_no': BENCHMARK_EMPLOYEE_NO, 'password': BENCHMARK_PASSWORD}).encode()
+        availability_queries = [urlencode({'number_of_persons': persons}) for persons in range(1, 13)]
+        requests = defaultdict(list)
+        for index, (table_id, (booked_table_id, from_time, to_time)) in enumerate(zip(deleted_tables, booked_slots)):
+            requests['login'].append(('login', 'POST', reverse('login'), '', login))
+            requests['table_availability'].append((
+                'table_availability', 'GET', reverse('tables-api-availability'),
+                availability_queries[index % len(availability_queries)], b'',
+            ))
+            requests['reservation_list'].append(('reservation_list', 'GET', reverse('reservation-api-list'), '', b''))
+            requests['reservation_create'].append(('reservation_create', 'POST', reverse('reservation-api-list'), '',
+                                                   json.dumps({'table': booked_table_id, 'from_time': from_time,
+                                                               'to_time': to_time, 'persons': SPARE_TABLE_SEATS})
+                                                   .encode()))
+            requests['table_delete'].append((
+                'table_delete', 'DELETE', reverse('tables-api-detail', kwargs={'pk': table_id}), '', b'',
+            ))
+        return requests
+
+    async def run(self, options, requests):
+        application = get_asgi_application()
+        headers = [('host', options['host']), ('content-type', 'application/json')]
+        status, content = await asgi_request(application, *requests['login'][0][1:], headers)
+        if status != EXPECTED_STATUS['login']:
+            raise CommandError(f'Could not login: {content.decode()}')
+        headers.append(('authorization', f'Bearer {json.loads(content)["access"]}'))
+
+        rng = random.Random(options['seed'])
+        warmup = [request for endpoint in EXPECTED_STATUS for request in requests[endpoint][:options['warmup']]]
+        measured = [request for endpoint in EXPECTED_STATUS for request in requests[endpoint][options['warmup']:]]
+        rng.shuffle(measured)
+        await run_requests(application, warmup, options['concurrency'], headers)
+        return await run_requests(application, measured, options['concurrency'], headers)
+
+    def handle(self, *args, **options):
+        if min(options['requests'], options['concurrency'], options['tables'], options['days']) < 1:
+            raise CommandError('--requests, --concurrency, --tables and --days must be positive')
+
+        now = timezone.now()
+        slots = get_slots(now)
+        if len(slots) < 2:
+            raise CommandError('No slot is left to book today, run the benchmark before the closing time')
+        database_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False, keepdb=options['keepdb'])
+        connection_created.connect(install_query_counter)
+        try:
+            deleted_tables, booked_slots = self.seed(options, now.date(), slots)
+            requests = self.build_requests(deleted_tables, booked_slots)
+            results, elapsed = asyncio.run(self.run(options, requests))
+        finally:
+            connection_created.disconnect(install_query_counter)
+            connection.creation.destroy_test_db(database_name, verbosity=0, keepdb=options['keepdb'])
+
+        report = {
+            'config': {key: options[key] for key in ('requests', 'concurrency', 'tables', 'reservations', 'days',
+                                                     'seed')},
+            'debug': settings.DEBUG,
+            **summarize(results, elapsed),
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as report_file:
+                report_file.write(output + '\n')
+        else:
+            self.stdout.write(output)
+
+        errors = {endpoint: stats['errors'] for endpoint, stats in report['endpoints'].items() if stats['errors']}
+        if errors:
+            raise CommandError(f'Unexpected response status: {errors}')
+        if options['baseline']:
+            with open(options['baseline']) as baseline_file:
+                regressions = compare_to_baseline(report, json.load(baseline_file), options['threshold'])
+            if regressions:
+                raise CommandError('Regressions against the baseline:\n' + '\n'.join(regressions))
@@ -0,0 +1,212 @@
+import datetime
+import io
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from django.utils import timezone
+from redis.exceptions import RedisError
+
+from reservations.cache import clear_schedules, invalidate_schedules, invalidate_table_catalog
+from reservations.floor import clear_floor_state
+from reservations.models import Reservation, Table
+
+SLOT_MINUTES = 15
+MIN_DURATION_SLOTS = 4
+MAX_DURATION_SLOTS = 12
+MAX_SEATS = 12
+RESERVATION_COLUMNS = ('date', 'from_time', 'to_time', 'table_id', 'persons')
+
+
+def get_slot_times():
+    """
+    Return the 'HH:MM' boundaries of the slots between the opening and the closing times.
+    """
+    opening = datetime.datetime.combine(datetime.date.min, settings.RESERVATION_STARTING_FROM_TIME)
+    closing = datetime.datetime.combine(datetime.date.min, settings.RESERVATION_ENDS_AT_TIME)
+    number_of_slots = int((closing - opening).total_seconds() // (SLOT_MINUTES * 60))
+    return [(opening + datetime.timedelta(minutes=SLOT_MINUTES * slot)).strftime('%H:%M')
+            for slot in range(number_of_slots + 1)]
+
+
+def generate_schedule(rng, number_of_slots, count):
+    """
+    Return `count` random non-overlapping (start slot, end slot) pairs within a day of `number_of_slots`.
+
+    The durations are drawn first, then the free slots are spread between the reservations
+    by picking their positions among the gaps (stars and bars), so no draw is ever rejected.
+    """
+    durations = [rng.randint(MIN_DURATION_SLOTS, MAX_DURATION_SLOTS) for _ in range(count)]
+    if sum(durations) > number_of_slots:
+        durations = [MIN_DURATION_SLOTS] * count
+    free = number_of_slots - sum(durations)
+    schedule = []
+    booked = 0
+    for index, position in enumerate(sorted(rng.sample(range(free + count), count))):
+        start = position - index + booked
+        booked += durations[index]
+        schedule.append((start, start + durations[index]))
+    return schedule
+
+
+def generate_reservation_rows(seed, tables, dates, counts):
+    """
+    Yield the CSV rows of the reservations of `tables` on `dates`, `counts` holding one count per (date, table).
+
+    Every date draws from its own generator, so the rows do not depend on how the dates are split between workers.
+    """
+    slot_times = get_slot_times()
+    number_of_slots = len(slot_times) - 1
+    counts = iter(counts)
+    for date in dates:
+        for_date = date.isoformat()
+        rng = random.Random(f'{seed}:{for_date}')
+        for table_id, number_of_seats in tables:
+            for start, end in generate_schedule(rng, number_of_slots, next(counts)):
+                yield f'{for_date},{slot_times[start]},{slot_times[end]},{table_id},{rng.randint(1, number_of_seats)}\n'
+
+
+def copy_rows(cursor, model, columns, rows):
+    """
+    Load the CSV `rows` into the table of `model` with a single `COPY`.
+    """
+    quote_name = connection.ops.quote_name
+    cursor.copy_expert(
+        f'COPY {quote_name(model._meta.db_table)} ({", ".join(map(quote_name, columns))}) FROM STDIN WITH (FORMAT csv)',
+        io.StringIO(''.join(rows)),
+    )
+
+
+def load_reservations(seed, tables, dates, counts, batch_size):
+    """
+    Generate and `COPY` the reservations of `dates` in one transaction, `batch_size` rows at a time.
+    """
+    batch = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        for row in generate_reservation_rows(seed, tables, dates, counts):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                copy_rows(cursor, Reservation, RESERVATION_COLUMNS, batch)
+                batch = []
+        if batch:
+            copy_rows(cursor, Reservation, RESERVATION_COLUMNS, batch)
+
+
+class Command(BaseCommand):
+    help = (
+        'Command to generate tables and non-overlapping reservations in bulk for load and capacity testing. '
+        'With several workers each chunk of dates is loaded in its own transaction, a failing run leaves '
+        'the chunks loaded so far behind, run it again with --clear'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tables', type=int, default=200)
+        parser.add_argument('--reservations', type=int, default=1_000_000)
+        parser.add_argument('--days', type=int, default=365, help='Number of days the reservations are spread on')
+        parser.add_argument('--start-date', type=datetime.date.fromisoformat, default=None,
+                            help='First reservation date, today by default')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=100_000, help='Number of rows per COPY')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help='Number of processes loading the reservations, each chunk of dates in its own '
+                                 'transaction which stays committed if another one fails')
+        parser.add_argument('--clear', action='store_true', help='Delete all the tables and reservations first')
+
+    def get_counts(self, rng, options, number_of_slots):
+        """
+        Spread the target number of reservations evenly on every (date, table), the remainder at random.
+        """
+        cells = options['tables'] * options['days']
+        base, remainder = divmod(options['reservations'], cells)
+        max_per_day = number_of_slots // MIN_DURATION_SLOTS
+        if base + bool(remainder) > max_per_day:
+            raise CommandError(f'At most {max_per_day * cells} reservations fit on {options["tables"]} tables '
+                               f'over {options["days"]} days')
+        counts = [base] * cells
+        for cell in rng.sample(range(cells), remainder):
+            counts[cell] += 1
+        return counts
+
+    def generate_tables(self, rng, count):
+        first_number = (Table.objects.order_by('-number').values_list('number', flat=True).first() or 0) + 1
+        numbers = range(first_number, first_number + count)
+        with connection.cursor() as cursor:
+            copy_rows(cursor, Table, ('number', 'number_of_seats'),
+                      [f'{number},{rng.randint(1, MAX_SEATS)}\n' for number in numbers])
+        return list(Table.objects.filter(number__in=numbers).order_by('number').values_list('id', 'number_of_seats'))
+
+    def load_in_parallel(self, options, tables, dates, counts):
+        """
+        Split the dates between worker processes.
+
+        Checking for overlaps, most of the loading time, only compares reservations of the same table
+        and date, so the concurrent loads never conflict.
+        """
+        days_per_chunk = max(1, len(dates) // (options['workers'] * 4))
+        chunks = [
+            (options['seed'], tables, dates[start:start + days_per_chunk],
+             counts[start * len(tables):(start + days_per_chunk) * len(tables)], options['batch_size'])
+            for start in range(0, len(dates), days_per_chunk)
+        ]
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=django.setup) as executor:
+            for future in [executor.submit(load_reservations, *chunk) for chunk in chunks]:
+                future.result()
+
+    def invalidate_caches(self, options, tables, dates):
+        """
+        Drop the cached schedules of the generated tables on the generated dates, or of every table and date when
+        the ids of the cleared tables are handed out again, and the floor state the new tables and reservations are
+        missing from.
+        """
+        if options['clear']:
+            clear_schedules()
+        else:
+            invalidate_schedules((table_id, date) for table_id, _seats in tables for date in dates)
+        try:
+            clear_floor_state()
+        except RedisError as e:
+            raise CommandError(f'Failed to clear the floor state, run rebuild-floor-state: {e}')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Generating data relies on COPY, which needs PostgreSQL')
+        if min(options['tables'], options['days'], options['batch_size']) < 1 or options['reservations'] < 0:
+            raise CommandError('--tables, --days and --batch-size must be positive, --reservations not negative')
+
+        started = time.monotonic()
+        rng = random.Random(options['seed'])
+        counts = self.get_counts(rng, options, len(get_slot_times()) - 1)
+        start_date = options['start_date'] or timezone.now().date()
+        dates = [start_date + datetime.timedelta(days=day) for day in range(options['days'])]
+
+        tables = []
+        try:
+            with transaction.atomic():
+                if options['clear']:
+                    with connection.cursor() as cursor:
+                        cursor.execute(
+                            f'TRUNCATE {Table._meta.db_table}, {Reservation._meta.db_table} RESTART IDENTITY'
+                        )
+                tables = self.generate_tables(rng, options['tables'])
+                invalidate_table_catalog()
+                if options['workers'] <= 1:
+                    load_reservations(options['seed'], tables, dates, counts, options['batch_size'])
+            if options['workers'] > 1:
+                self.load_in_parallel(options, tables, dates, counts)
+        finally:
+            # COPY and TRUNCATE send no signal, and a failed parallel load leaves committed chunks behind
+            self.invalidate_caches(options, tables, dates)
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {Table._meta.db_table}, {Reservation._meta.db_table}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully generated {len(tables)} tables and {options["reservations"]} reservations '
+            f'in {time.monotonic() - started:.1f}s'
+        ))
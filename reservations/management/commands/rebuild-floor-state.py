@@ -0,0 +1,27 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from redis.exceptions import RedisError
+
+from reservations.floor import build_floor_state
+
+
+class Command(BaseCommand):
+    help = 'Command to rebuild the floor state of the walk-in endpoint in Redis from the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=datetime.date.fromisoformat, default=None, help='Today by default')
+
+    def handle(self, *args, **options):
+        if not settings.FLOOR_STATE_ENABLED:
+            raise CommandError('The floor state is disabled, set FLOOR_STATE_ENABLED=1')
+        date = options['date'] or timezone.now().date()
+        try:
+            tables = build_floor_state(date, replace=True)
+        except RedisError as e:
+            raise CommandError(e)
+        if tables is None:
+            raise CommandError(f'The floor state of {date} kept changing while it was rebuilt, run the command again')
+        self.stdout.write(self.style.SUCCESS(f'Successfully rebuilt the floor state of {date} with {tables} tables'))
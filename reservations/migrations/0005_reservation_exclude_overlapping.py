@@ -0,0 +1,36 @@
+# Generated by Django 4.0.4 on 2026-10-18 14:48
+
+import django.contrib.postgres.constraints
+from django.contrib.postgres.operations import BtreeGistExtension
+from django.db import migrations, models
+import django.db.models.expressions
+import reservations.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservations', '0004_init_reserevation_permissions'),
+    ]
+
+    operations = [
+        # Needed to mix the table equality with the range overlap in one GiST index
+        BtreeGistExtension(),
+        migrations.AlterUniqueTogether(
+            name='reservation',
+            unique_together=set(),
+        ),
+        migrations.AlterField(
+            model_name='reservation',
+            name='persons',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='reservation',
+            constraint=models.CheckConstraint(check=models.Q(('from_time__lt', django.db.models.expressions.F('to_time'))), name='reservation_from_time_before_to_time'),
+        ),
+        migrations.AddConstraint(
+            model_name='reservation',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(expressions=[('table', '='), (reservations.models.TsRange(django.db.models.expressions.ExpressionWrapper(django.db.models.expressions.CombinedExpression(django.db.models.expressions.F('date'), '+', django.db.models.expressions.F('from_time')), output_field=models.DateTimeField()), django.db.models.expressions.ExpressionWrapper(django.db.models.expressions.CombinedExpression(django.db.models.expressions.F('date'), '+', django.db.models.expressions.F('to_time')), output_field=models.DateTimeField()), django.db.models.expressions.Value('[)')), '&&')], name='reservation_exclude_overlapping'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.0.4 on 2026-10-18 14:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservations', '0005_reservation_exclude_overlapping'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['table', 'date', 'from_time'], include=('to_time',), name='reservation_table_date_idx'),
+        ),
+        # The foreign key index is a prefix of reservation_table_date_idx
+        migrations.AlterField(
+            model_name='reservation',
+            name='table',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='reservations.table', verbose_name='Table'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['date', 'from_time'], name='reservation_date_time_idx'),
+        ),
+    ]
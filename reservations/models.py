@@ -1,3 +1,5 @@
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import DateTimeRangeField, RangeOperators
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 from django.utils import timezone
@@ -53,17 +55,58 @@ class ReservationManager(models.Manager):
         return self.get_queryset().filter(from_time__gt=now.time())
 
 
+OVERLAPPING_RESERVATION_CONSTRAINT = 'reservation_exclude_overlapping'
+RESERVATION_DURATION_CONSTRAINT = 'reservation_from_time_before_to_time'
+
+
+class TsRange(models.Func):
+    function = 'TSRANGE'
+    output_field = DateTimeRangeField()
+
+
 class Reservation(models.Model):
     date = models.DateField(_('Reservation Date'), validators=[present_or_future_date],)
     from_time = models.TimeField(_('From time'), validators=[present_or_future_time])
     to_time = models.TimeField(_('To time'), validators=[present_or_future_time])
-    table = models.ForeignKey(Table, related_name='reservations', on_delete=models.CASCADE, verbose_name=_('Table'))
+    # Covered by reservation_table_date_idx which leads with the table
+    table = models.ForeignKey(Table, related_name='reservations', on_delete=models.CASCADE, verbose_name=_('Table'),
+                              db_index=False)
     persons = models.PositiveSmallIntegerField(null=True, blank=True)
     objects = ReservationManager()
 
     class Meta:
-        unique_together = ('date', 'from_time', 'to_time')
         ordering = ['date', 'from_time']
+        indexes = [
+            # Table schedules, on_table().today().upcoming() and cascading deletes, to_time is included
+            # so loading a schedule is an index only scan
+            models.Index(fields=['table', 'date', 'from_time'], include=['to_time'],
+                         name='reservation_table_date_idx'),
+            # today().upcoming(), the default ordering and keyset pagination
+            models.Index(fields=['date', 'from_time', 'id'], name='reservation_date_time_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                check=models.Q(from_time__lt=models.F('to_time')),
+                name=RESERVATION_DURATION_CONSTRAINT,
+            ),
+            # Two reservations of the same table can not overlap, half-open ranges let them touch
+            ExclusionConstraint(
+                name=OVERLAPPING_RESERVATION_CONSTRAINT,
+                expressions=[
+                    ('table', RangeOperators.EQUAL),
+                    (
+                        TsRange(
+                            models.ExpressionWrapper(models.F('date') + models.F('from_time'),
+                                                     output_field=models.DateTimeField()),
+                            models.ExpressionWrapper(models.F('date') + models.F('to_time'),
+                                                     output_field=models.DateTimeField()),
+                            models.Value('[)'),
+                        ),
+                        RangeOperators.OVERLAPS,
+                    ),
+                ],
+            ),
+        ]
         permissions = (
             ('can_manage_reservation', 'Can manage reservation'),
         )
@@ -0,0 +1,86 @@
+import base64
+from collections import OrderedDict
+
+from django.db import models
+from django.db.models.lookups import GreaterThan
+from django.utils.dateparse import parse_date, parse_time
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class Row(models.Func):
+    function = 'ROW'
+    output_field = models.Field()
+
+
+class ReservationKeysetPagination(BasePagination):
+    """
+    Keyset pagination on the (date, from_time, id) ordering of reservations.
+
+    The cursor holds the position of the last returned reservation and the next page
+    is read with a row comparison on the (date, from_time, id) index, so there is no
+    COUNT(*) and no OFFSET and every page costs the same whatever its depth.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    page_size = api_settings.PAGE_SIZE
+    max_page_size = 1000
+    ordering = ('date', 'from_time', 'id')
+    invalid_cursor_message = _('Invalid cursor')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        position = self.decode_cursor(request)
+
+        queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            queryset = queryset.filter(
+                GreaterThan(Row(*self.ordering), Row(*(models.Value(value) for value in position)))
+            )
+
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        self.has_next = len(results) > self.page_size
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(request.query_params[self.page_size_query_param], strict=True,
+                                 cutoff=self.max_page_size)
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            date, from_time, pk = base64.urlsafe_b64decode(encoded.encode('ascii')).decode('ascii').split('|')
+            position = parse_date(date), parse_time(from_time), int(pk)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if None in position:
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    @staticmethod
+    def encode_cursor(reservation):
+        position = f'{reservation.date.isoformat()}|{reservation.from_time.isoformat()}|{reservation.id}'
+        return base64.urlsafe_b64encode(position.encode('ascii')).decode('ascii')
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
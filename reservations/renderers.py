@@ -0,0 +1,49 @@
+import json
+
+import orjson
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+_LINE_SEPARATORS = ((b'\xe2\x80\xa8', b'\\u2028'), (b'\xe2\x80\xa9', b'\\u2029'))
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    Same output as `JSONRenderer`, byte for byte, produced by orjson.
+
+    Types orjson would format differently (dates and times) and the ones it does not know
+    (lazy strings, decimals, ...) go through the DRF encoder. Indented output is left to `JSONRenderer`.
+    """
+    options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context) or not (
+                self.ensure_ascii is False and self.compact and self.strict):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        content = orjson.dumps(data, default=self.encoder_class().default, option=self.options)
+        # JSONRenderer escapes the line separators which are invalid in javascript strings
+        for separator, escaped in _LINE_SEPARATORS:
+            content = content.replace(separator, escaped)
+        return content
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Newline delimited JSON. Exports stream their body themselves, only error payloads are rendered here.
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return (json.dumps(data, default=str) + '\n').encode(self.charset)
+
+
+class CSVRenderer(NDJSONRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
@@ -0,0 +1,97 @@
+"""
+Read-only fast path for list responses.
+
+The row serializers build the same representation as their `ModelSerializer` counterparts from
+`values_list()` rows, without creating model instances or running fields one by one, and
+format every distinct time only once.
+"""
+from rest_framework import ISO_8601
+from rest_framework.settings import api_settings
+
+AVAILABILITY_TIME_FORMAT = '%I:%M %p'
+
+
+def time_formatter(output_format=None):
+    """
+    Return a function formatting times like `serializers.TimeField`, memoized per distinct value.
+    """
+    output_format = output_format or api_settings.TIME_FORMAT
+    formatted = {None: None}
+
+    def format_time(value):
+        try:
+            return formatted[value]
+        except KeyError:
+            representation = value.isoformat() if output_format.lower() == ISO_8601 else value.strftime(output_format)
+            formatted[value] = representation
+            return representation
+
+    return format_time
+
+
+class RowSerializer:
+    """
+    Serialize `values_list(*columns)` rows into dicts keyed by `fields`.
+
+    Rows may carry extra trailing columns (e.g. for pagination), only the first `len(fields)` are output.
+    """
+    fields = ()
+    columns = ()
+    extra_columns = ()
+    time_fields = ()
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    @classmethod
+    def get_columns(cls):
+        return (*cls.columns, *cls.extra_columns)
+
+    @property
+    def data(self):
+        format_time = time_formatter()
+        width = len(self.fields)
+        time_positions = [position for position, name in enumerate(self.fields) if name in self.time_fields]
+        data = []
+        for row in self.rows:
+            values = list(row[:width])
+            for position in time_positions:
+                values[position] = format_time(values[position])
+            data.append(dict(zip(self.fields, values)))
+        return data
+
+
+class TableRowSerializer(RowSerializer):
+    """
+    Rows counterpart of `TableSerializer`.
+    """
+    fields = ('id', 'number', 'number_of_seats')
+    columns = ('id', 'number', 'number_of_seats')
+
+
+class ReservationRowSerializer(RowSerializer):
+    """
+    Rows counterpart of `ReservationSerializer`, with the date kept for keyset pagination.
+    """
+    fields = ('id', 'from_time', 'to_time', 'table', 'persons')
+    columns = ('id', 'from_time', 'to_time', 'table_id', 'persons')
+    extra_columns = ('date',)
+    time_fields = ('from_time', 'to_time')
+
+
+def table_availability_data(tables, date, availability):
+    """
+    Same representation as `TableAvailabilitySerializer` for `tables` on `date`.
+    """
+    format_time = time_formatter(AVAILABILITY_TIME_FORMAT)
+    for_date = date.isoformat()
+    return [
+        {
+            'id': table.pk,
+            'number': table.number,
+            'number_of_seats': table.number_of_seats,
+            'for_date': for_date,
+            'availability': [[format_time(start), format_time(end)] for start, end in availability[table.pk]],
+        }
+        for table in tables
+    ]
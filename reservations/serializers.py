@@ -1,11 +1,22 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
+from rest_framework.serializers import as_serializer_error
 
+from .availability import TableSchedule, get_availability_boundary, load_schedule, load_schedules
+from .cache import invalidate_schedules
+from .catalog import get_table_catalog
+from .floor import record_reservations
+from .exceptions import raise_for_reservation_constraint
 from .models import Table, Reservation
-from .utils import check_availability_for_table, get_fit_table_size
+from .row_serializers import AVAILABILITY_TIME_FORMAT
+from .utils import check_availability_for_table, get_fit_table_size, present_or_future_time
 
 
 class TableSerializer(serializers.ModelSerializer):
@@ -16,7 +27,7 @@ class TableSerializer(serializers.ModelSerializer):
 
 class TableAvailabilitySerializer(serializers.ModelSerializer):
     availability = serializers.SerializerMethodField()
-    for_date = serializers.DateField(default=timezone.now().date())
+    for_date = serializers.SerializerMethodField()
 
     class Meta:
         model = Table
@@ -24,11 +35,16 @@ class TableAvailabilitySerializer(serializers.ModelSerializer):
 
     @classmethod
     def _format_string_time(cls, string_time):
-        return string_time.strftime("%I:%M %p")
+        return string_time.strftime(AVAILABILITY_TIME_FORMAT)
+
+    @extend_schema_field(OpenApiTypes.DATE)
+    def get_for_date(self, table: Table):
+        return self.context.get('for_date') or timezone.now().date()
 
     @extend_schema_field(OpenApiTypes.OBJECT)
     def get_availability(self, table: Table):
-        slots = check_availability_for_table(table)
+        availability = self.context.get('availability')
+        slots = availability[table.pk] if availability is not None else check_availability_for_table(table)
         formatted_slots = []
         # Todo: find proper way to form time
         for slot in slots:
@@ -36,6 +52,83 @@ class TableAvailabilitySerializer(serializers.ModelSerializer):
         return formatted_slots
 
 
+class AvailabilityDateRangeSerializer(serializers.Serializer):
+    from_date = serializers.DateField(required=False)
+    to_date = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        today = timezone.now().date()
+        from_date = attrs.get('from_date') or today
+        to_date = attrs.get('to_date') or from_date
+
+        if from_date < today:
+            raise serializers.ValidationError(_('The date cannot be in the past'))
+        if to_date < from_date:
+            raise serializers.ValidationError(_('Invalid from_date and to_date'))
+        if (to_date - from_date).days >= settings.AVAILABILITY_MAX_DAYS:
+            raise serializers.ValidationError(
+                _('Availability can be checked for at most %(days)s days') % {'days': settings.AVAILABILITY_MAX_DAYS}
+            )
+
+        return {'dates': [from_date + timedelta(days=day) for day in range((to_date - from_date).days + 1)]}
+
+
+def validate_reservation(table: Table, persons, from_time, to_time, fit_table_size, schedule: TableSchedule):
+    """
+    Check that a new reservation for today fits the table size and its free time slots.
+    """
+    if from_time >= to_time:
+        raise serializers.ValidationError(_('Invalid from_time and to_time'), code='invalid_time_range')
+
+    if table.number_of_seats != fit_table_size:
+        raise serializers.ValidationError(_('This table can not accept this number of customers'), code='table_size')
+
+    start_time, end_time = get_availability_boundary()
+    if not schedule.is_available(from_time, to_time, start_time, end_time):
+        raise serializers.ValidationError(_('Invalid dates'), code='unavailable')
+
+
+class FirstAvailableQuerySerializer(serializers.Serializer):
+    number_of_persons = serializers.IntegerField(min_value=1)
+    duration = serializers.IntegerField(min_value=1, max_value=24 * 60, help_text=_('Duration in minutes'))
+    date = serializers.DateField(required=False)
+    earliest_time = serializers.TimeField(required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=50, default=5)
+
+    @classmethod
+    def validate_date(cls, date):
+        if date < timezone.now().date():
+            raise serializers.ValidationError(_('The date cannot be in the past'))
+        return date
+
+    @classmethod
+    def validate_duration(cls, duration):
+        return timedelta(minutes=duration)
+
+
+class FirstAvailableSerializer(serializers.Serializer):
+    table = TableSerializer()
+    date = serializers.DateField()
+    from_time = serializers.TimeField()
+    to_time = serializers.TimeField()
+
+
+class WalkInQuerySerializer(serializers.Serializer):
+    number_of_persons = serializers.IntegerField(min_value=1)
+    duration = serializers.IntegerField(min_value=0, max_value=24 * 60, default=0,
+                                        help_text=_('Minutes the table must stay free, any free table by default'))
+    limit = serializers.IntegerField(min_value=1, max_value=50, default=5)
+
+    @classmethod
+    def validate_duration(cls, duration):
+        return timedelta(minutes=duration)
+
+
+class WalkInSerializer(serializers.Serializer):
+    table = TableSerializer()
+    free_until = serializers.TimeField()
+
+
 class ReservationSerializer(serializers.ModelSerializer):
     table = serializers.PrimaryKeyRelatedField(queryset=Table.objects.all())
 
@@ -44,30 +137,86 @@ class ReservationSerializer(serializers.ModelSerializer):
         fields = ('id', 'from_time', 'to_time', 'table', 'persons')
 
     def validate(self, attrs):
-        from_time = attrs.get('from_time')
-        to_time = attrs.get('to_time')
-        persons = attrs.get('persons')
         table: Table = attrs.get('table')
-        valid_duration = False
-
-        if from_time > to_time:
-            raise serializers.ValidationError(_('Invalid from_time and to_time'))
-
-        if table.number_of_seats != get_fit_table_size(persons):
-            raise serializers.ValidationError(_('This table can not accept this number of customers'))
-
-        # todo: make check_availability_for_table return hash for each time slot to avoid this ugly for loop
-        for slot in check_availability_for_table(table=attrs.get('table')):
-            # todo: no need to go thorough each time slot since time slots are ordered
-            if (slot[1] > from_time > slot[0]) and (slot[1] > to_time > slot[0]):
-                valid_duration = True
-                break
-
-        if not valid_duration:
-            raise serializers.ValidationError(_('Invalid dates'))
-
+        persons = attrs.get('persons')
+        validate_reservation(
+            table, persons, attrs.get('from_time'), attrs.get('to_time'),
+            fit_table_size=get_fit_table_size(persons),
+            schedule=load_schedule(table.pk, timezone.now().date()),
+        )
         return attrs
 
     def create(self, validated_data):
         validated_data.update(date=timezone.now().date())
-        return super().create(validated_data)
+        try:
+            with transaction.atomic():
+                return super().create(validated_data)
+        except IntegrityError as error:
+            raise_for_reservation_constraint(error)
+
+
+class BulkReservationListSerializer(serializers.ListSerializer):
+    """
+    Validate a batch of reservations against one snapshot of today's schedule,
+    including the conflicts between the reservations of the batch, and create them at once.
+    """
+
+    def to_internal_value(self, data):
+        items = super().to_internal_value(data)
+
+        table_ids = {item['table_id'] for item in items}
+        tables = Table.objects.in_bulk(table_ids)
+        catalog = get_table_catalog()
+        schedules = load_schedules(list(tables), timezone.now().date())
+
+        errors = []
+        for item in items:
+            table = tables.get(item['table_id'])
+            if table is None:
+                message = serializers.PrimaryKeyRelatedField.default_error_messages['does_not_exist']
+                errors.append({'table': [message.format(pk_value=item['table_id'])]})
+                continue
+            try:
+                validate_reservation(
+                    table, item['persons'], item['from_time'], item['to_time'],
+                    fit_table_size=catalog.fit_table_size(item['persons']),
+                    schedule=schedules[table.pk],
+                )
+            except serializers.ValidationError as error:
+                errors.append(as_serializer_error(error))
+            else:
+                # Later reservations of the batch must not overlap this one either
+                schedules[table.pk].add(item['from_time'], item['to_time'])
+                errors.append({})
+
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return items
+
+    def create(self, validated_data):
+        date = timezone.now().date()
+        try:
+            with transaction.atomic():
+                reservations = Reservation.objects.bulk_create(
+                    [Reservation(date=date, **item) for item in validated_data]
+                )
+        except IntegrityError as error:
+            raise_for_reservation_constraint(error)
+        # bulk_create does not send post_save
+        invalidate_schedules((reservation.table_id, reservation.date) for reservation in reservations)
+        record_reservations(added=[
+            (reservation.table_id, reservation.date, reservation.from_time, reservation.to_time)
+            for reservation in reservations
+        ])
+        return reservations
+
+
+class BulkReservationSerializer(serializers.Serializer):
+    id = serializers.IntegerField(read_only=True)
+    from_time = serializers.TimeField(validators=[present_or_future_time])
+    to_time = serializers.TimeField(validators=[present_or_future_time])
+    table = serializers.IntegerField(source='table_id')
+    persons = serializers.IntegerField(min_value=1, max_value=32767)
+
+    class Meta:
+        list_serializer_class = BulkReservationListSerializer
@@ -0,0 +1,68 @@
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete
+from django.dispatch import receiver
+
+from reservations.cache import invalidate_schedules, invalidate_table_catalog
+from reservations.floor import record_reservations, record_table
+from reservations.models import Reservation, Table
+
+
+INTERVAL_FIELDS = ('table_id', 'date', 'from_time', 'to_time')
+
+
+def get_interval(instance: Reservation):
+    # Read from __dict__ so deferred fields are not loaded one query per instance
+    return tuple(instance.__dict__.get(field) for field in INTERVAL_FIELDS)
+
+
+@receiver(post_init, sender=Reservation)
+def remember_reservation_schedule(sender, instance: Reservation, **kwargs):
+    # Keep the (table, date) the reservation was loaded with, so moving it invalidates both schedules
+    instance._loaded_interval = get_interval(instance)
+    instance._loaded_schedule = instance._loaded_interval[:2]
+
+
+@receiver(pre_delete, sender=Reservation)
+def load_deleted_interval(sender, instance: Reservation, **kwargs):
+    # The schedule and floor handlers need the interval once the row is gone, load what was deferred while it exists
+    deferred = [field for field in INTERVAL_FIELDS if field not in instance.__dict__]
+    if deferred:
+        instance.refresh_from_db(fields=deferred)
+
+
+@receiver(post_save, sender=Reservation)
+@receiver(post_delete, sender=Reservation)
+def invalidate_reservation_schedule(sender, instance: Reservation, **kwargs):
+    current_schedule = get_interval(instance)[:2]
+    invalidate_schedules([instance._loaded_schedule, current_schedule])
+    instance._loaded_schedule = current_schedule
+
+
+@receiver(post_save, sender=Reservation)
+def add_reservation_to_floor(sender, instance: Reservation, created, **kwargs):
+    current, loaded = get_interval(instance), instance._loaded_interval
+    instance._loaded_interval = current
+    if created:
+        record_reservations(added=[current])
+    elif current != loaded:
+        record_reservations(added=[current], removed=[loaded])
+
+
+@receiver(post_delete, sender=Reservation)
+def remove_reservation_from_floor(sender, instance: Reservation, **kwargs):
+    record_reservations(removed=[get_interval(instance)])
+
+
+@receiver(post_save, sender=Table)
+@receiver(post_delete, sender=Table)
+def invalidate_catalog(sender, instance: Table, **kwargs):
+    invalidate_table_catalog()
+
+
+@receiver(post_save, sender=Table)
+def update_table_on_floor(sender, instance: Table, **kwargs):
+    record_table(instance)
+
+
+@receiver(post_delete, sender=Table)
+def remove_table_from_floor(sender, instance: Table, **kwargs):
+    record_table(instance, deleted=True)
@@ -1,16 +1,75 @@
+import asyncio
+import copy
+import csv
 import datetime
+import importlib
+import io
+import itertools
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+import unittest
+import uuid
+from collections import OrderedDict
+from decimal import Decimal
 
 from unittest import mock
 
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+from django.core.cache import cache
+from django.db import IntegrityError, connection, models, transaction
+from django.core.management import CommandError, call_command
+from django.db.models.lookups import GreaterThan
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import ResolverMatch, resolve
 from django.utils import timezone
-from rest_framework import status
+from django.utils.module_loading import import_string
+from django.utils.translation import gettext_lazy as _
+from rest_framework import mixins, status
+from rest_framework.exceptions import ErrorDetail
+from rest_framework.renderers import JSONRenderer
 from rest_framework.reverse import reverse
 from rest_framework.test import APITestCase
+from prometheus_client import REGISTRY, CollectorRegistry
+from redis import Redis
+from redis.exceptions import ConnectionError as RedisConnectionError, RedisError
 
+from health_check.backends import BaseHealthCheckBackend
+from health_check.plugins import plugin_dir
+from resvy.health import HealthMonitor, liveness_view, readiness_view, run_checks
+from resvy.metrics import get_registry
+from resvy.query_budget import (
+    QueryBudgetExceeded, QueryBudgetMiddleware, get_query_budget, query_budget, record_query,
+)
 from users.models import Role
 from users.tests.factories import UserWithTokenFactory
 from .factories import TableFactory
+from ..availability import TableSchedule, load_schedule, load_schedules, load_schedules_for_dates, query_schedules
+from ..backends import SQLAvailabilityBackend, get_availability_backend
+from ..cache import (
+    acquire_schedule_lock,
+    cache_schedules,
+    get_schedule_versions,
+    invalidate_schedules,
+    schedule_version_key,
+)
+from ..catalog import TableCatalog
+from ..export import stream
+from .. import floor
+from ..management.commands.benchmark import asgi_request, compare_to_baseline, get_slots, percentile, summarize
+from ..pagination import Row
 from ..models import Table, Reservation
+from ..renderers import ORJSONRenderer
+from ..row_serializers import ReservationRowSerializer, TableRowSerializer
+from ..serializers import ReservationSerializer, TableAvailabilitySerializer, TableSerializer
+from ..views import ReservationView, RowListModelMixin, TableView
 
 
 class TableTestCase(APITestCase):
@@ -153,6 +212,52 @@ class AvailabilityTestCases(APITestCase):
         time_slot = response.json()[0]['availability']
         self.assertFalse(time_slot)
 
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 13, 00))
+    def test_availability_is_computed_per_table(self, _):
+        busy_table = Table.objects.create(number=1, number_of_seats=4)
+        free_table = Table.objects.create(number=2, number_of_seats=4)
+        Reservation.objects.create(
+            date=datetime.date(2030, 1, 1),
+            from_time=datetime.time(16, 00),
+            to_time=datetime.time(16, 30),
+            table=busy_table,
+            persons=3
+        )
+        response = self.client.get(reverse('tables-api-availability') + '?number_of_persons=3')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        availability = {table['id']: table['availability'] for table in response.json()}
+        self.assertEqual(availability[busy_table.id], [["01:00 PM", "04:00 PM"], ["04:30 PM", "11:59 PM"]])
+        self.assertEqual(availability[free_table.id], [["01:00 PM", "11:59 PM"]])
+
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 13, 00))
+    def test_availability_number_of_queries_does_not_depend_on_number_of_tables(self, _):
+        url = reverse('tables-api-availability') + '?number_of_persons=3'
+        table = Table.objects.create(number=1, number_of_seats=4)
+        Reservation.objects.create(
+            date=datetime.date(2030, 1, 1),
+            from_time=datetime.time(16, 00),
+            to_time=datetime.time(16, 30),
+            table=table,
+            persons=3
+        )
+        with CaptureQueriesContext(connection) as one_table_queries:
+            self.client.get(url)
+
+        for number in range(2, 12):
+            table = Table.objects.create(number=number, number_of_seats=4)
+            Reservation.objects.create(
+                date=datetime.date(2030, 1, 1),
+                from_time=datetime.time(16, number),
+                to_time=datetime.time(16, 30),
+                table=table,
+                persons=3
+            )
+        with CaptureQueriesContext(connection) as many_tables_queries:
+            response = self.client.get(url)
+
+        self.assertEqual(len(response.json()), 11)
+        self.assertEqual(len(one_table_queries), len(many_tables_queries))
+
     @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 5, 00))
     def test_when_admin_pass_invalid_number_of_person_will_fail(self, _):
         Table.objects.create(number=1, number_of_seats=2)
@@ -168,6 +273,748 @@ class AvailabilityTestCases(APITestCase):
         # todo check for the response payload
 
 
+class DateRangeAvailabilityTestCases(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_user = UserWithTokenFactory()
+        cls.admin_user.groups.add(Role.objects.get(name=Role.ADMIN))
+        cls.table = Table.objects.create(number=1, number_of_seats=4)
+        Reservation.objects.create(
+            date=datetime.date(2030, 1, 3),
+            from_time=datetime.time(19, 00),
+            to_time=datetime.time(20, 00),
+            table=cls.table,
+            persons=4
+        )
+        cls.availability_url = reverse('tables-api-availability') + '?number_of_persons=3'
+
+    def setUp(self) -> None:
+        self.client.credentials(**self.admin_user.credentials)
+
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 13, 00))
+    def test_availability_for_future_date_starts_at_opening_time(self, _):
+        response = self.client.get(self.availability_url + '&from_date=2030-01-03')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(len(data), 1)
+        self.assertEqual(data[0]['for_date'], '2030-01-03')
+        self.assertEqual(data[0]['availability'], [["12:00 PM", "07:00 PM"], ["08:00 PM", "11:59 PM"]])
+
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 13, 00))
+    def test_availability_for_date_range_returns_every_day(self, _):
+        response = self.client.get(self.availability_url + '&from_date=2030-01-01&to_date=2030-01-03')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual([table['for_date'] for table in data], ['2030-01-01', '2030-01-02', '2030-01-03'])
+        self.assertEqual(data[0]['availability'], [["01:00 PM", "11:59 PM"]])
+        self.assertEqual(data[1]['availability'], [["12:00 PM", "11:59 PM"]])
+        self.assertEqual(data[2]['availability'], [["12:00 PM", "07:00 PM"], ["08:00 PM", "11:59 PM"]])
+
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 2, 1, 00))
+    def test_availability_defaults_to_current_date(self, _):
+        response = self.client.get(self.availability_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()[0]['for_date'], '2030-01-02')
+
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 13, 00))
+    def test_availability_number_of_queries_does_not_depend_on_number_of_days(self, _):
+        with CaptureQueriesContext(connection) as one_day_queries:
+            self.client.get(self.availability_url)
+        with CaptureQueriesContext(connection) as week_queries:
+            response = self.client.get(self.availability_url + '&from_date=2030-01-01&to_date=2030-01-07')
+        self.assertEqual(len(response.json()), 7)
+        self.assertEqual(len(one_day_queries), len(week_queries))
+
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 13, 00))
+    def test_availability_for_past_date_will_fail(self, _):
+        response = self.client.get(self.availability_url + '&from_date=2029-12-31')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 13, 00))
+    def test_availability_for_reversed_date_range_will_fail(self, _):
+        response = self.client.get(self.availability_url + '&from_date=2030-01-03&to_date=2030-01-02')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(AVAILABILITY_MAX_DAYS=7)
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 13, 00))
+    def test_availability_for_too_long_date_range_will_fail(self, _):
+        response = self.client.get(self.availability_url + '&from_date=2030-01-01&to_date=2030-01-08')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class AvailabilityCacheTestCases(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_user = UserWithTokenFactory()
+        cls.admin_user.groups.add(Role.objects.get(name=Role.ADMIN))
+        cls.table = Table.objects.create(number=1, number_of_seats=4)
+        cls.availability_url = reverse('tables-api-availability') + '?number_of_persons=3'
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.client.credentials(**self.admin_user.credentials)
+
+    @staticmethod
+    def _reservation_queries(queries):
+        return [query for query in queries if 'reservations_reservation' in query['sql']]
+
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 13, 00))
+    def test_cached_availability_does_not_query_reservations(self, _):
+        self.client.get(self.availability_url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.availability_url)
+        self.assertEqual(response.json()[0]['availability'], [["01:00 PM", "11:59 PM"]])
+        self.assertFalse(self._reservation_queries(queries))
+
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 13, 00))
+    def test_creating_reservation_invalidates_cached_availability(self, _):
+        self.client.get(self.availability_url)
+        Reservation.objects.create(
+            date=datetime.date(2030, 1, 1),
+            from_time=datetime.time(16, 00),
+            to_time=datetime.time(16, 30),
+            table=self.table,
+            persons=3
+        )
+        response = self.client.get(self.availability_url)
+        self.assertEqual(response.json()[0]['availability'], [["01:00 PM", "04:00 PM"], ["04:30 PM", "11:59 PM"]])
+
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 13, 00))
+    def test_deleting_reservation_invalidates_cached_availability(self, _):
+        reservation = Reservation.objects.create(
+            date=datetime.date(2030, 1, 1),
+            from_time=datetime.time(16, 00),
+            to_time=datetime.time(16, 30),
+            table=self.table,
+            persons=3
+        )
+        self.client.get(self.availability_url)
+        response = self.client.delete(reverse('reservation-api-detail', kwargs={'pk': reservation.pk}))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        response = self.client.get(self.availability_url)
+        self.assertEqual(response.json()[0]['availability'], [["01:00 PM", "11:59 PM"]])
+
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 13, 00))
+    def test_deleting_deferred_reservation_invalidates_cached_availability(self, _):
+        reservation = Reservation.objects.create(
+            date=datetime.date(2030, 1, 1),
+            from_time=datetime.time(16, 00),
+            to_time=datetime.time(16, 30),
+            table=self.table,
+            persons=3
+        )
+        self.client.get(self.availability_url)
+        Reservation.objects.only('id').get(pk=reservation.pk).delete()
+        response = self.client.get(self.availability_url)
+        self.assertEqual(response.json()[0]['availability'], [["01:00 PM", "11:59 PM"]])
+
+    def test_loading_deferred_reservations_runs_no_extra_query(self):
+        Reservation.objects.bulk_create(
+            Reservation(date=datetime.date(2030, 1, 1), from_time=datetime.time(hour, 00),
+                        to_time=datetime.time(hour, 30), table=self.table, persons=3)
+            for hour in (13, 15)
+        )
+        with self.assertNumQueries(1):
+            reservations = list(Reservation.objects.only('pk'))
+        self.assertEqual([reservation._loaded_schedule for reservation in reservations], [(None, None)] * 2)
+
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 13, 00))
+    def test_moving_reservation_invalidates_both_dates(self, _):
+        reservation = Reservation.objects.create(
+            date=datetime.date(2030, 1, 1),
+            from_time=datetime.time(16, 00),
+            to_time=datetime.time(16, 30),
+            table=self.table,
+            persons=3
+        )
+        self.client.get(self.availability_url)
+        reservation = Reservation.objects.get(pk=reservation.pk)
+        reservation.date = datetime.date(2030, 1, 2)
+        reservation.save()
+        response = self.client.get(self.availability_url)
+        self.assertEqual(response.json()[0]['availability'], [["01:00 PM", "11:59 PM"]])
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    AVAILABILITY_LOCK_WAIT=0.05,
+)
+class SingleFlightTestCases(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.table = Table.objects.create(number=1, number_of_seats=4)
+        cls.date = datetime.date(2030, 1, 1)
+        Reservation.objects.create(
+            date=cls.date,
+            from_time=datetime.time(16, 00),
+            to_time=datetime.time(16, 30),
+            table=cls.table,
+            persons=3
+        )
+
+    def setUp(self) -> None:
+        cache.clear()
+
+    def test_leader_loads_schedule_and_releases_lock(self):
+        with self.assertNumQueries(1):
+            schedule = load_schedule(self.table.pk, self.date)
+        self.assertEqual(schedule.starts, [datetime.time(16, 00)])
+        self.assertTrue(acquire_schedule_lock(self.table.pk, self.date))
+
+    def test_follower_waits_for_leader_schedule(self):
+        self.assertTrue(acquire_schedule_lock(self.table.pk, self.date))
+        published = TableSchedule(self.table.pk, self.date, [(datetime.time(18, 00), datetime.time(19, 00))])
+
+        with mock.patch('reservations.availability.time.sleep', side_effect=lambda _: cache_schedules([published])):
+            with self.assertNumQueries(0):
+                schedule = load_schedule(self.table.pk, self.date)
+        self.assertEqual(schedule.starts, [datetime.time(18, 00)])
+
+    def test_follower_serves_stale_schedule_when_leader_is_slow(self):
+        load_schedule(self.table.pk, self.date)
+        invalidate_schedules([(self.table.pk, self.date)])
+        self.assertTrue(acquire_schedule_lock(self.table.pk, self.date))
+
+        with self.assertNumQueries(0):
+            schedules = load_schedules([self.table.pk], self.date, allow_stale=True)
+        self.assertEqual(schedules[self.table.pk].starts, [datetime.time(16, 00)])
+
+    def test_schedule_loaded_before_a_write_is_not_served_after_it(self):
+        def delete_then_cache(schedules, versions):
+            # The reservation is deleted after the leader read the database, before it caches the schedule
+            with self.captureOnCommitCallbacks(execute=True):
+                Reservation.objects.get(table=self.table, date=self.date).delete()
+            cache_schedules(schedules, versions)
+
+        with mock.patch('reservations.availability.cache_schedules', side_effect=delete_then_cache):
+            self.assertEqual(load_schedule(self.table.pk, self.date).starts, [datetime.time(16, 00)])
+        self.assertEqual(load_schedule(self.table.pk, self.date).starts, [])
+
+    def test_write_keeps_the_schedules_of_other_tables_on_the_date(self):
+        other_table = Table.objects.create(number=2, number_of_seats=4)
+        load_schedules([self.table.pk, other_table.pk], self.date)
+        with self.captureOnCommitCallbacks(execute=True):
+            Reservation.objects.get(table=self.table, date=self.date).delete()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(load_schedule(other_table.pk, self.date).starts, [])
+        with self.assertNumQueries(1):
+            self.assertEqual(load_schedule(self.table.pk, self.date).starts, [])
+
+    def test_follower_without_stale_fallback_loads_schedule_itself(self):
+        self.assertTrue(acquire_schedule_lock(self.table.pk, self.date))
+        with self.assertNumQueries(1):
+            schedule = load_schedule(self.table.pk, self.date)
+        self.assertEqual(schedule.starts, [datetime.time(16, 00)])
+
+
+class FirstAvailableTestCases(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_user = UserWithTokenFactory()
+        cls.admin_user.groups.add(Role.objects.get(name=Role.ADMIN))
+        cls.small_table = Table.objects.create(number=1, number_of_seats=4)
+        cls.other_small_table = Table.objects.create(number=2, number_of_seats=4)
+        cls.big_table = Table.objects.create(number=3, number_of_seats=8)
+        cls.tiny_table = Table.objects.create(number=4, number_of_seats=2)
+        for table, from_time, to_time in [
+            (cls.small_table, datetime.time(13, 30), datetime.time(15, 00)),
+            (cls.small_table, datetime.time(16, 00), datetime.time(18, 00)),
+            (cls.other_small_table, datetime.time(13, 00), datetime.time(20, 00)),
+        ]:
+            Reservation.objects.create(
+                date=datetime.date(2030, 1, 1), from_time=from_time, to_time=to_time, table=table, persons=4
+            )
+        cls.url = reverse('tables-api-first-available')
+
+    def setUp(self) -> None:
+        self.client.credentials(**self.admin_user.credentials)
+
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 13, 00))
+    def test_smallest_fitting_tables_come_first_then_earliest_start(self, _):
+        response = self.client.get(self.url + '?number_of_persons=3&duration=90')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(
+            [(item['table']['id'], item['from_time'], item['to_time']) for item in data],
+            [
+                (self.small_table.id, '06:00 PM', '07:30 PM'),
+                (self.other_small_table.id, '08:00 PM', '09:30 PM'),
+                (self.big_table.id, '01:00 PM', '02:30 PM'),
+            ]
+        )
+        self.assertEqual(data[0]['date'], '2030-01-01')
+
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 13, 00))
+    def test_short_duration_fits_in_earlier_gaps(self, _):
+        response = self.client.get(self.url + '?number_of_persons=3&duration=60&limit=1')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(len(data), 1)
+        self.assertEqual((data[0]['table']['id'], data[0]['from_time']), (self.small_table.id, '03:00 PM'))
+
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 13, 00))
+    def test_earliest_time_is_respected(self, _):
+        response = self.client.get(self.url + '?number_of_persons=7&duration=60&earliest_time=21:00')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual([(item['table']['id'], item['from_time']) for item in data], [(self.big_table.id, '09:00 PM')])
+
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 13, 00))
+    def test_first_available_runs_one_reservation_query(self, _):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url + '?number_of_persons=1&duration=30')
+        self.assertEqual(len([query for query in queries if 'reservations_reservation' in query['sql']]), 1)
+
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 13, 00))
+    def test_party_bigger_than_any_table_will_fail(self, _):
+        response = self.client.get(self.url + '?number_of_persons=9&duration=30')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 13, 00))
+    def test_missing_duration_will_fail(self, _):
+        response = self.client.get(self.url + '?number_of_persons=2')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('duration', response.json())
+
+
+def is_redis_available():
+    try:
+        return Redis.from_url(settings.REDIS_CACHE['LOCATION'], socket_connect_timeout=0.2).ping()
+    except RedisError:
+        return False
+
+
+class AvailabilityBackendConformance:
+    """
+    Behaviour every availability backend shares, checked against the schedules built straight from the database.
+    """
+    backend_path = None
+    date = datetime.date(2030, 1, 1)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tables = Table.objects.bulk_create(Table(number=number, number_of_seats=4) for number in range(1, 4))
+        cls.table_ids = [table.pk for table in cls.tables]
+        cls.dates = [cls.date, cls.date + datetime.timedelta(days=1)]
+        Reservation.objects.bulk_create(
+            Reservation(date=date, table=table, persons=2, from_time=datetime.time(hour, minute),
+                        to_time=datetime.time(hour + 1, minute))
+            for table, date, hour, minute in [
+                (cls.tables[0], cls.date, 13, 0), (cls.tables[0], cls.date, 14, 0), (cls.tables[0], cls.date, 18, 30),
+                (cls.tables[1], cls.date, 20, 15), (cls.tables[0], cls.dates[1], 12, 0),
+            ]
+        )
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.backend = import_string(self.backend_path)()
+
+    def load(self):
+        return self.backend.load_schedules_for_dates(self.table_ids, self.dates)
+
+    def assertMatchesDatabase(self, schedules):
+        expected = SQLAvailabilityBackend().load_schedules_for_dates(self.table_ids, self.dates)
+        self.assertEqual(
+            {table_date: (schedule.starts, schedule.ends) for table_date, schedule in schedules.items()},
+            {table_date: (schedule.starts, schedule.ends) for table_date, schedule in expected.items()},
+        )
+
+    def test_loads_every_table_on_every_date(self):
+        schedules = self.load()
+        self.assertMatchesDatabase(schedules)
+        first = schedules[self.table_ids[0], self.date]
+        self.assertEqual((first.table_id, first.date), (self.table_ids[0], self.date))
+        self.assertEqual(first.free_slots(datetime.time(12, 0), datetime.time(23, 59)), [
+            (datetime.time(12, 0), datetime.time(13, 0)),
+            (datetime.time(15, 0), datetime.time(18, 30)),
+            (datetime.time(19, 30), datetime.time(23, 59)),
+        ])
+        self.assertEqual(len(schedules[self.table_ids[2], self.date]), 0)
+
+    def test_loads_the_same_schedules_again(self):
+        self.assertMatchesDatabase(self.load())
+        self.assertMatchesDatabase(self.load())
+
+    def test_async_loads_the_same_schedules(self):
+        schedules = async_to_sync(self.backend.aload_schedules_for_dates)(self.table_ids, self.dates)
+        self.assertMatchesDatabase(schedules)
+
+    def test_changing_loaded_schedules_does_not_leak(self):
+        self.load()[self.table_ids[2], self.date].add(datetime.time(12, 0), datetime.time(13, 0))
+        self.assertMatchesDatabase(self.load())
+
+    def test_sees_created_reservation(self):
+        self.load()
+        with self.captureOnCommitCallbacks(execute=True):
+            Reservation.objects.create(date=self.date, table=self.tables[2], persons=2,
+                                       from_time=datetime.time(16, 0), to_time=datetime.time(16, 30))
+        self.assertMatchesDatabase(self.load())
+
+    def test_sees_deleted_reservation(self):
+        self.load()
+        with self.captureOnCommitCallbacks(execute=True):
+            Reservation.objects.filter(table=self.tables[1]).get().delete()
+        self.assertMatchesDatabase(self.load())
+
+    def test_sees_moved_reservation(self):
+        self.load()
+        reservation = Reservation.objects.get(table=self.tables[0], date=self.dates[1])
+        reservation.date = self.date
+        reservation.table = self.tables[2]
+        with self.captureOnCommitCallbacks(execute=True):
+            reservation.save()
+        self.assertMatchesDatabase(self.load())
+
+    def test_selected_by_setting(self):
+        with override_settings(AVAILABILITY_BACKEND=self.backend_path):
+            backend = get_availability_backend()
+            self.assertIsInstance(backend, import_string(self.backend_path))
+            self.assertIs(get_availability_backend(), backend)
+            self.assertEqual(load_schedules(self.table_ids, self.date).keys(), set(self.table_ids))
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class SQLAvailabilityBackendTestCases(AvailabilityBackendConformance, TestCase):
+    backend_path = 'reservations.backends.SQLAvailabilityBackend'
+
+    def test_every_lookup_queries(self):
+        self.load()
+        with self.assertNumQueries(1):
+            self.load()
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class InMemoryAvailabilityBackendTestCases(AvailabilityBackendConformance, TestCase):
+    backend_path = 'reservations.backends.InMemoryAvailabilityBackend'
+
+    def test_warm_lookup_does_not_query(self):
+        self.load()
+        with self.assertNumQueries(0):
+            self.load()
+
+    def test_forgets_past_dates(self):
+        self.load()
+        with mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 2, 12, 00)):
+            self.backend.load_schedules_for_dates(self.table_ids, [self.dates[1]])
+        self.assertEqual({date for _table_id, date in self.backend.schedules}, {self.dates[1]})
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+    def test_without_shared_cache_every_lookup_queries(self):
+        self.load()
+        with self.assertNumQueries(1):
+            schedules = self.load()
+        self.assertMatchesDatabase(schedules)
+        self.assertEqual(self.backend.schedules, {})
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class CachedAvailabilityBackendTestCases(AvailabilityBackendConformance, TestCase):
+    backend_path = 'reservations.backends.CachedAvailabilityBackend'
+
+    def test_warm_lookup_does_not_query(self):
+        self.load()
+        with self.assertNumQueries(0):
+            self.load()
+
+
+@unittest.skipUnless(is_redis_available(), 'Redis is not reachable')
+@override_settings(CACHES={'default': settings.REDIS_CACHE})
+class RedisAvailabilityBackendTestCases(AvailabilityBackendConformance, TestCase):
+    backend_path = 'reservations.backends.CachedAvailabilityBackend'
+
+
+@mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 13, 00))
+class WalkInTestCases(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_user = UserWithTokenFactory()
+        cls.admin_user.groups.add(Role.objects.get(name=Role.ADMIN))
+        cls.small_table = Table.objects.create(number=1, number_of_seats=4)
+        cls.busy_table = Table.objects.create(number=2, number_of_seats=4)
+        cls.big_table = Table.objects.create(number=3, number_of_seats=8)
+        cls.tiny_table = Table.objects.create(number=4, number_of_seats=2)
+        for table, from_time, to_time in [
+            (cls.small_table, datetime.time(14, 00), datetime.time(15, 00)),
+            (cls.busy_table, datetime.time(12, 30), datetime.time(13, 30)),
+            (cls.big_table, datetime.time(20, 00), datetime.time(21, 00)),
+        ]:
+            Reservation.objects.create(
+                date=datetime.date(2030, 1, 1), from_time=from_time, to_time=to_time, table=table, persons=2
+            )
+        cls.url = reverse('tables-api-walk-in')
+
+    def setUp(self) -> None:
+        self.client.credentials(**self.admin_user.credentials)
+
+    def walk_in(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [(item['table']['id'], item['free_until']) for item in response.json()]
+
+    def test_free_tables_by_size_then_soonest_busy(self, _):
+        self.assertEqual(self.walk_in(number_of_persons=3), [
+            (self.small_table.id, '02:00 PM'), (self.big_table.id, '08:00 PM'),
+        ])
+        self.assertEqual(self.walk_in(number_of_persons=1, limit=2), [
+            (self.tiny_table.id, '11:59 PM'), (self.small_table.id, '02:00 PM'),
+        ])
+
+    def test_tables_must_stay_free_for_the_duration(self, _):
+        self.assertEqual(self.walk_in(number_of_persons=3, duration=60), [
+            (self.small_table.id, '02:00 PM'), (self.big_table.id, '08:00 PM'),
+        ])
+        self.assertEqual(self.walk_in(number_of_persons=3, duration=61), [(self.big_table.id, '08:00 PM')])
+
+    def test_party_bigger_than_any_table_gets_no_table(self, _):
+        self.assertEqual(self.walk_in(number_of_persons=9), [])
+
+    def test_invalid_query_will_fail(self, _):
+        response = self.client.get(self.url, {'number_of_persons': 0})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('number_of_persons', response.json())
+
+    @override_settings(FLOOR_STATE_ENABLED=True)
+    def test_redis_failure_falls_back_to_schedules(self, _):
+        with mock.patch('reservations.floor.get_redis_connection', side_effect=RedisConnectionError), \
+                self.assertLogs('reservations.floor', 'ERROR'):
+            self.assertEqual(self.walk_in(number_of_persons=5), [(self.big_table.id, '08:00 PM')])
+
+
+@override_settings(FLOOR_STATE_ENABLED=True)
+@mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 13, 00))
+class FloorStateUpdateTestCases(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.table = Table.objects.create(number=1, number_of_seats=4)
+        cls.other_table = Table.objects.create(number=2, number_of_seats=2)
+
+    def setUp(self) -> None:
+        patcher = mock.patch('reservations.floor._run')
+        self.run = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def calls(self):
+        return [call.args for call in self.run.call_args_list]
+
+    def member(self, table):
+        return floor.table_member(table.pk)
+
+    def create(self, table, from_hour, date=datetime.date(2030, 1, 1)):
+        return Reservation.objects.create(date=date, from_time=datetime.time(from_hour), persons=2,
+                                          to_time=datetime.time(from_hour + 1), table=table)
+
+    def test_reservation_changes_are_applied_after_commit(self, _):
+        with self.captureOnCommitCallbacks(execute=True):
+            reservation = self.create(self.table, 14)
+            self.assertFalse(self.run.called)
+        date = datetime.date(2030, 1, 1)
+        self.assertEqual(self.calls(), [('update_reservations', date, self.member(self.table), 0, '50400:54000')])
+
+        self.run.reset_mock()
+        with self.captureOnCommitCallbacks(execute=True):
+            reservation.table = self.other_table
+            reservation.save()
+        self.assertEqual(self.calls(), [
+            ('update_reservations', date, self.member(self.table), 1, '50400:54000'),
+            ('update_reservations', date, self.member(self.other_table), 0, '50400:54000'),
+        ])
+
+        self.run.reset_mock()
+        with self.captureOnCommitCallbacks(execute=True):
+            Reservation.objects.get(pk=reservation.pk).delete()
+        self.assertEqual(self.calls(), [('update_reservations', date, self.member(self.other_table), 1, '50400:54000')])
+
+    def test_deleting_deferred_reservation_removes_it(self, _):
+        reservation = self.create(self.table, 14)
+        with self.captureOnCommitCallbacks(execute=True):
+            Reservation.objects.only('id').get(pk=reservation.pk).delete()
+        self.assertEqual(self.calls(), [
+            ('update_reservations', datetime.date(2030, 1, 1), self.member(self.table), 1, '50400:54000'),
+        ])
+
+    def test_saving_deferred_reservation_leaves_its_interval(self, _):
+        reservation = self.create(self.table, 14)
+        reservation = Reservation.objects.only('id', 'persons').get(pk=reservation.pk)
+        reservation.persons = 3
+        with self.captureOnCommitCallbacks(execute=True):
+            reservation.save()
+        self.assertFalse(self.run.called)
+
+    def test_other_dates_are_ignored(self, _):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create(self.table, 14, date=datetime.date(2030, 1, 2))
+        self.assertFalse(self.run.called)
+
+    def test_table_changes_are_applied(self, _):
+        date = datetime.date(2030, 1, 1)
+        table_id = self.other_table.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            self.table.number_of_seats = 6
+            self.table.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other_table.delete()
+        self.assertEqual(self.calls(), [
+            ('update_table', date, self.member(self.table), '1:6'),
+            ('update_table', date, floor.table_member(table_id), ''),
+        ])
+
+    @mock.patch('reservations.floor.get_redis_connection')
+    def test_build_starts_over_when_a_write_is_applied_meanwhile(self, get_redis_connection, _):
+        date = datetime.date(2030, 1, 1)
+        connection = get_redis_connection.return_value
+        connection.get.side_effect = [b'1', b'2', b'3', b'4', b'5']
+        connection.scan_iter.return_value = [b'floor:2030-01-01:tables', b'floor:2030-01-01:sequence']
+        self.run.side_effect = [0, 1]
+        self.assertEqual(floor.build_floor_state(date), 2)
+        self.assertEqual(self.calls(), [('refresh_all', date, b'1'), ('refresh_all', date, b'2')])
+        connection.delete.assert_called_once_with(b'floor:2030-01-01:tables')
+
+        self.run.reset_mock(side_effect=True)
+        self.run.return_value = 0
+        with self.assertLogs('reservations.floor', 'WARNING'):
+            self.assertIsNone(floor.build_floor_state(date))
+
+    @override_settings(FLOOR_STATE_ENABLED=False)
+    def test_nothing_is_applied_when_disabled(self, _):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create(self.table, 14)
+            self.table.save()
+        self.assertFalse(self.run.called)
+
+    @override_settings(FLOOR_STATE_ENABLED=False)
+    def test_rebuild_command_requires_the_floor_state(self, _):
+        with self.assertRaisesMessage(CommandError, 'FLOOR_STATE_ENABLED'):
+            call_command('rebuild-floor-state')
+
+
+@unittest.skipUnless(is_redis_available(), 'Redis is not reachable')
+@override_settings(FLOOR_STATE_ENABLED=True, CACHES={'default': settings.REDIS_CACHE})
+class RedisFloorStateTestCases(TestCase):
+    """
+    The floor state answers like the schedules while time passes and the reservations change.
+    """
+    date = datetime.date(2030, 1, 1)
+
+    @classmethod
+    def setUpTestData(cls):
+        tables = Table.objects.bulk_create(
+            Table(number=number, number_of_seats=number % 6 + 1) for number in range(1, 25)
+        )
+        Reservation.objects.bulk_create(
+            Reservation(date=cls.date, table=table, from_time=datetime.time(hour, minute), persons=1,
+                        to_time=datetime.time(hour + 1, minute))
+            for table in tables for hour, minute in [(12 + table.number % 3, 15), (16, table.number % 4 * 15), (20, 0)]
+        )
+
+    def setUp(self) -> None:
+        # Redis keeps the schedules and the floor state of the rolled back tests
+        cache.clear()
+        patcher = mock.patch.dict(floor._registered, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        with mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 12, 00)):
+            call_command('rebuild-floor-state', stdout=io.StringIO())
+
+    def assertSameAnswer(self):
+        for persons, minutes in itertools.product((1, 4, 6), (0, 30, 90)):
+            min_until = floor.to_seconds(floor.get_availability_boundary()[0]) + minutes * 60
+            self.assertEqual(floor.find_walk_in_tables_in_floor_state(persons, min_until, 5),
+                             floor.find_walk_in_tables_in_schedules(persons, min_until, 5))
+
+    def test_answers_like_the_schedules(self):
+        for minute in range(12 * 60, 24 * 60, 20):
+            now = datetime.datetime(2030, 1, 1, minute // 60, minute % 60, 30)
+            with mock.patch.object(timezone, 'now', return_value=now):
+                self.assertSameAnswer()
+                if minute % 120 == 0 and minute < 20 * 60:
+                    with self.captureOnCommitCallbacks(execute=True):
+                        Reservation.objects.filter(date=self.date, from_time__gt=now.time())[:1].get().delete()
+                    with self.captureOnCommitCallbacks(execute=True):
+                        Table.objects.create(number=100 + minute, number_of_seats=4)
+                    self.assertSameAnswer()
+
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 15, 30))
+    def test_write_applied_during_a_rebuild_is_not_overwritten(self, _):
+        query_floor_state = floor._query_floor_state
+
+        def delete_after_reading(date):
+            tables, reservations = map(list, query_floor_state(date))
+            if query.call_count == 1:
+                # The deletion is applied after the rebuild read the database, before it writes the state
+                with self.captureOnCommitCallbacks(execute=True):
+                    Reservation.objects.filter(date=self.date, from_time=datetime.time(16, 0)).delete()
+            return tables, reservations
+
+        with mock.patch('reservations.floor._query_floor_state', side_effect=delete_after_reading) as query:
+            call_command('rebuild-floor-state', stdout=io.StringIO())
+        self.assertEqual(query.call_count, 2)
+        self.assertSameAnswer()
+
+
+class TableCatalogTestCases(SimpleTestCase):
+    def setUp(self) -> None:
+        self.catalog = TableCatalog([
+            Table(id=1, number=1, number_of_seats=2),
+            Table(id=2, number=2, number_of_seats=6),
+            Table(id=3, number=3, number_of_seats=2),
+            Table(id=4, number=4, number_of_seats=4),
+        ])
+
+    def test_sizes_are_sorted_and_distinct(self):
+        self.assertEqual(self.catalog.sizes, [2, 4, 6])
+
+    def test_fit_table_size(self):
+        self.assertEqual(self.catalog.fit_table_size(1), 2)
+        self.assertEqual(self.catalog.fit_table_size(2), 2)
+        self.assertEqual(self.catalog.fit_table_size(3), 4)
+        self.assertEqual(self.catalog.fit_table_size(6), 6)
+        self.assertIsNone(self.catalog.fit_table_size(7))
+
+    def test_get_tables(self):
+        self.assertEqual([table.id for table in self.catalog.get_tables(2)], [1, 3])
+        self.assertEqual(self.catalog.get_tables(3), [])
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class TableCatalogCacheTestCases(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_user = UserWithTokenFactory()
+        cls.admin_user.groups.add(Role.objects.get(name=Role.ADMIN))
+        cls.availability_url = reverse('tables-api-availability') + '?number_of_persons=3'
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.client.credentials(**self.admin_user.credentials)
+
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 13, 00))
+    def test_cached_availability_does_not_query_tables(self, _):
+        Table.objects.create(number=1, number_of_seats=4)
+        self.client.get(self.availability_url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.availability_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse([query for query in queries if 'reservations_' in query['sql']])
+
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 13, 00))
+    def test_creating_and_deleting_tables_invalidates_catalog(self, _):
+        Table.objects.create(number=1, number_of_seats=6)
+        self.assertEqual(len(self.client.get(self.availability_url).json()), 1)
+
+        response = self.client.post(reverse('tables-api-list'), data={'number': 2, 'number_of_seats': 4})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        table = Table.objects.get(number=2)
+        data = self.client.get(self.availability_url).json()
+        self.assertEqual([item['id'] for item in data], [table.id])
+
+        response = self.client.delete(reverse('tables-api-detail', kwargs={'pk': table.pk}))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        data = self.client.get(self.availability_url).json()
+        self.assertEqual([item['number'] for item in data], [1])
+
+
 class ReservationTestCases(APITestCase):
     @classmethod
     def setUpTestData(cls):
@@ -222,33 +1069,282 @@ class ReservationTestCases(APITestCase):
             Reservation.objects.filter(table=table, from_time=data['from_time'], to_time=data['to_time']).exists()
         )
 
-    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 18, 00))
-    def test_admin_reserve_past_time_slot_will_fail(self, _):
-        table = Table.objects.create(number=1, number_of_seats=1)
-        data = {'from_time': '17:30', "to_time": "18:30", 'persons': 1, 'table': table.id}
-        response = self.client.post(reverse('reservation-api-list'), data=data)
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 18, 00))
+    def test_admin_reserve_past_time_slot_will_fail(self, _):
+        table = Table.objects.create(number=1, number_of_seats=1)
+        data = {'from_time': '17:30', "to_time": "18:30", 'persons': 1, 'table': table.id}
+        response = self.client.post(reverse('reservation-api-list'), data=data)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(
+            Reservation.objects.filter(table=table, from_time=data['from_time'], to_time=data['to_time']).exists()
+        )
+
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 18, 00))
+    def test_admin_reserve_invalid_date_duration_will_fail(self, _):
+        table = Table.objects.create(number=1, number_of_seats=4)
+        data = {'from_time': '17:30', "to_time": "16:30", 'persons': 4, 'table': table.id}
+        response = self.client.post(reverse('reservation-api-list'), data=data)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(
+            Reservation.objects.filter(table=table, from_time=data['from_time'], to_time=data['to_time']).exists()
+        )
+
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 18, 00))
+    def test_admin_reserve_malformed_date_duration_will_fail(self, _):
+        table = Table.objects.create(number=1, number_of_seats=3)
+        data = {'from_time': '1730', "to_time": "18:30", 'persons': 2, 'table': table.id}
+        response = self.client.post(reverse('reservation-api-list'), data=data)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Time has wrong format.', response.json()['from_time'][0])
+
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 17, 00))
+    def test_admin_reserve_overlapping_time_slot_will_fail(self, _):
+        table = Table.objects.create(number=1, number_of_seats=2)
+        Reservation.objects.create(
+            date=datetime.date(2030, 1, 1),
+            from_time=datetime.time(18, 00),
+            to_time=datetime.time(19, 00),
+            table=table,
+            persons=2
+        )
+        data = {'from_time': '18:30', "to_time": "19:30", 'persons': 2, 'table': table.id}
+        response = self.client.post(reverse('reservation-api-list'), data=data)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(
+            Reservation.objects.filter(table=table, from_time=data['from_time'], to_time=data['to_time']).exists()
+        )
+
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 17, 00))
+    def test_admin_reserve_right_after_another_reservation_success(self, _):
+        table = Table.objects.create(number=1, number_of_seats=2)
+        Reservation.objects.create(
+            date=datetime.date(2030, 1, 1),
+            from_time=datetime.time(18, 00),
+            to_time=datetime.time(19, 00),
+            table=table,
+            persons=2
+        )
+        data = {'from_time': '19:00', "to_time": "19:30", 'persons': 2, 'table': table.id}
+        response = self.client.post(reverse('reservation-api-list'), data=data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+
+class ReservationConstraintTestCases(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_user = UserWithTokenFactory()
+        cls.admin_user.groups.add(Role.objects.get(name=Role.ADMIN))
+        cls.table = Table.objects.create(number=1, number_of_seats=2)
+        cls.reservation = Reservation.objects.create(
+            date=datetime.date(2030, 1, 1),
+            from_time=datetime.time(18, 00),
+            to_time=datetime.time(19, 00),
+            table=cls.table,
+            persons=2
+        )
+
+    def setUp(self) -> None:
+        self.client.credentials(**self.admin_user.credentials)
+
+    def test_database_rejects_overlapping_reservations_on_same_table(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Reservation.objects.create(
+                date=datetime.date(2030, 1, 1),
+                from_time=datetime.time(18, 30),
+                to_time=datetime.time(19, 30),
+                table=self.table,
+                persons=2
+            )
+
+    def test_database_rejects_reservation_ending_before_it_starts(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Reservation.objects.create(
+                date=datetime.date(2030, 1, 1),
+                from_time=datetime.time(21, 00),
+                to_time=datetime.time(20, 00),
+                table=self.table,
+                persons=2
+            )
+
+    def test_same_time_slot_on_different_tables_is_allowed(self):
+        other_table = Table.objects.create(number=2, number_of_seats=2)
+        Reservation.objects.create(
+            date=datetime.date(2030, 1, 1),
+            from_time=datetime.time(18, 00),
+            to_time=datetime.time(19, 00),
+            table=other_table,
+            persons=2
+        )
+        self.assertEqual(Reservation.objects.filter(from_time=datetime.time(18, 00)).count(), 2)
+
+    def test_adjacent_reservations_on_same_table_are_allowed(self):
+        Reservation.objects.create(
+            date=datetime.date(2030, 1, 1),
+            from_time=datetime.time(19, 00),
+            to_time=datetime.time(20, 00),
+            table=self.table,
+            persons=2
+        )
+        self.assertEqual(self.table.reservations.count(), 2)
+
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 17, 00))
+    def test_concurrent_overlapping_reservation_returns_conflict(self, _):
+        # Simulate a concurrent request which validated against the schedule before the reservation was committed
+        empty_schedule = TableSchedule(self.table.pk, datetime.date(2030, 1, 1))
+        with mock.patch('reservations.serializers.load_schedule', return_value=empty_schedule):
+            data = {'from_time': '18:30', "to_time": "19:30", 'persons': 2, 'table': self.table.id}
+            response = self.client.post(reverse('reservation-api-list'), data=data)
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(self.table.reservations.count(), 1)
+
+
+class TableScheduleTestCases(SimpleTestCase):
+    def setUp(self) -> None:
+        self.schedule = TableSchedule(1, datetime.date(2030, 1, 1), [
+            (datetime.time(18, 00), datetime.time(19, 00)),
+            (datetime.time(14, 00), datetime.time(15, 00)),
+            (datetime.time(14, 30), datetime.time(15, 30)),
+        ])
+
+    def test_overlapping_reservations_are_merged(self):
+        self.assertEqual(len(self.schedule), 2)
+        self.assertEqual(self.schedule.starts, [datetime.time(14, 00), datetime.time(18, 00)])
+        self.assertEqual(self.schedule.ends, [datetime.time(15, 30), datetime.time(19, 00)])
+
+    def test_overlaps(self):
+        self.assertTrue(self.schedule.overlaps(datetime.time(13, 00), datetime.time(14, 1)))
+        self.assertTrue(self.schedule.overlaps(datetime.time(18, 30), datetime.time(18, 45)))
+        self.assertTrue(self.schedule.overlaps(datetime.time(17, 00), datetime.time(20, 00)))
+        self.assertFalse(self.schedule.overlaps(datetime.time(15, 30), datetime.time(18, 00)))
+        self.assertFalse(self.schedule.overlaps(datetime.time(19, 00), datetime.time(20, 00)))
+        self.assertFalse(self.schedule.overlaps(datetime.time(12, 00), datetime.time(14, 00)))
+
+    def test_free_slots(self):
+        slots = self.schedule.free_slots(datetime.time(14, 45), datetime.time(23, 59))
+        self.assertEqual(slots, [
+            (datetime.time(15, 30), datetime.time(18, 00)),
+            (datetime.time(19, 00), datetime.time(23, 59)),
+        ])
+
+    def test_free_slots_of_empty_schedule(self):
+        schedule = TableSchedule(1, datetime.date(2030, 1, 1))
+        slots = schedule.free_slots(datetime.time(12, 00), datetime.time(23, 59))
+        self.assertEqual(slots, [(datetime.time(12, 00), datetime.time(23, 59))])
+
+    def test_is_available_respects_boundary(self):
+        start_time, end_time = datetime.time(16, 00), datetime.time(23, 59)
+        self.assertTrue(self.schedule.is_available(datetime.time(16, 00), datetime.time(17, 00), start_time, end_time))
+        self.assertFalse(self.schedule.is_available(datetime.time(15, 45), datetime.time(17, 00), start_time, end_time))
+        self.assertFalse(self.schedule.is_available(datetime.time(23, 00), datetime.time(23, 59, 30), start_time,
+                                                    end_time))
+
+
+class BulkReservationTestCases(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.employee = UserWithTokenFactory()
+        cls.employee.groups.add(Role.objects.get(name=Role.EMPLOYEE))
+        cls.small_table = Table.objects.create(number=1, number_of_seats=2)
+        cls.big_table = Table.objects.create(number=2, number_of_seats=6)
+        cls.bulk_url = reverse('reservation-api-bulk')
+
+    def setUp(self) -> None:
+        self.client.credentials(**self.employee.credentials)
+
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 13, 00))
+    def test_bulk_create_reservations_success(self, _):
+        data = [
+            {'from_time': '14:00', 'to_time': '15:00', 'persons': 2, 'table': self.small_table.id},
+            {'from_time': '15:00', 'to_time': '16:00', 'persons': 1, 'table': self.small_table.id},
+            {'from_time': '14:00', 'to_time': '15:00', 'persons': 5, 'table': self.big_table.id},
+        ]
+        response = self.client.post(self.bulk_url, data=data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.json()), 3)
+        self.assertTrue(all(reservation['id'] for reservation in response.json()))
+        self.assertEqual(Reservation.objects.filter(date=datetime.date(2030, 1, 1)).count(), 3)
+
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 13, 00))
+    def test_bulk_create_number_of_queries_does_not_depend_on_batch_size(self, _):
+        def batch(hour):
+            return [
+                {'from_time': f'{hour}:{minute:02}', 'to_time': f'{hour}:{minute + 5:02}', 'persons': 2,
+                 'table': self.small_table.id}
+                for minute in range(0, 50, 10)
+            ]
+
+        with CaptureQueriesContext(connection) as one_item_queries:
+            self.client.post(self.bulk_url, data=batch(14)[:1], format='json')
+        with CaptureQueriesContext(connection) as many_items_queries:
+            response = self.client.post(self.bulk_url, data=batch(15), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(one_item_queries), len(many_items_queries))
+
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 13, 00))
+    def test_bulk_create_reports_errors_per_item(self, _):
+        Reservation.objects.create(
+            date=datetime.date(2030, 1, 1),
+            from_time=datetime.time(18, 00),
+            to_time=datetime.time(19, 00),
+            table=self.small_table,
+            persons=2
+        )
+        data = [
+            {'from_time': '14:00', 'to_time': '15:00', 'persons': 2, 'table': self.small_table.id},
+            {'from_time': '18:30', 'to_time': '19:30', 'persons': 2, 'table': self.small_table.id},
+            {'from_time': '14:00', 'to_time': '15:00', 'persons': 2, 'table': self.big_table.id},
+            {'from_time': '14:00', 'to_time': '15:00', 'persons': 2, 'table': 999999},
+        ]
+        response = self.client.post(self.bulk_url, data=data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        errors = response.json()
+        self.assertEqual(errors[0], {})
+        self.assertEqual(errors[1], {'non_field_errors': ['Invalid dates']})
+        self.assertEqual(errors[2], {'non_field_errors': ['This table can not accept this number of customers']})
+        self.assertIn('table', errors[3])
+        self.assertEqual(self.small_table.reservations.count(), 1)
+
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 13, 00))
+    def test_bulk_create_rejects_conflicts_inside_the_batch(self, _):
+        data = [
+            {'from_time': '14:00', 'to_time': '15:00', 'persons': 2, 'table': self.small_table.id},
+            {'from_time': '14:30', 'to_time': '15:30', 'persons': 2, 'table': self.small_table.id},
+        ]
+        response = self.client.post(self.bulk_url, data=data, format='json')
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
-        self.assertFalse(
-            Reservation.objects.filter(table=table, from_time=data['from_time'], to_time=data['to_time']).exists()
-        )
+        self.assertEqual(response.json(), [{}, {'non_field_errors': ['Invalid dates']}])
+        self.assertFalse(Reservation.objects.exists())
 
-    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 18, 00))
-    def test_admin_reserve_invalid_date_duration_will_fail(self, _):
-        table = Table.objects.create(number=1, number_of_seats=4)
-        data = {'from_time': '17:30', "to_time": "16:30", 'persons': 4, 'table': table.id}
-        response = self.client.post(reverse('reservation-api-list'), data=data)
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 13, 00))
+    def test_bulk_create_empty_batch_will_fail(self, _):
+        response = self.client.post(self.bulk_url, data=[], format='json')
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
-        self.assertFalse(
-            Reservation.objects.filter(table=table, from_time=data['from_time'], to_time=data['to_time']).exists()
-        )
 
-    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 18, 00))
-    def test_admin_reserve_malformed_date_duration_will_fail(self, _):
-        table = Table.objects.create(number=1, number_of_seats=3)
-        data = {'from_time': '1730', "to_time": "18:30", 'persons': 2, 'table': table.id}
-        response = self.client.post(reverse('reservation-api-list'), data=data)
+    @override_settings(BULK_RESERVATION_MAX_SIZE=1)
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 13, 00))
+    def test_bulk_create_too_large_batch_will_fail(self, _):
+        data = [
+            {'from_time': '14:00', 'to_time': '15:00', 'persons': 2, 'table': self.small_table.id},
+            {'from_time': '16:00', 'to_time': '17:00', 'persons': 2, 'table': self.small_table.id},
+        ]
+        response = self.client.post(self.bulk_url, data=data, format='json')
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
-        self.assertIn('Time has wrong format.', response.json()['from_time'][0])
+        self.assertFalse(Reservation.objects.exists())
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 13, 00))
+    def test_bulk_create_invalidates_cached_availability(self, _):
+        cache.clear()
+        availability_url = reverse('tables-api-availability') + '?number_of_persons=2'
+        self.client.force_authenticate(UserWithTokenFactory(is_superuser=True))
+        self.client.get(availability_url)
+
+        data = [{'from_time': '14:00', 'to_time': '15:00', 'persons': 2, 'table': self.small_table.id}]
+        response = self.client.post(self.bulk_url, data=data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        response = self.client.get(availability_url)
+        self.assertEqual(response.json()[0]['availability'], [["01:00 PM", "02:00 PM"], ["03:00 PM", "11:59 PM"]])
 
 
 class ListReservationTestCases(APITestCase):
@@ -335,6 +1431,388 @@ class ListReservationTestCases(APITestCase):
         self.assertEqual(data['count'], 2)
 
 
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class AsyncReadEndpointTestCases(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_user = UserWithTokenFactory()
+        cls.admin_user.groups.add(Role.objects.get(name=Role.ADMIN))
+        cls.employee = UserWithTokenFactory()
+        cls.employee.groups.add(Role.objects.get(name=Role.EMPLOYEE))
+
+        cls.table = Table.objects.create(number=1, number_of_seats=4)
+        cls.other_table = Table.objects.create(number=2, number_of_seats=4)
+        for table, date, from_time, to_time in [
+            (cls.table, datetime.date(2030, 1, 1), datetime.time(16, 00), datetime.time(16, 30)),
+            (cls.table, datetime.date(2030, 1, 1), datetime.time(18, 00), datetime.time(19, 30)),
+            (cls.other_table, datetime.date(2030, 1, 1), datetime.time(17, 00), datetime.time(17, 30)),
+            (cls.other_table, datetime.date(2030, 1, 2), datetime.time(14, 00), datetime.time(15, 00)),
+            (cls.table, datetime.date(2005, 1, 1), datetime.time(17, 00), datetime.time(17, 30)),
+        ]:
+            Reservation.objects.create(date=date, from_time=from_time, to_time=to_time, table=table, persons=3)
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.client.credentials(**self.admin_user.credentials)
+
+    def assertSameResponse(self, sync_url, async_url):
+        sync_response = self.client.get(sync_url)
+        async_response = self.client.get(async_url)
+        self.assertEqual(async_response.status_code, sync_response.status_code)
+        # Page links point to the endpoint which served the page
+        self.assertEqual(async_response.content.decode().replace('/async/', '/'), sync_response.content.decode())
+        return async_response
+
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 13, 00))
+    def test_async_availability_matches_sync(self, _):
+        sync_url = reverse('tables-api-availability')
+        async_url = reverse('tables-api-availability-async')
+        for query in ['?number_of_persons=3', '?number_of_persons=3&from_date=2030-01-01&to_date=2030-01-03',
+                      '?number_of_persons=abc', '?number_of_persons=20', '?number_of_persons=3&from_date=2029-01-01']:
+            with self.subTest(query=query):
+                self.assertSameResponse(sync_url + query, async_url + query)
+
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 13, 00))
+    def test_async_reservation_list_matches_sync(self, _):
+        sync_url = reverse('reservation-api-list')
+        async_url = reverse('reservation-api-list-async')
+        for query in ['', '?all=true', '?all=true&ordering=-from_time', '?all=true&limit=2&offset=1',
+                      '?all=true&table=%s' % self.other_table.pk, '?all=true&pagination=cursor&limit=2']:
+            with self.subTest(query=query):
+                self.assertSameResponse(sync_url + query, async_url + query)
+
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 13, 00))
+    def test_async_cursor_pagination_follows_next(self, _):
+        url = reverse('reservation-api-list-async') + '?all=true&pagination=cursor&limit=2'
+        ids = []
+        while url:
+            data = self.client.get(url).json()
+            ids.extend(reservation['id'] for reservation in data['results'])
+            url = data['next']
+        expected = Reservation.objects.order_by('date', 'from_time', 'id').values_list('id', flat=True)
+        self.assertEqual(ids, list(expected))
+
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 13, 00))
+    def test_cached_async_availability_does_not_query_reservations(self, _):
+        url = reverse('tables-api-availability-async') + '?number_of_persons=3'
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse([query for query in queries if 'reservations_' in query['sql']])
+
+    def test_async_endpoints_require_authentication(self):
+        self.client.credentials()
+        for url in [reverse('tables-api-availability-async'), reverse('reservation-api-list-async')]:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+                self.assertIn('Bearer', response['WWW-Authenticate'])
+
+    def test_async_endpoints_reject_invalid_token(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer invalid')
+        response = self.client.get(reverse('reservation-api-list-async'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_employee_can_not_check_async_availability(self):
+        self.client.credentials(**self.employee.credentials)
+        response = self.client.get(reverse('tables-api-availability-async') + '?number_of_persons=3')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_async_endpoints_only_accept_get(self):
+        response = self.client.post(reverse('reservation-api-list-async'), {})
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+
+class ORJSONRendererParityTestCases(SimpleTestCase):
+    def test_renders_the_same_bytes_as_json_renderer(self):
+        payloads = [
+            None,
+            [],
+            {'count': 2, 'next': None, 'previous': 'http://testserver/v1/reservations/?limit=2', 'results': []},
+            OrderedDict([('b', 1), ('a', [1.5, True, False, None, 2 ** 40])]),
+            ['caf\u00e9', '\u0645\u0637\u0639\u0645', '\U0001f37d', 'line\u2028separator\u2029', 'quote " \\ /'],
+            {1: 'int key', 'nested': {'tuple': (1, 2), 'map': map(str, [1, 2])}},
+            _('There are no tables fit this number on one table'),
+            {'detail': ErrorDetail('Not found.', code='not_found')},
+            [datetime.date(2030, 1, 1), datetime.time(13, 30, 15, 123456), datetime.datetime(2030, 1, 1, 13, 30)],
+            datetime.datetime(2030, 1, 1, 13, 30, 15, 123456, tzinfo=datetime.timezone.utc),
+            [Decimal('1.50'), uuid.UUID('12345678-1234-5678-1234-567812345678'), datetime.timedelta(minutes=90)],
+        ]
+        for payload in payloads:
+            with self.subTest(payload=payload):
+                expected = JSONRenderer().render(copy.deepcopy(payload))
+                self.assertEqual(ORJSONRenderer().render(copy.deepcopy(payload)), expected)
+
+    def test_indented_output_is_left_to_json_renderer(self):
+        data = {'a': [1, 2]}
+        media_type = 'application/json; indent=4'
+        self.assertEqual(ORJSONRenderer().render(data, media_type), JSONRenderer().render(data, media_type))
+
+
+class RowSerializerParityTestCases(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_user = UserWithTokenFactory()
+        cls.admin_user.groups.add(Role.objects.get(name=Role.ADMIN))
+        cls.tables = [
+            Table.objects.create(number=number, number_of_seats=seats)
+            for number, seats in [(1, 2), (2, 4), (3, 4), (4, None), (5, 12)]
+        ]
+        slots = [(datetime.time(12, 00), datetime.time(12, 45)), (datetime.time(13, 5), datetime.time(14, 00)),
+                 (datetime.time(20, 30), datetime.time(23, 59)), (datetime.time(0, 15), datetime.time(1, 00))]
+        for index, table in enumerate(cls.tables[:3]):
+            for day, (from_time, to_time) in itertools.product(range(3), slots):
+                Reservation.objects.create(
+                    date=datetime.date(2030, 1, 1) + datetime.timedelta(days=day),
+                    from_time=from_time, to_time=to_time, table=table, persons=None if day == 2 else index + 1
+                )
+
+    def setUp(self) -> None:
+        self.client.credentials(**self.admin_user.credentials)
+
+    @staticmethod
+    def _legacy_availability_data(tables, date, availability):
+        context = {'for_date': date, 'availability': availability}
+        return TableAvailabilitySerializer(instance=tables, many=True, context=context).data
+
+    def _legacy_response(self, url):
+        with mock.patch.object(RowListModelMixin, 'list', mixins.ListModelMixin.list), \
+                mock.patch('rest_framework.views.APIView.renderer_classes', [JSONRenderer]), \
+                mock.patch('reservations.views.table_availability_data', self._legacy_availability_data):
+            return self.client.get(url)
+
+    def assertSameContent(self, url):
+        legacy = self._legacy_response(url)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, legacy.status_code)
+        self.assertEqual(response.content, legacy.content)
+
+    def test_reservation_rows_match_reservation_serializer(self):
+        queryset = Reservation.objects.order_by('date', 'from_time', 'id')
+        rows = queryset.values_list(*ReservationRowSerializer.get_columns(), named=True)
+        self.assertEqual(ReservationRowSerializer(rows).data, ReservationSerializer(queryset, many=True).data)
+
+    def test_table_rows_match_table_serializer(self):
+        queryset = Table.objects.order_by('id')
+        rows = queryset.values_list(*TableRowSerializer.get_columns())
+        self.assertEqual(TableRowSerializer(rows).data, TableSerializer(queryset, many=True).data)
+
+    @override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'TIME_FORMAT': 'iso-8601'})
+    def test_reservation_rows_follow_the_configured_time_format(self):
+        queryset = Reservation.objects.order_by('id')
+        rows = queryset.values_list(*ReservationRowSerializer.get_columns(), named=True)
+        data = ReservationRowSerializer(rows).data
+        self.assertEqual(data, ReservationSerializer(queryset, many=True).data)
+        self.assertEqual(data[0]['from_time'], '12:00:00')
+
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 12, 30))
+    def test_reservation_list_bytes_match(self, _):
+        url = reverse('reservation-api-list')
+        for query in ['', '?all=true', '?all=true&ordering=-to_time', '?all=true&limit=5&offset=7',
+                      '?all=true&table=%s' % self.tables[1].pk, '?all=true&pagination=cursor&limit=4']:
+            with self.subTest(query=query):
+                self.assertSameContent(url + query)
+
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 12, 30))
+    def test_table_list_bytes_match(self, _):
+        for query in ['', '?limit=2&offset=1']:
+            with self.subTest(query=query):
+                self.assertSameContent(reverse('tables-api-list') + query)
+
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 12, 30))
+    def test_availability_bytes_match(self, _):
+        url = reverse('tables-api-availability')
+        for query in ['?number_of_persons=1', '?number_of_persons=3&from_date=2030-01-01&to_date=2030-01-04',
+                      '?number_of_persons=abc', '?number_of_persons=3&from_date=2029-01-01']:
+            with self.subTest(query=query):
+                self.assertSameContent(url + query)
+
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 12, 30))
+    def test_row_list_does_not_build_model_instances(self, _):
+        with mock.patch.object(Reservation, '__init__', side_effect=AssertionError):
+            response = self.client.get(reverse('reservation-api-list') + '?all=true')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class CursorPaginationReservationTestCases(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_user = UserWithTokenFactory()
+        cls.admin_user.groups.add(Role.objects.get(name=Role.ADMIN))
+        first_table = Table.objects.create(number=1, number_of_seats=2)
+        second_table = Table.objects.create(number=2, number_of_seats=2)
+        cls.reservations = [
+            Reservation.objects.create(date=date, from_time=datetime.time(hour, 00), to_time=datetime.time(hour, 30),
+                                       table=table)
+            for date, hour, table in [
+                (datetime.date(2005, 1, 1), 17, first_table),
+                (datetime.date(2005, 1, 1), 17, second_table),
+                (datetime.date(2005, 1, 1), 18, first_table),
+                (datetime.date(2030, 1, 1), 16, first_table),
+                (datetime.date(2030, 1, 2), 12, first_table),
+            ]
+        ]
+        cls.list_reservation_url = reverse('reservation-api-list')
+
+    def setUp(self) -> None:
+        self.client.credentials(**self.admin_user.credentials)
+
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2035, 1, 1, 18, 00))
+    def test_admin_walks_all_reservations_with_cursor(self, _):
+        url = self.list_reservation_url + '?all=true&pagination=cursor&limit=2'
+        returned_reservation_ids = []
+        pages = 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            data = response.json()
+            self.assertNotIn('count', data)
+            returned_reservation_ids.extend(reservation['id'] for reservation in data['results'])
+            url = data['next']
+            pages += 1
+        self.assertEqual(pages, 3)
+        self.assertEqual(returned_reservation_ids, [reservation.id for reservation in self.reservations])
+
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2035, 1, 1, 18, 00))
+    def test_cursor_pagination_does_not_count_rows(self, _):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.list_reservation_url + '?all=true&pagination=cursor&limit=2')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse([query for query in queries if 'COUNT(' in query['sql']])
+
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2035, 1, 1, 18, 00))
+    def test_offset_pagination_is_still_the_default(self, _):
+        response = self.client.get(self.list_reservation_url + '?all=true')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['count'], 5)
+
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2035, 1, 1, 18, 00))
+    def test_invalid_cursor_will_fail(self, _):
+        response = self.client.get(self.list_reservation_url + '?all=true&pagination=cursor&cursor=broken')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ExportReservationTestCases(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_user = UserWithTokenFactory()
+        cls.admin_user.groups.add(Role.objects.get(name=Role.ADMIN))
+        cls.employee = UserWithTokenFactory()
+        cls.employee.groups.add(Role.objects.get(name=Role.EMPLOYEE))
+
+        cls.table = Table.objects.create(number=1, number_of_seats=4)
+        cls.other_table = Table.objects.create(number=2, number_of_seats=4)
+        cls.reservations = [
+            Reservation.objects.create(date=date, from_time=from_time, to_time=to_time, table=table, persons=2)
+            for table, date, from_time, to_time in [
+                (cls.table, datetime.date(2030, 1, 1), datetime.time(18, 00), datetime.time(19, 00)),
+                (cls.other_table, datetime.date(2030, 1, 1), datetime.time(13, 00), datetime.time(14, 30)),
+                (cls.table, datetime.date(2005, 1, 1), datetime.time(17, 00), datetime.time(17, 30)),
+                (cls.table, datetime.date(2030, 1, 2), datetime.time(12, 00), datetime.time(12, 30)),
+                (cls.other_table, datetime.date(2030, 1, 1), datetime.time(15, 00), datetime.time(16, 00)),
+            ]
+        ]
+        cls.export_url = reverse('reservation-api-export')
+
+    def setUp(self) -> None:
+        self.client.credentials(**self.admin_user.credentials)
+
+    @staticmethod
+    def _content(response):
+        return b''.join(response.streaming_content).decode()
+
+    def _export_ndjson(self, query=''):
+        response = self.client.get(self.export_url + query)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        return [json.loads(line) for line in self._content(response).splitlines()]
+
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 12, 00))
+    def test_export_ndjson_ordered_by_date_and_time(self, _):
+        rows = self._export_ndjson('?all=true')
+        expected = Reservation.objects.order_by('date', 'from_time', 'id')
+        self.assertEqual([row['id'] for row in rows], [reservation.id for reservation in expected])
+        self.assertEqual(rows[0], {
+            'id': self.reservations[2].id, 'date': '2005-01-01', 'from_time': '05:00 PM', 'to_time': '05:30 PM',
+            'table': self.table.id, 'persons': 2,
+        })
+
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 12, 00))
+    def test_export_times_match_the_reservation_serializer(self, _):
+        listed = {row['id']: row for row in self.client.get(reverse('reservation-api-list')).json()['results']}
+        for row in self._export_ndjson():
+            self.assertEqual({key: row[key] for key in listed[row['id']]}, listed[row['id']])
+
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 12, 00))
+    def test_export_csv(self, _):
+        response = self.client.get(self.export_url + '?all=true&format=csv')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('reservations.csv', response['Content-Disposition'])
+        rows = list(csv.reader(io.StringIO(self._content(response))))
+        self.assertEqual(rows[0], ['id', 'date', 'from_time', 'to_time', 'table', 'persons'])
+        self.assertEqual(len(rows), len(self.reservations) + 1)
+        self.assertEqual(rows[1], [str(self.reservations[2].id), '2005-01-01', '05:00 PM', '05:30 PM',
+                                   str(self.table.id), '2'])
+
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 12, 00))
+    def test_export_csv_without_rows_has_a_header(self, _):
+        response = self.client.get(self.export_url + '?all=true&format=csv&from_time=2031-01-01')
+        self.assertEqual(self._content(response), 'id,date,from_time,to_time,table,persons\r\n')
+
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 12, 00))
+    def test_export_honors_filters(self, _):
+        rows = self._export_ndjson(f'?all=true&table={self.other_table.id}')
+        self.assertEqual({row['table'] for row in rows}, {self.other_table.id})
+        self.assertEqual(len(rows), 2)
+
+        rows = self._export_ndjson('?all=true&from_time=2030-01-02')
+        self.assertEqual([row['id'] for row in rows], [self.reservations[3].id])
+
+        rows = self._export_ndjson('?all=true&from_time=2006-01-01&to_time=2030-01-01')
+        self.assertEqual({row['date'] for row in rows}, {'2030-01-01'})
+
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 12, 00))
+    def test_employee_exports_today_only(self, _):
+        self.client.credentials(**self.employee.credentials)
+        rows = self._export_ndjson('?all=true')
+        self.assertEqual({row['date'] for row in rows}, {'2030-01-01'})
+        self.assertEqual(len(rows), 3)
+
+    @override_settings(RESERVATION_EXPORT_CHUNK_SIZE=2)
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 12, 00))
+    def test_export_reads_reservations_with_one_query(self, _):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.export_url + '?all=true')
+            lines = self._content(response).splitlines()
+        self.assertEqual(len(lines), len(self.reservations))
+        self.assertEqual(len([query for query in queries if 'reservations_reservation' in query['sql']]), 1)
+
+    def test_export_requires_authentication(self):
+        self.client.credentials()
+        response = self.client.get(self.export_url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class StreamExportTestCases(SimpleTestCase):
+    def test_stream_consumes_from_a_thread_inside_an_event_loop(self):
+        def batches():
+            for _batch in range(3):
+                yield threading.get_ident()
+
+        async def consume():
+            return list(stream(batches()))
+
+        threads = asyncio.run(consume())
+        self.assertEqual(len(threads), 3)
+        self.assertNotIn(threading.get_ident(), threads)
+
+    def test_stream_consumes_directly_outside_an_event_loop(self):
+        self.assertEqual(list(stream(iter([1, 2]))), [1, 2])
+
+
 class DeleteReservationTestCases(APITestCase):
     @classmethod
     def setUpTestData(cls):
@@ -422,3 +1900,543 @@ class AvailabilityAndReservationIntegrationTestCase(APITestCase):
         time_slot = second_response.json()[0]['availability']
         self.assertIn(['05:00 PM', '07:30 PM'], time_slot)
         self.assertIn(['08:00 PM', '11:59 PM'], time_slot)
+
+
+class GenerateReservationsCommandTestCases(TestCase):
+    first_date = datetime.date(2030, 1, 1)
+
+    def generate(self, *args):
+        out = io.StringIO()
+        call_command('generate-reservations', '--start-date', self.first_date.isoformat(), '--workers', '1', *args,
+                     stdout=out)
+        return out.getvalue()
+
+    def dump(self):
+        return list(Reservation.objects.order_by('date', 'table__number', 'from_time').values_list(
+            'date', 'from_time', 'to_time', 'table__number', 'persons'
+        ))
+
+    def test_generate_target_counts(self):
+        out = self.generate('--tables', '5', '--reservations', '103', '--days', '4', '--batch-size', '7')
+        self.assertIn('Successfully generated 5 tables and 103 reservations', out)
+        self.assertEqual(Table.objects.count(), 5)
+        self.assertEqual(Reservation.objects.count(), 103)
+        self.assertEqual(
+            set(Reservation.objects.values_list('date', flat=True)),
+            {self.first_date + datetime.timedelta(days=day) for day in range(4)},
+        )
+
+    def test_generated_reservations_are_valid(self):
+        self.generate('--tables', '3', '--reservations', '60', '--days', '2')
+        for reservation in Reservation.objects.select_related('table'):
+            self.assertLess(reservation.from_time, reservation.to_time)
+            self.assertGreaterEqual(reservation.from_time, settings.RESERVATION_STARTING_FROM_TIME)
+            self.assertLessEqual(reservation.to_time, settings.RESERVATION_ENDS_AT_TIME)
+            self.assertTrue(1 <= reservation.persons <= reservation.table.number_of_seats)
+
+    def test_generated_tables_follow_existing_numbers(self):
+        TableFactory(number=41)
+        self.generate('--tables', '2', '--reservations', '0', '--days', '1')
+        self.assertEqual(list(Table.objects.order_by('number').values_list('number', flat=True)), [41, 42, 43])
+
+    def test_same_seed_generates_same_data(self):
+        self.generate('--tables', '4', '--reservations', '50', '--days', '3', '--seed', '7')
+        first = self.dump()
+        Table.objects.all().delete()
+        self.generate('--tables', '4', '--reservations', '50', '--days', '3', '--seed', '7')
+        self.assertEqual(self.dump(), first)
+        Table.objects.all().delete()
+        self.generate('--tables', '4', '--reservations', '50', '--days', '3', '--seed', '8')
+        self.assertNotEqual(self.dump(), first)
+
+    def test_clear_existing_tables(self):
+        TableFactory(number=41)
+        self.generate('--tables', '2', '--reservations', '0', '--days', '1', '--clear')
+        self.assertEqual(list(Table.objects.order_by('number').values_list('number', flat=True)), [1, 2])
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_generating_invalidates_cached_schedules(self):
+        self.generate('--tables', '2', '--reservations', '10', '--days', '2')
+        table_ids = list(Table.objects.order_by('pk').values_list('pk', flat=True))
+        dates = [self.first_date, self.first_date + datetime.timedelta(days=1)]
+        load_schedules_for_dates(table_ids, dates)
+        table_dates = [(table_id, date) for table_id in table_ids for date in dates]
+        versions = get_schedule_versions(table_dates)
+
+        self.generate('--tables', '1', '--reservations', '3', '--days', '1')
+        new_table_id = Table.objects.exclude(pk__in=table_ids).get().pk
+        # Only the schedules of the generated table on the generated date were invalidated
+        self.assertEqual(get_schedule_versions(table_dates), versions)
+        version_keys = [schedule_version_key(new_table_id, date) for date in dates]
+        self.assertEqual(
+            [key for key in version_keys if cache.get(key, version=settings.AVAILABILITY_CACHE_VERSION)],
+            version_keys[:1],
+        )
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_clearing_drops_the_schedules_of_reused_table_ids(self):
+        # Schedules cached for tables which had the ids handed out again after the clear, on dates it does not cover
+        dates = [self.first_date, self.first_date + datetime.timedelta(days=5)]
+        cache_schedules(TableSchedule(table_id, date, [(datetime.time(13, 0), datetime.time(14, 0))])
+                        for table_id in (1, 2) for date in dates)
+
+        self.generate('--tables', '2', '--reservations', '3', '--days', '1', '--clear')
+        table_ids = list(Table.objects.order_by('pk').values_list('pk', flat=True))
+        self.assertEqual(table_ids, [1, 2])
+        loaded = load_schedules_for_dates(table_ids, dates)
+        expected = query_schedules([(table_id, date) for date in dates for table_id in table_ids])
+        self.assertEqual({table_date: schedule.starts for table_date, schedule in loaded.items()},
+                         {table_date: schedule.starts for table_date, schedule in expected.items()})
+
+    @override_settings(FLOOR_STATE_ENABLED=True)
+    def test_generating_clears_the_floor_state(self):
+        command = importlib.import_module('reservations.management.commands.generate-reservations')
+        with mock.patch.object(command, 'clear_floor_state') as clear_floor_state:
+            self.generate('--tables', '1', '--reservations', '0', '--days', '1')
+        clear_floor_state.assert_called_once_with()
+
+    def test_rows_do_not_depend_on_how_dates_are_split(self):
+        generate_rows = importlib.import_module(
+            'reservations.management.commands.generate-reservations'
+        ).generate_reservation_rows
+        tables = [(1, 4), (2, 12)]
+        dates = [self.first_date + datetime.timedelta(days=day) for day in range(3)]
+        counts = [3, 0, 5, 1, 2, 4]
+        rows = list(generate_rows(3, tables, dates, counts))
+        self.assertEqual(len(rows), sum(counts))
+        self.assertEqual(rows, [
+            *generate_rows(3, tables, dates[:1], counts[:2]),
+            *generate_rows(3, tables, dates[1:], counts[2:]),
+        ])
+
+    def test_too_many_reservations_will_fail(self):
+        with self.assertRaisesMessage(CommandError, 'At most'):
+            self.generate('--tables', '1', '--reservations', '1000', '--days', '1')
+        self.assertFalse(Table.objects.exists())
+
+
+class BenchmarkTestCases(SimpleTestCase):
+    def report(self, **stats):
+        return {'endpoints': {'login': {
+            'p50_ms': 10.0, 'p95_ms': 20.0, 'p99_ms': 30.0, 'rps': 100.0, 'queries_per_request': 5.0, **stats,
+        }}}
+
+    def test_percentile_is_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual([percentile(values, percent) for percent in (50, 95, 99, 100)], [50, 95, 99, 100])
+        self.assertEqual(percentile([7], 99), 7)
+
+    @override_settings(RESERVATION_STARTING_FROM_TIME=datetime.time(12, 00),
+                       RESERVATION_ENDS_AT_TIME=datetime.time(14, 00))
+    def test_slots_left_today_start_a_slot_after_now(self):
+        morning = datetime.datetime(2030, 1, 1, 9, 00, tzinfo=datetime.timezone.utc)
+        self.assertEqual(get_slots(morning)[:2], ['12:00', '12:15'])
+        self.assertEqual(len(get_slots(morning)), 9)
+        self.assertEqual(get_slots(morning.replace(hour=13, minute=20)), ['13:45', '14:00'])
+        self.assertEqual(get_slots(morning.replace(hour=13, minute=50)), [])
+
+    def test_summarize_per_endpoint(self):
+        results = [('login', 200, 0.010, 5), ('login', 200, 0.030, 5), ('table_delete', 400, 0.002, 3)]
+        report = summarize(results, elapsed=2)
+        self.assertEqual(report['total'], {'requests': 3, 'elapsed_s': 2, 'rps': 1.5})
+        self.assertEqual(report['endpoints']['login'], {
+            'requests': 2, 'errors': 0, 'rps': 1.0, 'mean_ms': 20.0,
+            'p50_ms': 10.0, 'p95_ms': 30.0, 'p99_ms': 30.0, 'queries_per_request': 5.0,
+        })
+        self.assertEqual(report['endpoints']['table_delete']['errors'], 1)
+
+    def test_compare_to_baseline_within_threshold(self):
+        report = self.report(p99_ms=32.0, rps=95.0)
+        self.assertEqual(compare_to_baseline(report, self.report(), threshold=0.1), [])
+
+    def test_compare_to_baseline_regressions(self):
+        report = self.report(p95_ms=25.0, rps=80.0, queries_per_request=6.0)
+        self.assertEqual(compare_to_baseline(report, self.report(), threshold=0.1), [
+            'login: p95_ms 25.0 > 20.0',
+            'login: rps 80.0 < 100.0',
+            'login: queries_per_request 6.0 > 5.0',
+        ])
+        self.assertEqual(compare_to_baseline({'endpoints': {}}, self.report(), threshold=0.1),
+                         ['login: missing from the report'])
+
+    def test_asgi_request(self):
+        status_code, content = asyncio.run(asgi_request(
+            get_asgi_application(), 'GET', reverse('tables-api-availability'), 'number_of_persons=2',
+            headers=[('host', 'testserver')],
+        ))
+        self.assertEqual(status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn(b'detail', content)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class AvailabilityBenchmarkTestCases(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.benchmark = importlib.import_module('reservations.management.commands.benchmark-availability')
+        cls.table_ids = [Table.objects.create(number=number, number_of_seats=4).pk for number in range(1, 6)]
+        cls.dates = [datetime.date(2030, 1, 1) + datetime.timedelta(days=day) for day in range(4)]
+
+    def setUp(self) -> None:
+        cache.clear()
+
+    def test_lookups_are_the_same_for_the_same_seed(self):
+        lookups = self.benchmark.build_lookups(random.Random(3), self.table_ids, self.dates, 10, 2, 3)
+        self.assertEqual(lookups, self.benchmark.build_lookups(random.Random(3), self.table_ids, self.dates, 10, 2, 3))
+        for table_ids, dates in lookups:
+            self.assertEqual(len(set(table_ids)), 2)
+            self.assertEqual(len(dates), 3)
+            self.assertEqual(dates[-1] - dates[0], datetime.timedelta(days=2))
+
+    def test_measure_counts_the_queries_of_each_lookup(self):
+        lookups = self.benchmark.build_lookups(random.Random(0), self.table_ids, self.dates, 3, 2, 1)
+        backend = import_string('reservations.backends.CachedAvailabilityBackend')()
+        samples = self.benchmark.measure(backend, lookups + lookups)
+        self.assertEqual([queries for _seconds, queries in samples], [1, 1, 1, 0, 0, 0])
+
+        report = self.benchmark.summarize_lookups(samples)
+        self.assertEqual(report['lookups'], 6)
+        self.assertEqual(report['queries_per_lookup'], 0.5)
+        self.assertLessEqual(report['p50_ms'], report['p99_ms'])
+
+    def test_lookups_can_not_exceed_the_seeded_tables(self):
+        with self.assertRaisesMessage(CommandError, 'more tables or days'):
+            call_command('benchmark-availability', '--tables', '2', '--lookup-tables', '3')
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+@mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 12, 00))
+class QueryBudgetTestCases(APITestCase):
+    """
+    Every endpoint stays within the query budget of its view however many tables and reservations there are.
+    """
+    date = datetime.date(2030, 1, 1)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_user = UserWithTokenFactory()
+        cls.admin_user.groups.add(Role.objects.get(name=Role.ADMIN))
+        cls.tables = Table.objects.bulk_create(Table(number=number, number_of_seats=4) for number in range(1, 21))
+        cls.free_table = Table.objects.create(number=100, number_of_seats=4)
+        cls.reservations = Reservation.objects.bulk_create(
+            Reservation(date=cls.date + datetime.timedelta(days=day), from_time=datetime.time(hour, 00),
+                        to_time=datetime.time(hour, 30), table=table, persons=4)
+            for table in cls.tables for day in range(3) for hour in (13, 15, 17)
+        )
+
+    def setUp(self) -> None:
+        self.client.credentials(**self.admin_user.credentials)
+
+    def assertWithinBudget(self, response, status_code=status.HTTP_200_OK):
+        self.assertEqual(response.status_code, status_code)
+        self.assertIn('queries', response['Server-Timing'])
+
+    def test_table_endpoints(self, _):
+        self.assertWithinBudget(self.client.get(reverse('tables-api-list')))
+        self.assertWithinBudget(self.client.get(reverse('tables-api-availability'),
+                                                {'number_of_persons': 4, 'to_date': '2030-01-03'}))
+        self.assertWithinBudget(self.client.get(reverse('tables-api-first-available'),
+                                                {'number_of_persons': 4, 'duration': 60}))
+        self.assertWithinBudget(self.client.post(reverse('tables-api-list'), {'number': 200, 'number_of_seats': 4}),
+                                status.HTTP_201_CREATED)
+        self.assertWithinBudget(self.client.delete(reverse('tables-api-detail', kwargs={'pk': self.free_table.pk})),
+                                status.HTTP_204_NO_CONTENT)
+
+    def test_reservation_endpoints(self, _):
+        self.assertWithinBudget(self.client.get(reverse('reservation-api-list')))
+        self.assertWithinBudget(self.client.get(reverse('reservation-api-list'), {'pagination': 'cursor'}))
+        self.assertWithinBudget(self.client.get(reverse('reservation-api-list'),
+                                                {'all': 'true', 'table': self.tables[0].pk}))
+        self.assertWithinBudget(self.client.get(reverse('reservation-api-export')))
+        self.assertWithinBudget(self.client.get(reverse('reservation-api-export'),
+                                                {'all': 'true', 'table': self.tables[0].pk}))
+        self.assertWithinBudget(self.client.post(reverse('reservation-api-list'), {
+            'table': self.tables[0].pk, 'from_time': '19:00', 'to_time': '20:00', 'persons': 4,
+        }), status.HTTP_201_CREATED)
+        self.assertWithinBudget(self.client.post(reverse('reservation-api-bulk'), [
+            {'table': table.pk, 'from_time': '21:00', 'to_time': '22:00', 'persons': 4} for table in self.tables
+        ], format='json'), status.HTTP_201_CREATED)
+        self.assertWithinBudget(
+            self.client.delete(reverse('reservation-api-detail', kwargs={'pk': self.reservations[0].pk})),
+            status.HTTP_204_NO_CONTENT,
+        )
+
+    def test_async_endpoints(self, _):
+        self.assertWithinBudget(self.client.get(reverse('tables-api-availability-async'), {'number_of_persons': 4}))
+        self.assertWithinBudget(self.client.get(reverse('reservation-api-list-async')))
+        self.assertWithinBudget(self.client.get(reverse('reservation-api-list-async'),
+                                                {'all': 'true', 'table': self.tables[0].pk}))
+
+
+@override_settings(SERVER_TIMING_ENABLED=True, QUERY_BUDGET_STRICT=False)
+class QueryBudgetMiddlewareTestCases(SimpleTestCase):
+    def get_response(self, queries):
+        def view(request):
+            for _query in range(queries):
+                record_query(lambda *args: None, 'SELECT 1', None, False, {})
+            return HttpResponse()
+        return view
+
+    def call(self, queries, budget):
+        request = RequestFactory().get('/tables/')
+        request.resolver_match = ResolverMatch(query_budget(budget)(lambda request: None), (), {})
+        return QueryBudgetMiddleware(self.get_response(queries))(request)
+
+    def test_server_timing_header(self):
+        response = self.call(queries=2, budget=None)
+        self.assertRegex(response['Server-Timing'], r'^db;desc="2 queries";dur=[0-9.]+, total;dur=[0-9.]+$')
+
+    @override_settings(SERVER_TIMING_ENABLED=False)
+    def test_server_timing_header_disabled(self):
+        self.assertFalse(self.call(queries=2, budget=None).has_header('Server-Timing'))
+
+    def test_over_budget_is_logged(self):
+        with self.assertLogs('resvy.query_budget', 'WARNING') as logs:
+            self.call(queries=3, budget=2)
+        self.assertIn('GET /tables/ ran 3 queries, over the budget of 2', logs.output[0])
+
+    def test_within_budget_is_not_logged(self):
+        with self.assertNoLogs('resvy.query_budget'):
+            self.call(queries=2, budget=2)
+
+    @override_settings(QUERY_BUDGET_STRICT=True)
+    def test_over_budget_raises_in_strict_mode(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.call(queries=3, budget=2)
+
+    def test_viewset_budgets(self):
+        def budget_of(method, url):
+            request = getattr(RequestFactory(), method)(url)
+            request.resolver_match = resolve(url)
+            return get_query_budget(request)
+
+        self.assertEqual(budget_of('get', reverse('tables-api-availability')), TableView.query_budgets['availability'])
+        self.assertEqual(budget_of('post', reverse('reservation-api-list')), ReservationView.query_budgets['create'])
+        self.assertEqual(budget_of('get', reverse('tables-api-availability-async')), 5)
+        self.assertIsNone(budget_of('get', reverse('schema')))
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+@mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 12, 00))
+class MetricsTestCases(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_user = UserWithTokenFactory()
+        cls.admin_user.groups.add(Role.objects.get(name=Role.ADMIN))
+        cls.table = Table.objects.create(number=1, number_of_seats=4)
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.client.credentials(**self.admin_user.credentials)
+
+    @staticmethod
+    def sample(name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def reserve(self, from_time, persons=2):
+        return self.client.post(reverse('reservation-api-list'), {
+            'table': self.table.pk, 'from_time': from_time, 'to_time': '23:00', 'persons': persons,
+        })
+
+    def test_request_duration_and_queries_are_observed(self, _):
+        labels = {'method': 'GET', 'route': 'tables-api-list', 'status': '200'}
+        requests = self.sample('resvy_http_request_duration_seconds_count', **labels)
+        queries = self.sample('resvy_http_request_queries_count', route='tables-api-list')
+        self.client.get(reverse('tables-api-list'))
+        self.assertEqual(self.sample('resvy_http_request_duration_seconds_count', **labels), requests + 1)
+        self.assertEqual(self.sample('resvy_http_request_queries_count', route='tables-api-list'), queries + 1)
+
+    def test_created_and_rejected_reservations_are_counted(self, _):
+        created = self.sample('resvy_reservations_created_total')
+        table_size = self.sample('resvy_reservations_rejected_total', reason='table_size')
+        unavailable = self.sample('resvy_reservations_rejected_total', reason='unavailable')
+
+        self.assertEqual(self.reserve('22:00').status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.reserve('22:00').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.reserve('20:00', persons=10).status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.assertEqual(self.sample('resvy_reservations_created_total'), created + 1)
+        self.assertEqual(self.sample('resvy_reservations_rejected_total', reason='unavailable'), unavailable + 1)
+        self.assertEqual(self.sample('resvy_reservations_rejected_total', reason='table_size'), table_size + 1)
+
+    def test_bulk_rejections_are_counted_per_reservation(self, _):
+        table_size = self.sample('resvy_reservations_rejected_total', reason='table_size')
+        response = self.client.post(reverse('reservation-api-bulk'), [
+            {'table': self.table.pk, 'from_time': '18:00', 'to_time': '19:00', 'persons': 10},
+            {'table': self.table.pk, 'from_time': '20:00', 'to_time': '21:00', 'persons': 10},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.sample('resvy_reservations_rejected_total', reason='table_size'), table_size + 2)
+
+    def test_schedule_cache_lookups_are_counted(self, _):
+        hits = self.sample('resvy_cache_lookups_total', cache='schedules', result='hit')
+        misses = self.sample('resvy_cache_lookups_total', cache='schedules', result='miss')
+        url = reverse('tables-api-availability')
+        self.client.get(url, {'number_of_persons': 2})
+        self.client.get(url, {'number_of_persons': 2})
+        self.assertEqual(self.sample('resvy_cache_lookups_total', cache='schedules', result='miss'), misses + 1)
+        self.assertEqual(self.sample('resvy_cache_lookups_total', cache='schedules', result='hit'), hits + 1)
+
+    def test_metrics_endpoint(self, _):
+        self.client.get(reverse('tables-api-list'))
+        self.client.credentials()
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        self.assertIn(b'resvy_http_request_duration_seconds_bucket', response.content)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_endpoint_requires_the_token_when_set(self, _):
+        self.client.credentials()
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_multiprocess_registry(self, _):
+        self.assertIs(get_registry(), REGISTRY)
+        with tempfile.TemporaryDirectory() as directory, \
+                mock.patch.dict(os.environ, {'PROMETHEUS_MULTIPROC_DIR': directory}):
+            registry = get_registry()
+        self.assertIsInstance(registry, CollectorRegistry)
+        self.assertIsNot(registry, REGISTRY)
+
+
+class WorkingBackend(BaseHealthCheckBackend):
+    def check_status(self):
+        pass
+
+
+class FailingBackend(BaseHealthCheckBackend):
+    def check_status(self):
+        self.add_error('down')
+
+
+@override_settings(HEALTH_CHECK_BACKGROUND=True, HEALTH_CHECK_INTERVAL=0.01, HEALTH_CHECK_MAX_AGE=30)
+@mock.patch.object(plugin_dir, '_registry', [(WorkingBackend, {})])
+class HealthCheckTestCases(SimpleTestCase):
+    def setUp(self) -> None:
+        self.monitor = HealthMonitor()
+        for patcher in (mock.patch('resvy.health.monitor', self.monitor), mock.patch('health_check.backends.logger')):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(self.monitor.stop)
+
+    @staticmethod
+    def probe(view):
+        response = asyncio.run(view(RequestFactory().get('/')))
+        return response.status_code, json.loads(response.content)
+
+    def test_liveness(self):
+        self.assertEqual(self.probe(liveness_view), (status.HTTP_200_OK, {'status': 'alive'}))
+
+    def test_report_has_the_timings_of_every_check(self):
+        with mock.patch.object(plugin_dir, '_registry', [(WorkingBackend, {}), (FailingBackend, {})]):
+            report = run_checks()
+        self.assertFalse(report.healthy)
+        self.assertIn('down', report.checks['FailingBackend']['status'])
+        self.assertEqual(report.checks['WorkingBackend']['status'], 'working')
+        self.assertGreaterEqual(report.checks['WorkingBackend']['time_taken'], 0)
+
+    def test_readiness_serves_the_last_report(self):
+        self.monitor.report = run_checks()
+        with mock.patch('resvy.health.run_checks') as run:
+            self.monitor.start = mock.Mock()
+            status_code, data = self.probe(readiness_view)
+        run.assert_not_called()
+        self.assertEqual(status_code, status.HTTP_200_OK)
+        self.assertEqual(data['status'], 'ready')
+        self.assertLess(data['age'], 30)
+        self.assertIn('time_taken', data['checks']['WorkingBackend'])
+
+    def test_readiness_fails_on_unhealthy_stale_or_missing_report(self):
+        self.monitor.start = mock.Mock()
+        self.assertEqual(self.probe(readiness_view), (status.HTTP_503_SERVICE_UNAVAILABLE, {'status': 'starting'}))
+
+        with mock.patch.object(plugin_dir, '_registry', [(FailingBackend, {})]):
+            self.monitor.report = run_checks()
+        self.assertEqual(self.probe(readiness_view)[1]['status'], 'unhealthy')
+
+        self.monitor.report = run_checks()
+        self.monitor.report.monotonic -= 31
+        status_code, data = self.probe(readiness_view)
+        self.assertEqual((status_code, data['status']), (status.HTTP_503_SERVICE_UNAVAILABLE, 'stale'))
+
+    @override_settings(HEALTH_CHECK_BACKGROUND=False)
+    def test_readiness_runs_the_checks_without_background_mode(self):
+        with mock.patch.object(plugin_dir, '_registry', [(FailingBackend, {})]):
+            self.assertEqual(self.probe(readiness_view)[1]['status'], 'unhealthy')
+        self.assertIsNone(self.monitor.report)
+
+    def test_monitor_refreshes_the_report(self):
+        self.monitor.start()
+        self.monitor.start()
+        deadline = time.monotonic() + 5
+        while (self.monitor.report is None or self.monitor.report.age > 0.005) and time.monotonic() < deadline:
+            time.sleep(0.005)
+        self.assertTrue(self.monitor.running)
+        self.assertTrue(self.monitor.report.healthy)
+        self.monitor.stop()
+        self.assertFalse(self.monitor.running)
+
+    def test_monitor_keeps_the_last_report_when_the_checks_crash(self):
+        self.monitor.refresh()
+        report = self.monitor.report
+        with mock.patch('resvy.health.run_checks', side_effect=RuntimeError), self.assertLogs('resvy.health', 'ERROR'):
+            self.monitor.refresh()
+        self.assertIs(self.monitor.report, report)
+
+
+class ReservationQueryPlanTestCases(TestCase):
+    """
+    Make sure the hot reservation queries are served by the indexes on a production shaped dataset.
+    """
+    first_date = datetime.date(2030, 1, 1)
+
+    @classmethod
+    def setUpTestData(cls):
+        tables = Table.objects.bulk_create(
+            Table(number=number, number_of_seats=number % 12 + 1) for number in range(1, 401)
+        )
+        Reservation.objects.bulk_create(
+            (
+                Reservation(
+                    date=cls.first_date + datetime.timedelta(days=day),
+                    from_time=datetime.time(hour, 00),
+                    to_time=datetime.time(hour, 45),
+                    table=table,
+                    persons=2,
+                )
+                for table in tables[:40]
+                for day in range(90)
+                for hour in range(12, 24, 2)
+            ),
+            batch_size=5000,
+        )
+        cls.table = tables[0]
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE reservations_reservation, reservations_table')
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertNotIn('Seq Scan', plan)
+        self.assertIn(index_name, plan)
+
+    def test_loading_schedules_uses_table_date_index(self):
+        queryset = Reservation.objects.filter(
+            table_id__in=[self.table.pk], date__in=[self.first_date]
+        ).order_by('table_id', 'date', 'from_time').values_list('table_id', 'date', 'from_time', 'to_time')
+        self.assertUsesIndex(queryset, 'reservation_table_date_idx')
+
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 17, 00))
+    def test_table_upcoming_reservations_uses_table_date_index(self, _):
+        self.assertUsesIndex(self.table.reservations.today().upcoming(), 'reservation_table_date_idx')
+
+    @mock.patch.object(timezone, 'now', return_value=datetime.datetime(2030, 1, 1, 17, 00))
+    def test_today_upcoming_reservations_uses_date_index(self, _):
+        self.assertUsesIndex(Reservation.objects.today().upcoming(), 'reservation_date_time_idx')
+
+    def test_keyset_pagination_uses_date_index(self):
+        position = Row(models.Value(self.first_date), models.Value(datetime.time(18, 00)), models.Value(1))
+        queryset = Reservation.objects.filter(
+            GreaterThan(Row('date', 'from_time', 'id'), position)
+        ).order_by('date', 'from_time', 'id')[:100]
+        self.assertUsesIndex(queryset, 'reservation_date_time_idx')
@@ -1,9 +1,15 @@
+from django.urls import path
 from rest_framework import routers
 
+from .async_views import reservation_list, table_availability
 from .views import TableView, ReservationView
 
 router = routers.DefaultRouter()
 
 router.register('tables', TableView, basename='tables-api')
 router.register('reservations', ReservationView, basename='reservation-api')
-urlpatterns = router.urls
+urlpatterns = router.urls + [
+    # Native async read endpoints, same payload as their sync counterparts
+    path('async/tables/availability/', table_availability, name='tables-api-availability-async'),
+    path('async/reservations/', reservation_list, name='reservation-api-list-async'),
+]
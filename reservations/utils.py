@@ -1,5 +1,4 @@
 import functools
-import itertools
 
 from django.conf import settings
 from django.core.exceptions import ValidationError
@@ -27,40 +26,14 @@ def get_start_reservation_time(time):
     return time if is_time_during_working_hour(time) else settings.RESERVATION_STARTING_FROM_TIME
 
 
-def split_list_to_chunk(lst, chunk_size=2):
-    itr = iter(lst)
-    return iter(lambda: tuple(itertools.islice(itr, chunk_size)), ())
-
-
 def check_availability_for_table(table):
-    from reservations.models import Reservation
-    time = timezone.now().time()
-    start_time = get_start_reservation_time(time)
-    end_time = settings.RESERVATION_ENDS_AT_TIME
-
-    today_reservations = Reservation.objects.today().on_table(table).upcoming().values_list('from_time', 'to_time')
-    time_boundary = (start_time, end_time)
-
-    # Todo: handle below two edge cases in more propre way
-    if not today_reservations:
-        # Handle no reservation
-        return [(start_time, end_time)]
-
-    if today_reservations[0] == tuple(time_boundary):
-        # Handle one reservation for the whole day
-        return []
-
-    slot_entries = sorted(itertools.chain(time_boundary, *today_reservations))
-    return split_list_to_chunk(slot_entries)
+    from reservations.availability import check_availability_for_tables
+    return check_availability_for_tables([table])[table.pk]
 
 
 def get_fit_table_size(persons):
-    from reservations.models import Table
-
-    fit_table = Table.objects.filter(number_of_seats__gte=persons).distinct('number_of_seats')[:1]
-    if not fit_table:
-        return
-    return fit_table[0].number_of_seats
+    from reservations.catalog import get_table_catalog
+    return get_table_catalog().fit_table_size(persons)
 
 
 # Todo: move this function to app utils
@@ -1,49 +1,161 @@
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django_filters.rest_framework import DjangoFilterBackend
+from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema, OpenApiParameter
-from rest_framework import mixins, status, filters
+from rest_framework import exceptions, mixins, status, filters
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet
 
+from resvy import metrics
+from .availability import check_availability_for_dates, find_first_available, load_schedules
+from .catalog import get_table_catalog
+from .export import iter_row_batches, stream, to_csv, to_ndjson
+from .floor import find_walk_in_tables
 from .filters import ReservationDateFilter
 from .models import Table, Reservation
+from .pagination import ReservationKeysetPagination
 from .permissions import CanManageTables, CanManageReservation
-from .serializers import TableSerializer, ReservationSerializer, TableAvailabilitySerializer
-from .utils import get_fit_table_size, openapi_ready
+from .renderers import CSVRenderer, NDJSONRenderer
+from .row_serializers import ReservationRowSerializer, TableRowSerializer, table_availability_data
+from .serializers import (
+    AvailabilityDateRangeSerializer,
+    BulkReservationSerializer,
+    FirstAvailableQuerySerializer,
+    FirstAvailableSerializer,
+    ReservationSerializer,
+    TableAvailabilitySerializer,
+    TableSerializer,
+    WalkInQuerySerializer,
+    WalkInSerializer,
+)
+from .utils import openapi_ready
 
 
-class TableView(mixins.ListModelMixin, mixins.DestroyModelMixin, mixins.CreateModelMixin, GenericViewSet):
+# List through `row_serializer_class` from plain `values_list` rows instead of model instances
+class RowListModelMixin(mixins.ListModelMixin):
+    row_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        columns = self.row_serializer_class.get_columns()
+        queryset = self.filter_queryset(self.get_queryset()).values_list(*columns, named=True)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.row_serializer_class(page).data)
+        return Response(self.row_serializer_class(queryset).data)
+
+
+class TableView(RowListModelMixin, mixins.DestroyModelMixin, mixins.CreateModelMixin, GenericViewSet):
     serializer_class = TableSerializer
+    row_serializer_class = TableRowSerializer
     permission_classes = (IsAuthenticated, CanManageTables)
     queryset = Table.objects.all()
+    # 3 queries authenticate the user, availability then loads the catalog and the schedules of all its tables at once
+    # walk_in only runs the 3 authentication queries when served from the floor state
+    query_budgets = {'list': 5, 'create': 5, 'destroy': 7, 'availability': 5, 'first_available': 5, 'walk_in': 5}
 
-    @extend_schema(parameters=[OpenApiParameter(name="number_of_persons", required=True, type=int), ], )
+    @extend_schema(parameters=[
+        OpenApiParameter(name="number_of_persons", required=True, type=int),
+        OpenApiParameter(name="from_date", required=False, type=OpenApiTypes.DATE,
+                         description='First day to check, today by default'),
+        OpenApiParameter(name="to_date", required=False, type=OpenApiTypes.DATE,
+                         description='Last day to check, from_date by default'),
+    ], )
     @action(detail=False, url_name='availability', serializer_class=TableAvailabilitySerializer, )
     def availability(self, request: Request):
         number_of_persons = request.query_params.get('number_of_persons', 'invalid')
         if not number_of_persons.isdigit():
             return Response(_('Only digits are acceptable'), status=status.HTTP_400_BAD_REQUEST)
 
-        if not Table.objects.filter(number_of_seats__gte=number_of_persons).exists():
+        catalog = get_table_catalog()
+        fit_table_size = catalog.fit_table_size(int(number_of_persons))
+        if fit_table_size is None:
             return Response(_('There are no tables fit this number on one table'), status=status.HTTP_400_BAD_REQUEST)
 
-        fit_table_size = get_fit_table_size(number_of_persons)
-        tables = Table.objects.filter(number_of_seats=fit_table_size)
-        serializer = self.get_serializer(instance=tables, many=True)
+        date_range = AvailabilityDateRangeSerializer(data=request.query_params)
+        date_range.is_valid(raise_exception=True)
+        dates = date_range.validated_data['dates']
+
+        tables = catalog.get_tables(fit_table_size)
+        availability = check_availability_for_dates(tables, dates)
+
+        # One entry per table and day, ordered by day so each day is a contiguous block
+        data = []
+        for date in dates:
+            data.extend(table_availability_data(tables, date, availability[date]))
+        return Response(data)
+
+    @extend_schema(parameters=[FirstAvailableQuerySerializer], responses=FirstAvailableSerializer(many=True))
+    @action(detail=False, url_path='first-available', url_name='first-available',
+            serializer_class=FirstAvailableSerializer, )
+    def first_available(self, request: Request):
+        """
+        The best tables and earliest start times where a party can be seated for a given duration.
+        """
+        query = FirstAvailableQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+        date = params.get('date') or timezone.now().date()
+
+        tables = get_table_catalog().get_tables_for(params['number_of_persons'])
+        if not tables:
+            return Response(_('There are no tables fit this number on one table'), status=status.HTTP_400_BAD_REQUEST)
+
+        schedules = load_schedules([table.pk for table in tables], date, allow_stale=True)
+        candidates = find_first_available(
+            tables, schedules, date, params['duration'], params.get('earliest_time'), params['limit'],
+        )
+        serializer = self.get_serializer(instance=[
+            {'table': table, 'date': date, 'from_time': from_time, 'to_time': to_time}
+            for table, from_time, to_time in candidates
+        ], many=True)
+        return Response(serializer.data)
+
+    @extend_schema(parameters=[WalkInQuerySerializer], responses=WalkInSerializer(many=True))
+    @action(detail=False, url_path='walk-in', url_name='walk-in', serializer_class=WalkInSerializer, )
+    def walk_in(self, request: Request):
+        """
+        The tables free right now for a party walking in, and until when they stay free.
+        """
+        query = WalkInQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+        candidates = find_walk_in_tables(params['number_of_persons'], params['duration'], params['limit'])
+        serializer = self.get_serializer(instance=[
+            {'table': table, 'free_until': free_until} for table, free_until in candidates
+        ], many=True)
         return Response(serializer.data)
 
 
-class ReservationView(mixins.ListModelMixin, mixins.DestroyModelMixin, mixins.CreateModelMixin, GenericViewSet):
+class ReservationView(RowListModelMixin, mixins.DestroyModelMixin, mixins.CreateModelMixin, GenericViewSet):
     serializer_class = ReservationSerializer
+    row_serializer_class = ReservationRowSerializer
     queryset = Reservation.objects.all()
     permission_classes = (IsAuthenticated, CanManageReservation)
     filter_backends = [filters.OrderingFilter, DjangoFilterBackend]
     filter_class = ReservationDateFilter
     ordering_fields = ['from_time', 'to_time']
     ordering = ['from_time', ]
+    # Creating loads the tables, the catalog and the schedules once whatever the number of reservations,
+    # listing filtered by `table` checks that the table exists
+    query_budgets = {'list': 6, 'create': 9, 'bulk': 9, 'destroy': 5, 'export': 4}
+
+    @property
+    def paginator(self):
+        """
+        Limit/offset pagination by default, keyset pagination with `?pagination=cursor`.
+        """
+        if not hasattr(self, '_paginator'):
+            if self.request is not None and self.request.query_params.get('pagination') == 'cursor':
+                self._paginator = ReservationKeysetPagination()
+            else:
+                self._paginator = super().paginator
+        return self._paginator
 
     @openapi_ready
     def get_queryset(self):
@@ -52,6 +164,57 @@ class ReservationView(mixins.ListModelMixin, mixins.DestroyModelMixin, mixins.Cr
             queryset = Reservation.objects.all()
         return queryset
 
-    @extend_schema(parameters=[OpenApiParameter(name="all", required=False, type=bool, default=False), ], )
+    @extend_schema(parameters=[
+        OpenApiParameter(name="all", required=False, type=bool, default=False),
+        OpenApiParameter(name="pagination", required=False, type=str, enum=['offset', 'cursor'], default='offset',
+                         description='`cursor` pages by (date, from_time, id) with no count, follow `next`'),
+        OpenApiParameter(name="cursor", required=False, type=str),
+    ], )
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
+
+    def create(self, request, *args, **kwargs):
+        try:
+            response = super().create(request, *args, **kwargs)
+        except exceptions.APIException as error:
+            metrics.count_rejected_reservations(error)
+            raise
+        metrics.RESERVATIONS_CREATED.inc()
+        return response
+
+    @extend_schema(request=BulkReservationSerializer(many=True), responses=BulkReservationSerializer(many=True))
+    @action(detail=False, methods=['post'], url_name='bulk', serializer_class=BulkReservationSerializer, )
+    def bulk(self, request: Request):
+        serializer = self.get_serializer(
+            data=request.data, many=True, allow_empty=False, max_length=settings.BULK_RESERVATION_MAX_SIZE,
+        )
+        try:
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+        except exceptions.APIException as error:
+            metrics.count_rejected_reservations(error, many=True)
+            raise
+        metrics.RESERVATIONS_CREATED.inc(len(serializer.data))
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @extend_schema(parameters=[
+        OpenApiParameter(name="all", required=False, type=bool, default=False),
+        OpenApiParameter(name="format", required=False, type=str, enum=['ndjson', 'csv'], default='ndjson'),
+        OpenApiParameter(name="from_time", required=False, type=OpenApiTypes.DATE),
+        OpenApiParameter(name="to_time", required=False, type=OpenApiTypes.DATE),
+        OpenApiParameter(name="table", required=False, type=int),
+    ], responses={(200, NDJSONRenderer.media_type): OpenApiTypes.STR, (200, CSVRenderer.media_type): OpenApiTypes.STR})
+    @action(detail=False, url_name='export', renderer_classes=[NDJSONRenderer, CSVRenderer], )
+    def export(self, request: Request):
+        """
+        Stream every matching reservation ordered by date and time, as NDJSON or CSV.
+
+        Rows are read from one server-side cursor, so memory stays flat whatever the size of the export.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        batches = iter_row_batches(queryset, settings.RESERVATION_EXPORT_CHUNK_SIZE)
+        renderer = request.accepted_renderer
+        content = to_csv(batches) if renderer.format == CSVRenderer.format else to_ndjson(batches)
+        response = StreamingHttpResponse(stream(content), content_type=f'{renderer.media_type}; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="reservations.{renderer.format}"'
+        return response
@@ -9,8 +9,13 @@ https://docs.djangoproject.com/en/4.0/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'resvy.settings')
 
 application = get_asgi_application()
+
+if settings.HEALTH_CHECK_BACKGROUND:
+    from resvy.health import monitor
+    monitor.start()
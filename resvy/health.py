@@ -0,0 +1,141 @@
+"""
+Liveness and readiness probes served from the last result of the health checks.
+
+`v1/healthz/` runs every registered django-health-check plugin on each request. With `HEALTH_CHECK_BACKGROUND`
+the plugins run instead in a thread of each worker every `HEALTH_CHECK_INTERVAL` seconds, and the readiness probe
+only reads the last report, failing when it is older than `HEALTH_CHECK_MAX_AGE` seconds.
+"""
+import logging
+import threading
+import time
+
+import orjson
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils import timezone
+from health_check.mixins import CheckMixin
+from rest_framework import status
+
+logger = logging.getLogger(__name__)
+
+
+class HealthReport:
+    """
+    Outcome of one run of the health checks.
+    """
+
+    def __init__(self, plugins, errors, duration):
+        self.healthy = not errors
+        self.duration = duration
+        self.checked_at = timezone.now()
+        self.monotonic = time.monotonic()
+        self.checks = {
+            plugin.identifier(): {
+                'status': str(plugin.pretty_status()),
+                'critical': plugin.critical_service,
+                'time_taken': round(plugin.time_taken, 6),
+            }
+            for plugin in plugins
+        }
+
+    @property
+    def age(self):
+        return time.monotonic() - self.monotonic
+
+
+def run_checks():
+    """
+    Run every registered health check plugin concurrently.
+    """
+    started = time.perf_counter()
+    checker = CheckMixin()
+    errors = checker.run_check()
+    return HealthReport(checker.plugins, errors, time.perf_counter() - started)
+
+
+class HealthMonitor:
+    """
+    Refresh the health report of the process from a daemon thread.
+    """
+
+    def __init__(self):
+        self.report = None
+        self._thread = None
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """
+        Start the thread unless it runs already, again after a fork which does not carry threads over.
+        """
+        with self._lock:
+            if self.running:
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self.run, name='health-monitor', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def run(self):
+        while not self._stopped.is_set():
+            self.refresh()
+            self._stopped.wait(settings.HEALTH_CHECK_INTERVAL)
+
+    def refresh(self):
+        try:
+            self.report = run_checks()
+        except Exception:
+            # Keep the last report, it goes stale and fails the readiness probe if the checks keep crashing
+            logger.exception('Health checks failed to run')
+
+
+monitor = HealthMonitor()
+
+
+def render(data, status_code=status.HTTP_200_OK):
+    response = HttpResponse(orjson.dumps(data), status=status_code, content_type='application/json')
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+async def liveness_view(request):
+    """
+    Answer as long as the process serves requests, without touching any dependency.
+    """
+    return render({'status': 'alive'})
+
+
+async def readiness_view(request):
+    """
+    Report the last health checks, their staleness and timings; 503 when a critical check fails or is stale.
+    """
+    if settings.HEALTH_CHECK_BACKGROUND:
+        monitor.start()
+        report = monitor.report
+    else:
+        report = await sync_to_async(run_checks)()
+    if report is None:
+        return render({'status': 'starting'}, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    age = report.age
+    if age > settings.HEALTH_CHECK_MAX_AGE:
+        state = 'stale'
+    else:
+        state = 'ready' if report.healthy else 'unhealthy'
+    return render({
+        'status': state,
+        'checked_at': report.checked_at.isoformat(),
+        'age': round(age, 3),
+        'duration': round(report.duration, 6),
+        'checks': report.checks,
+    }, status.HTTP_200_OK if state == 'ready' else status.HTTP_503_SERVICE_UNAVAILABLE)
@@ -0,0 +1,118 @@
+"""
+Prometheus metrics of the application, exposed in text format by `metrics_view`.
+
+Under several worker processes set `PROMETHEUS_MULTIPROC_DIR` to an empty directory shared by the workers,
+each of them then writes its samples to mmapped files there and the view aggregates them.
+"""
+import asyncio
+import os
+import time
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client.multiprocess import MultiProcessCollector
+
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, float('inf'))
+
+REQUEST_DURATION = Histogram(
+    'resvy_http_request_duration_seconds', 'Duration of the HTTP requests', ('method', 'route', 'status'),
+)
+REQUEST_DB_DURATION = Histogram(
+    'resvy_http_request_db_duration_seconds', 'Time spent running SQL queries per HTTP request', ('route',),
+)
+REQUEST_QUERIES = Histogram(
+    'resvy_http_request_queries', 'Number of SQL queries per HTTP request', ('route',), buckets=QUERY_COUNT_BUCKETS,
+)
+CACHE_LOOKUPS = Counter('resvy_cache_lookups_total', 'Cache lookups by cache and result', ('cache', 'result'))
+RESERVATIONS_CREATED = Counter('resvy_reservations_created_total', 'Reservations created')
+RESERVATIONS_REJECTED = Counter('resvy_reservations_rejected_total', 'Reservations rejected by reason', ('reason',))
+
+
+def count_cache_lookups(cache, hits, misses):
+    if hits:
+        CACHE_LOOKUPS.labels(cache, 'hit').inc(hits)
+    if misses:
+        CACHE_LOOKUPS.labels(cache, 'miss').inc(misses)
+
+
+def first_code(codes):
+    """
+    Return the first error code of the nested `get_codes()` of a DRF error.
+    """
+    if isinstance(codes, dict):
+        codes = list(codes.values())
+    if isinstance(codes, list):
+        return next((code for code in map(first_code, codes) if code), None)
+    return codes
+
+
+def count_rejected_reservations(error, many=False):
+    """
+    Count the reservations rejected by the API `error`, one per failing item of a bulk request when `many`.
+    """
+    codes = error.get_codes()
+    items = codes if many and isinstance(codes, list) else [codes]
+    for item in items:
+        reason = first_code(item)
+        if reason:
+            RESERVATIONS_REJECTED.labels(reason).inc()
+
+
+def get_route(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else 'unresolved'
+
+
+class MetricsMiddleware:
+    """
+    Observe the duration of every request, and its SQL queries when `QueryBudgetMiddleware` recorded them.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        self.observe(request, response, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self.observe(request, response, time.perf_counter() - started)
+        return response
+
+    def observe(self, request, response, duration):
+        route = get_route(request)
+        REQUEST_DURATION.labels(request.method, route, response.status_code).observe(duration)
+        recorder = getattr(request, 'query_recorder', None)
+        if recorder is not None:
+            REQUEST_DB_DURATION.labels(route).observe(recorder.duration)
+            REQUEST_QUERIES.labels(route).observe(recorder.count)
+
+
+def get_registry():
+    if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    MultiProcessCollector(registry)
+    return registry
+
+
+def metrics_view(request):
+    """
+    Expose the metrics of all the workers in Prometheus text format, behind `METRICS_TOKEN` when it is set.
+    """
+    token = settings.METRICS_TOKEN
+    if token and not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponse(status=401)
+    return HttpResponse(generate_latest(get_registry()), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,137 @@
+"""
+Per-request SQL instrumentation.
+
+`QueryBudgetMiddleware` counts the queries of every request and the time spent running them, exposes both
+in the `Server-Timing` header and logs the requests running more queries than the budget of their view.
+Budgets are declared with `@query_budget(n)` on a view function or viewset action, or for a whole viewset
+with a `query_budgets = {action: n}` attribute.
+"""
+import asyncio
+import contextvars
+import logging
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+_recorder = contextvars.ContextVar('query_recorder', default=None)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+
+
+def record_query(execute, sql, params, many, context):
+    recorder = _recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def install_recorder(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def query_budget(budget):
+    """
+    Declare the largest number of queries a view function or viewset action is expected to run.
+    """
+
+    def decorator(view):
+        view.query_budget = budget
+        return view
+    return decorator
+
+
+def get_query_budget(request):
+    """
+    Return the query budget of the view which served `request`, None when it has none.
+    """
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return None
+    view_class = getattr(match.func, 'cls', None)
+    if view_class is None:
+        return getattr(match.func, 'query_budget', None)
+
+    # Viewsets map the HTTP method to an action, plain API views to the handler of the same name
+    action = (getattr(match.func, 'actions', None) or {}).get(request.method.lower(), request.method.lower())
+    budget = getattr(getattr(view_class, action, None), 'query_budget', None)
+    if budget is None:
+        budget = getattr(view_class, 'query_budgets', {}).get(action)
+    return budget
+
+
+class QueryBudgetMiddleware:
+    """
+    Put the number and duration of the queries of each request in its `Server-Timing` header.
+
+    The queries run while a streaming response is consumed happen after the headers are sent and are not counted.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+        connection_created.connect(install_recorder)
+        for connection in connections.all():
+            install_recorder(None, connection)
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        recorder = QueryRecorder()
+        token = _recorder.set(recorder)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        return self.process_response(request, response, recorder, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        recorder = QueryRecorder()
+        token = _recorder.set(recorder)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        return self.process_response(request, response, recorder, time.perf_counter() - started)
+
+    def process_response(self, request, response, recorder: QueryRecorder, duration):
+        request.query_recorder = recorder
+        if settings.SERVER_TIMING_ENABLED:
+            response['Server-Timing'] = (
+                f'db;desc="{recorder.count} queries";dur={recorder.duration * 1000:.3f}, '
+                f'total;dur={duration * 1000:.3f}'
+            )
+
+        budget = get_query_budget(request)
+        if budget is not None and recorder.count > budget:
+            message = (f'{request.method} {request.path} ran {recorder.count} queries, '
+                       f'over the budget of {budget} of its view')
+            if settings.QUERY_BUDGET_STRICT:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
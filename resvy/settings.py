@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.0/ref/settings/
 """
 import os
+import sys
 from datetime import timedelta
 from pathlib import Path
 
@@ -59,6 +60,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'resvy.metrics.MetricsMiddleware',
+    'resvy.query_budget.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -135,11 +138,19 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Build the request user from the token claims instead of loading it from the database
+STATELESS_JWT_AUTH = bool(int(os.environ.get('STATELESS_JWT_AUTH', 0)))
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.StatelessJWTAuthentication' if STATELESS_JWT_AUTH
+        else 'users.authentication.DenylistJWTAuthentication',
     ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
+    'DEFAULT_RENDERER_CLASSES': (
+        'reservations.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
     'DEFAULT_PERMISSION_CLASSES': (),
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'PAGE_SIZE': 100,
@@ -152,7 +163,8 @@ REST_FRAMEWORK = {
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=2),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
-    'UPDATE_LAST_LOGIN': True,
+    # Written by `users.last_login.record_login` instead, see LAST_LOGIN_FLUSH_INTERVAL
+    'UPDATE_LAST_LOGIN': False,
 
     'AUTH_HEADER_TYPES': ('Bearer',),
     'AUTH_HEADER_NAME': 'HTTP_AUTHORIZATION',
@@ -161,10 +173,12 @@ SIMPLE_JWT = {
     'USER_AUTHENTICATION_RULE': 'rest_framework_simplejwt.authentication.default_user_authentication_rule',
 
     "TOKEN_OBTAIN_SERIALIZER": "users.serializers.UserInfoTokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "users.serializers.DenylistTokenRefreshSerializer",
 }
 
 LOGIN_URL = '/v1/auth/login/'
 AUTH_USER_MODEL = 'users.User'
+AUTHENTICATION_BACKENDS = ['users.backends.CachedPermissionsBackend']
 
 REDIS_CACHE = {
     'BACKEND': 'django_redis.cache.RedisCache',
@@ -193,5 +207,49 @@ SPECTACULAR_SETTINGS = {
 
 RESERVATION_STARTING_FROM_TIME = parse_time(os.getenv('RESERVATION_STARTING_FROM_TIME', '12:00'))
 RESERVATION_ENDS_AT_TIME = parse_time(os.getenv('RESERVATION_ENDS_AT_TIME', '23:59'))
+# Largest number of reservations accepted by one bulk create request
+BULK_RESERVATION_MAX_SIZE = int(os.environ.get('BULK_RESERVATION_MAX_SIZE', 500))
+# Rows fetched per round trip by the reservation export
+RESERVATION_EXPORT_CHUNK_SIZE = int(os.environ.get('RESERVATION_EXPORT_CHUNK_SIZE', 2000))
+# Longest date range accepted by the availability endpoint
+AVAILABILITY_MAX_DAYS = int(os.environ.get('AVAILABILITY_MAX_DAYS', 31))
+
+# Where the table schedules are loaded from: SQLAvailabilityBackend queries them every time,
+# InMemoryAvailabilityBackend keeps them in each process and CachedAvailabilityBackend shares them in Redis
+AVAILABILITY_BACKEND = os.environ.get('AVAILABILITY_BACKEND', 'reservations.backends.CachedAvailabilityBackend')
+# Cached table schedules are invalidated on every reservation write, the timeout only bounds memory usage
+AVAILABILITY_CACHE_TIMEOUT = int(os.environ.get('AVAILABILITY_CACHE_TIMEOUT', 60 * 60 * 24))
+# Bump when the layout of cached schedules changes
+AVAILABILITY_CACHE_VERSION = 2
+# Only one worker rebuilds a missing schedule, the others wait for it up to AVAILABILITY_LOCK_WAIT seconds
+AVAILABILITY_LOCK_TIMEOUT = int(os.environ.get('AVAILABILITY_LOCK_TIMEOUT', 5))
+AVAILABILITY_LOCK_WAIT = float(os.environ.get('AVAILABILITY_LOCK_WAIT', 0.5))
+AVAILABILITY_LOCK_POLL_INTERVAL = 0.02
+# Keep today's free and occupied tables in Redis for the walk-in endpoint, requires the Redis cache
+FLOOR_STATE_ENABLED = bool(int(os.environ.get('FLOOR_STATE_ENABLED', 0)))
+
+# Cached roles and permissions of a user are invalidated on every membership change
+USER_ACCESS_CACHE_TIMEOUT = int(os.environ.get('USER_ACCESS_CACHE_TIMEOUT', 60 * 60 * 24))
+# Bump when the layout of cached roles and permissions changes
+USER_ACCESS_CACHE_VERSION = 2
+
+# Number and duration of the SQL queries of each request in its Server-Timing header
+SERVER_TIMING_ENABLED = bool(int(os.environ.get('SERVER_TIMING_ENABLED', 1)))
+# Raise instead of logging when a request runs more queries than the budget of its view
+QUERY_BUDGET_STRICT = bool(int(os.environ.get('QUERY_BUDGET_STRICT', 0)))
+# Bearer token required to scrape the Prometheus metrics, open when empty
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Run the health checks in a thread of each worker, the readiness probe then serves their last result
+HEALTH_CHECK_BACKGROUND = bool(int(os.environ.get('HEALTH_CHECK_BACKGROUND', 0)))
+# Seconds between two runs of the background health checks
+HEALTH_CHECK_INTERVAL = float(os.environ.get('HEALTH_CHECK_INTERVAL', 10))
+# Seconds after which the last result is stale and fails the readiness probe
+HEALTH_CHECK_MAX_AGE = float(os.environ.get('HEALTH_CHECK_MAX_AGE', 30))
+
+# Seconds the last_login updates are buffered in each worker and flushed together, 0 writes them during the login,
+# which the test runs default to so that no flushing thread outlives a test
+LAST_LOGIN_FLUSH_INTERVAL = float(os.environ.get('LAST_LOGIN_FLUSH_INTERVAL', 0 if sys.argv[1:2] == ['test'] else 2))
+LAST_LOGIN_FLUSH_BATCH_SIZE = 1000
 
 REDIS_CACHE.get('LOCATION', 'redis://redis:6379')
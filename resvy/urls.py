@@ -19,11 +19,16 @@ from django.urls import path, include
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView, TokenVerifyView
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 
+from resvy.health import liveness_view, readiness_view
+from resvy.metrics import metrics_view
+from users.views import LogoutView
+
 urlpatterns = [
 
     path('v1/auth/login/', TokenObtainPairView.as_view(), name='login'),
     path('v1/auth/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('v1/auth/token/verify/', TokenVerifyView.as_view(), name='verify-token'),
+    path('v1/auth/logout/', LogoutView.as_view(), name='logout'),
 
     path('v1/', include('users.urls'), name='users'),
     path('v1/', include('reservations.urls'), name='reservations'),
@@ -33,5 +38,8 @@ urlpatterns = [
     path('', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
 
     path('v1/healthz/', include('health_check.urls')),
+    path('v1/healthz/live/', liveness_view, name='liveness'),
+    path('v1/healthz/ready/', readiness_view, name='readiness'),
+    path('v1/metrics/', metrics_view, name='metrics'),
 
 ]
@@ -9,8 +9,13 @@ https://docs.djangoproject.com/en/4.0/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'resvy.settings')
 
 application = get_wsgi_application()
+
+if settings.HEALTH_CHECK_BACKGROUND:
+    from resvy.health import monitor
+    monitor.start()
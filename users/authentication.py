@@ -0,0 +1,90 @@
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+from users.cache import is_token_denied, is_token_revoked
+from users.models import Role
+
+PERMISSIONS_CLAIM = 'permissions'
+
+
+class ClaimsUser(TokenUser):
+    """
+    Request user built from the claims of a verified access token, without touching the database.
+
+    The role and permissions are the ones the user had when the token was issued.
+    """
+
+    def __str__(self):
+        return f'{self.employee_no}: {self.name}'
+
+    @cached_property
+    def employee_no(self):
+        return self.token.get('employee_no', '')
+
+    @cached_property
+    def role(self):
+        return (self.token.get('role') or {}).get('name')
+
+    @cached_property
+    def permissions(self):
+        return frozenset(self.token.get(PERMISSIONS_CLAIM, ()))
+
+    def get_username(self):
+        return self.employee_no
+
+    def get_roles(self):
+        return [self.role] if self.role else []
+
+    @property
+    def is_admin(self):
+        return self.role == Role.ADMIN
+
+    @property
+    def is_employee(self):
+        return self.role == Role.EMPLOYEE
+
+    def get_all_permissions(self, obj=None):
+        return set(self.permissions)
+
+    def has_perm(self, perm, obj=None):
+        return self.is_superuser or perm in self.permissions
+
+    def has_perms(self, perm_list, obj=None):
+        return all(self.has_perm(perm, obj) for perm in perm_list)
+
+    def has_module_perms(self, module):
+        return self.is_superuser or any(perm.startswith(f'{module}.') for perm in self.permissions)
+
+
+class DenylistJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication rejecting the tokens revoked through the denylist kept in cache.
+    """
+
+    def get_user(self, validated_token):
+        if is_token_denied(validated_token):
+            raise AuthenticationFailed(_('Token has been revoked'), code='token_revoked')
+        return super().get_user(validated_token)
+
+
+class StatelessJWTAuthentication(DenylistJWTAuthentication):
+    """
+    JWT authentication which trusts the claims of the token instead of loading the user row.
+
+    Tokens issued before the permissions claim was added fall back to the database lookup.
+    Claims go stale when the roles of a user change, so all the tokens issued to that user
+    before the change are rejected as well (see `users.signals`).
+    """
+
+    def get_user(self, validated_token):
+        if PERMISSIONS_CLAIM not in validated_token:
+            return super().get_user(validated_token)
+        if is_token_revoked(validated_token):
+            raise AuthenticationFailed(_('Token has been revoked'), code='token_revoked')
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+        return ClaimsUser(validated_token)
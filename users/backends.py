@@ -0,0 +1,19 @@
+from django.contrib.auth.backends import ModelBackend
+
+
+class CachedPermissionsBackend(ModelBackend):
+    """
+    Model backend resolving the permissions of a user from the access entry shared through the cache.
+
+    Django keeps the permissions on the user instance only, so without it every request
+    loads them again from the database.
+    """
+
+    def get_all_permissions(self, user_obj, obj=None):
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return set()
+        if not hasattr(user_obj, '_perm_cache'):
+            if user_obj.is_superuser or not hasattr(user_obj, 'get_access'):
+                return super().get_all_permissions(user_obj, obj)
+            user_obj._perm_cache = set(user_obj.get_access()['permissions'])
+        return user_obj._perm_cache
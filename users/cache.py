@@ -0,0 +1,121 @@
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework_simplejwt.settings import api_settings
+
+from resvy.metrics import count_cache_lookups
+
+DENYLIST_KEY_PREFIX = 'auth:denylist'
+REVOKED_BEFORE_KEY_PREFIX = 'auth:revoked-before'
+USER_ACCESS_KEY_PREFIX = 'users:access'
+USER_ACCESS_VERSION_KEY_PREFIX = 'users:access-version'
+
+
+def denylist_key(jti):
+    return f'{DENYLIST_KEY_PREFIX}:{jti}'
+
+
+def revoked_before_key(user_id):
+    return f'{REVOKED_BEFORE_KEY_PREFIX}:{user_id}'
+
+
+def user_access_key(user_id):
+    return f'{USER_ACCESS_KEY_PREFIX}:{user_id}'
+
+
+def user_access_version_key(user_id):
+    return f'{USER_ACCESS_VERSION_KEY_PREFIX}:{user_id}'
+
+
+def revoke_token(token):
+    """
+    Deny a single token until it expires by itself.
+    """
+    timeout = int(token['exp'] - time.time())
+    if timeout > 0:
+        cache.set(denylist_key(token[api_settings.JTI_CLAIM]), True, timeout=timeout)
+
+
+def revoke_user_tokens(user_ids):
+    """
+    Deny every token issued to the given users so far, forcing them to log in again.
+
+    Access tokens refreshed later keep the `iat` of their refresh token, so the entry
+    has to outlive both token lifetimes.
+    """
+    timeout = int(max(settings.SIMPLE_JWT['ACCESS_TOKEN_LIFETIME'],
+                      settings.SIMPLE_JWT['REFRESH_TOKEN_LIFETIME']).total_seconds())
+    revoked_before = int(time.time())
+    cache.set_many({revoked_before_key(user_id): revoked_before for user_id in user_ids}, timeout=timeout)
+
+
+def is_token_denied(token) -> bool:
+    """
+    Check if the token itself was revoked.
+    """
+    return cache.get(denylist_key(token.get(api_settings.JTI_CLAIM))) is not None
+
+
+def is_token_revoked(token) -> bool:
+    """
+    Check if the token itself or every token of its user issued so far was revoked.
+    """
+    jti_key = denylist_key(token.get(api_settings.JTI_CLAIM))
+    user_key = revoked_before_key(token.get(api_settings.USER_ID_CLAIM))
+    found = cache.get_many([jti_key, user_key])
+    return jti_key in found or token.get('iat', 0) < found.get(user_key, 0)
+
+
+def get_cached_user_access(user_id):
+    """
+    Return the cached {'roles': [...], 'permissions': [...]} of a user, None when it is not cached, and the current
+    version of its access, publishing one if there is none yet.
+
+    Access cached under an older version is a miss: it may have been loaded before the last invalidation.
+    """
+    access_key, version_key = user_access_key(user_id), user_access_version_key(user_id)
+    found = cache.get_many([access_key, version_key], version=settings.USER_ACCESS_CACHE_VERSION)
+    version = found.get(version_key)
+    if version is None:
+        cache.add(version_key, uuid.uuid4().hex, timeout=settings.USER_ACCESS_CACHE_TIMEOUT,
+                  version=settings.USER_ACCESS_CACHE_VERSION)
+        version = cache.get(version_key, version=settings.USER_ACCESS_CACHE_VERSION)
+    cached_version, access = found.get(access_key, (None, None))
+    if version is None or cached_version != version:
+        access = None
+    count_cache_lookups('user_access', access is not None, access is None)
+    return access, version
+
+
+def cache_user_access(user_id, access, version):
+    """
+    Cache the access of a user under the `version` read before loading it, nothing without a version.
+    """
+    if version is None:
+        return
+    cache.set(
+        user_access_key(user_id), (version, access),
+        timeout=settings.USER_ACCESS_CACHE_TIMEOUT,
+        version=settings.USER_ACCESS_CACHE_VERSION,
+    )
+
+
+def invalidate_user_access(user_ids):
+    """
+    Publish new access versions of the given users, right away and once more after commit.
+
+    Access loaded before the write was visible is cached under an older version and never served.
+    """
+    keys = [user_access_version_key(user_id) for user_id in set(user_ids)]
+    if not keys:
+        return
+
+    def invalidate():
+        cache.set_many({key: uuid.uuid4().hex for key in keys}, timeout=settings.USER_ACCESS_CACHE_TIMEOUT,
+                       version=settings.USER_ACCESS_CACHE_VERSION)
+
+    invalidate()
+    transaction.on_commit(invalidate)
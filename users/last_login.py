@@ -0,0 +1,94 @@
+"""
+Deferred `last_login` updates.
+
+Writing `last_login` during the login takes a row lock on the user, which serializes the logins at shift change.
+The logins are buffered in the process instead, one entry per user, and a daemon thread writes them every
+`LAST_LOGIN_FLUSH_INTERVAL` in a single bulk UPDATE. Up to one interval of logins is lost if the process dies.
+An interval of 0 writes them during the login again.
+"""
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.contrib.auth.models import update_last_login
+from django.db import DatabaseError, connections
+from django.utils import timezone
+
+from users.models import User
+
+logger = logging.getLogger(__name__)
+
+
+class LastLoginBuffer:
+    def __init__(self):
+        self.pending = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def add(self, user_id, logged_in_at):
+        with self._lock:
+            if user_id not in self.pending or self.pending[user_id] < logged_in_at:
+                self.pending[user_id] = logged_in_at
+
+    def start(self):
+        """
+        Start the flushing thread unless it runs already, again after a fork which does not carry threads over.
+        """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self.run, name='last-login-flush', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def run(self):
+        while not self._stopped.wait(settings.LAST_LOGIN_FLUSH_INTERVAL):
+            self.flush()
+            connections.close_all()
+
+    def flush(self):
+        """
+        Write the buffered logins, putting them back to retry on the next flush when the database fails.
+        """
+        with self._lock:
+            pending, self.pending = self.pending, {}
+        if not pending:
+            return 0
+        users = [User(pk=user_id, last_login=logged_in_at) for user_id, logged_in_at in sorted(pending.items())]
+        try:
+            User.objects.bulk_update(users, ['last_login'], batch_size=settings.LAST_LOGIN_FLUSH_BATCH_SIZE)
+        except DatabaseError:
+            logger.exception('Failed to update the last login of %d users', len(users))
+            for user_id, logged_in_at in pending.items():
+                self.add(user_id, logged_in_at)
+            return 0
+        return len(users)
+
+
+last_logins = LastLoginBuffer()
+
+
+def record_login(user: User):
+    """
+    Update the last login of `user`, in the buffer when the updates are deferred.
+    """
+    if not settings.LAST_LOGIN_FLUSH_INTERVAL:
+        update_last_login(None, user)
+        return
+    user.last_login = timezone.now()
+    last_logins.add(user.pk, user.last_login)
+    last_logins.start()
+
+
+@atexit.register
+def flush_on_exit():
+    if settings.LAST_LOGIN_FLUSH_INTERVAL:
+        last_logins.flush()
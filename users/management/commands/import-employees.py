@@ -0,0 +1,83 @@
+import csv
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+
+from users.models import Role, User
+from users.serializers import CreateEmployeeSerializer
+
+CSV_FIELDS = ('employee_no', 'first_name', 'last_name', 'password')
+
+
+def hash_passwords(passwords, workers):
+    """
+    Hash the passwords with the configured hasher, spread over `workers` processes.
+    """
+    if workers <= 1:
+        return [make_password(password) for password in passwords]
+    with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as executor:
+        return list(executor.map(make_password, passwords, chunksize=max(1, len(passwords) // (workers * 4))))
+
+
+class Command(BaseCommand):
+    help = 'Command to create employees in bulk from a CSV file with the columns: ' + ', '.join(CSV_FIELDS)
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file', type=str)
+        parser.add_argument('--role', type=str, default=Role.EMPLOYEE, choices=(Role.EMPLOYEE, Role.ADMIN))
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help='Number of processes hashing the passwords')
+
+    def read_rows(self, path):
+        try:
+            with open(path, newline='', encoding='utf-8') as csv_file:
+                reader = csv.DictReader(csv_file)
+                missing = set(CSV_FIELDS) - set(reader.fieldnames or ())
+                if missing:
+                    raise CommandError(f'Missing columns: {", ".join(sorted(missing))}')
+                return [{field: row[field] for field in CSV_FIELDS} for row in reader]
+        except OSError as e:
+            raise CommandError(e)
+
+    def validate_rows(self, rows):
+        errors = {}
+        seen = set()
+        for line, row in enumerate(rows, start=2):
+            serializer = CreateEmployeeSerializer(data=row)
+            if not serializer.is_valid():
+                errors[line] = serializer.errors
+            elif row['employee_no'] in seen:
+                errors[line] = {'employee_no': ['Duplicated in the file.']}
+            seen.add(row['employee_no'])
+        if errors:
+            messages = [f'Line {line}: {self.format_errors(line_errors)}' for line, line_errors in errors.items()]
+            raise CommandError('\n'.join(messages))
+
+    @staticmethod
+    def format_errors(errors):
+        return '; '.join(f'{field}: {" ".join(map(str, messages))}' for field, messages in errors.items())
+
+    def handle(self, *args, **options):
+        rows = self.read_rows(options['csv_file'])
+        if not rows:
+            raise CommandError('No employees to import')
+        self.validate_rows(rows)
+
+        passwords = hash_passwords([row.pop('password') for row in rows], options['workers'])
+        users = [User(password=password, **row) for row, password in zip(rows, passwords)]
+        role_id = Role.get_id(options['role'])
+
+        try:
+            with transaction.atomic():
+                users = User.objects.bulk_create(users)
+                User.groups.through.objects.bulk_create([
+                    User.groups.through(user_id=user.pk, group_id=role_id) for user in users
+                ])
+        except IntegrityError as e:
+            raise CommandError(e)
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully imported {len(users)} employees as {options["role"]}'))
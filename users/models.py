@@ -1,11 +1,12 @@
 from django.contrib.auth.base_user import BaseUserManager
-from django.contrib.auth.models import AbstractUser, Group
-from django.core.cache import cache
+from django.contrib.auth.models import AbstractUser, Group, Permission
 from django.core.validators import MinLengthValidator
 from django.db import models
-from django.utils.functional import cached_property
+from django.db.models import Q
 from django.utils.translation import gettext_lazy as _
 
+_role_ids = {}
+
 
 class UserManager(BaseUserManager):
     """
@@ -62,20 +63,35 @@ class User(AbstractUser):
     def __str__(self):
         return f'{self.employee_no}: {self.first_name} {self.last_name}'
 
+    def get_access(self):
+        """
+        Return the {'roles': [...], 'permissions': [...]} of the user, shared through the cache by every worker.
+        """
+        from users.cache import cache_user_access, get_cached_user_access
+        if not hasattr(self, '_access'):
+            access, version = get_cached_user_access(self.pk)
+            if access is None:
+                permissions = Permission.objects.filter(Q(user=self) | Q(group__user=self)).values_list(
+                    'content_type__app_label', 'codename'
+                ).distinct()
+                access = {
+                    'roles': list(self.groups.order_by('pk').values_list('name', flat=True)),
+                    'permissions': sorted(f'{app_label}.{codename}' for app_label, codename in permissions),
+                }
+                cache_user_access(self.pk, access, version)
+            self._access = access
+        return self._access
+
     def get_roles(self):
-        roles = cache.get(self.employee_no)
-        if not roles:
-            roles = list(self.groups.all().values_list('name', flat=True))
-            cache.set(self.employee_no, roles)
-        return roles
+        return self.get_access()['roles']
 
-    @cached_property
+    @property
     def is_admin(self):
-        return self.groups.filter(name=Role.ADMIN).exists()
+        return Role.ADMIN in self.get_roles()
 
-    @cached_property
+    @property
     def is_employee(self):
-        return self.groups.filter(name=Role.EMPLOYEE).exists()
+        return Role.EMPLOYEE in self.get_roles()
 
 
 class Role(Group):
@@ -84,3 +100,18 @@ class Role(Group):
 
     class Meta:
         proxy = True
+
+    @classmethod
+    def get_id(cls, name):
+        """
+        Return the id of the role called `name` from a map held by this process.
+        """
+        if name not in _role_ids:
+            _role_ids.update(cls.objects.values_list('name', 'pk'))
+        if name not in _role_ids:
+            raise cls.DoesNotExist(f'Role {name} does not exist')
+        return _role_ids[name]
+
+    @classmethod
+    def clear_ids(cls):
+        _role_ids.clear()
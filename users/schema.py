@@ -0,0 +1,10 @@
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme, TokenRefreshSerializerExtension
+
+
+class DenylistJWTScheme(SimpleJWTScheme):
+    target_class = 'users.authentication.DenylistJWTAuthentication'
+    match_subclasses = True
+
+
+class DenylistTokenRefreshSerializerExtension(TokenRefreshSerializerExtension):
+    target_class = 'users.serializers.DenylistTokenRefreshSerializer'
@@ -2,9 +2,15 @@ from django.contrib.auth.password_validation import validate_password
 from django.db import transaction
 from django.utils.translation import gettext_lazy as _
 
+from drf_spectacular.utils import extend_schema_serializer
 from rest_framework import serializers
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.tokens import RefreshToken
 
+from users.authentication import PERMISSIONS_CLAIM
+from users.cache import is_token_revoked, revoke_token
+from users.last_login import record_login
 from users.models import User, Role
 
 
@@ -38,8 +44,7 @@ class CreateEmployeeSerializer(serializers.ModelSerializer):
     @transaction.atomic
     def create(cls, validated_data):
         user: User = User.objects.create_user(**validated_data)
-        employee_group = Role.objects.get(name=Role.EMPLOYEE)
-        user.groups.add(employee_group)
+        user.groups.add(Role.get_id(Role.EMPLOYEE))
         return user
 
 
@@ -64,10 +69,19 @@ class UserInfoSerializer(serializers.ModelSerializer):
 
     @classmethod
     def get_role(cls, user: User):
-        return RoleSerializer(instance=user.groups.last()).data
+        # Same role as `user.groups.last()`, from the cached access of the user
+        roles = user.get_roles()
+        if not roles:
+            return RoleSerializer(instance=None).data
+        return {'id': Role.get_id(roles[-1]), 'name': roles[-1]}
 
 
 class UserInfoTokenObtainPairSerializer(TokenObtainPairSerializer):
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        record_login(self.user)
+        return data
+
     @classmethod
     def get_token(cls, user):
         token = super().get_token(user)
@@ -75,5 +89,36 @@ class UserInfoTokenObtainPairSerializer(TokenObtainPairSerializer):
         # Add custom claims
         for k, v in UserInfoSerializer(user).data.items():
             token[k] = v
+        # Lets `StatelessJWTAuthentication` authorize requests without loading the user
+        token['is_superuser'] = user.is_superuser
+        token[PERMISSIONS_CLAIM] = sorted(user.get_all_permissions())
 
         return token
+
+
+@extend_schema_serializer(component_name='TokenRefresh')
+class DenylistTokenRefreshSerializer(TokenRefreshSerializer):
+    def validate(self, attrs):
+        try:
+            refresh = RefreshToken(attrs['refresh'])
+        except TokenError as e:
+            raise InvalidToken(e.args[0])
+        if is_token_revoked(refresh):
+            raise InvalidToken(_('Token has been revoked'))
+        return super().validate(attrs)
+
+
+class LogoutSerializer(serializers.Serializer):
+    refresh = serializers.CharField(required=False)
+
+    @classmethod
+    def validate_refresh(cls, refresh):
+        try:
+            return RefreshToken(refresh)
+        except TokenError as e:
+            raise serializers.ValidationError(e.args[0])
+
+    def save(self, **kwargs):
+        revoke_token(self.context['request'].auth)
+        if 'refresh' in self.validated_data:
+            revoke_token(self.validated_data['refresh'])
@@ -0,0 +1,64 @@
+from django.contrib.auth.models import Group
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from users.cache import invalidate_user_access, revoke_user_tokens
+from users.models import Role, User
+
+
+def access_changed(user_ids):
+    # Tokens carry the roles and permissions they were issued with, and so does the cache
+    user_ids = list(user_ids)
+    invalidate_user_access(user_ids)
+    revoke_user_tokens(user_ids)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def user_permissions_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        instance.__dict__.pop('_access', None)
+        access_changed([instance.pk])
+    elif action == 'pre_clear':
+        access_changed(instance.user_set.values_list('pk', flat=True))
+    else:
+        access_changed(pk_set)
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def group_permissions_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        groups = [instance]
+    elif action == 'pre_clear':
+        groups = instance.group_set.all()
+    else:
+        groups = pk_set
+    access_changed(User.objects.filter(groups__in=groups).values_list('pk', flat=True).distinct())
+
+
+@receiver(pre_delete, sender=Group)
+@receiver(pre_delete, sender=Role)
+def group_deleted(sender, instance, **kwargs):
+    access_changed(instance.user_set.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=Role)
+def clear_role_ids(sender, **kwargs):
+    Role.clear_ids()
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance: User, created, update_fields, **kwargs):
+    if created or (update_fields and not {'is_active', 'is_superuser'} & set(update_fields)):
+        return
+    # Superuser and active flags decide permissions too
+    invalidate_user_access([instance.pk])
+    if not instance.is_active:
+        revoke_user_tokens([instance.pk])
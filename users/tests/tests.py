@@ -1,8 +1,30 @@
+import csv
+import datetime
+import importlib.util
+import io
+import os
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
 from faker import Faker
+from prometheus_client import REGISTRY
 from rest_framework import status
 from rest_framework.reverse import reverse
 from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
 
+from users.authentication import ClaimsUser, StatelessJWTAuthentication
+from users.cache import cache_user_access
+from users.last_login import LastLoginBuffer
 from users.models import User, Role
 from users.tests.factories import UserWithTokenFactory, UserFactory
 
@@ -103,3 +125,368 @@ class UserTestCases(APITestCase):
         resp = self.client.post(self.login_url, data=data)
         self.assertEqual(resp.status_code, status.HTTP_200_OK)
         # TODO: inspect response payload
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_logout_revokes_access_token(self):
+        cache.clear()
+        user = UserWithTokenFactory()
+        user.groups.add(Role.objects.get(name=Role.ADMIN))
+        self.client.credentials(**user.credentials)
+        resp = self.client.post(reverse('logout'))
+        self.assertEqual(resp.status_code, status.HTTP_204_NO_CONTENT)
+        resp = self.client.post(reverse('logout'))
+        self.assertEqual(resp.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class QueryBudgetTestCases(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_user = UserWithTokenFactory()
+        cls.admin_user.groups.add(Role.objects.get(name=Role.ADMIN))
+
+    def setUp(self) -> None:
+        self.client.credentials(**self.admin_user.credentials)
+
+    def test_create_employee_within_budget(self):
+        resp = self.client.post(reverse('user-register'), data={
+            'employee_no': '4321', 'first_name': 'Omar', 'last_name': 'Alomari', 'password': 'A23BA123',
+        })
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        self.assertIn('queries', resp['Server-Timing'])
+
+    def test_logout_within_budget(self):
+        resp = self.client.post(reverse('logout'))
+        self.assertEqual(resp.status_code, status.HTTP_204_NO_CONTENT)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class UserAccessCacheTestCases(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_user = UserWithTokenFactory()
+        cls.admin_user.groups.add(Role.objects.get(name=Role.ADMIN))
+        cls.employee = UserWithTokenFactory()
+        cls.employee.groups.add(Role.objects.get(name=Role.EMPLOYEE))
+
+    def setUp(self) -> None:
+        cache.clear()
+        Role.clear_ids()
+
+    @staticmethod
+    def _role_queries(queries):
+        return [query for query in queries if 'auth_group' in query['sql'] or 'auth_permission' in query['sql']]
+
+    def test_roles_and_permissions_are_shared_between_instances(self):
+        user = User.objects.get(pk=self.employee.pk)
+        self.assertEqual(user.get_roles(), [Role.EMPLOYEE])
+        self.assertTrue(user.has_perm('reservations.can_manage_reservation'))
+
+        user = User.objects.get(pk=self.employee.pk)
+        with self.assertNumQueries(0):
+            self.assertTrue(user.is_employee)
+            self.assertFalse(user.is_admin)
+            self.assertTrue(user.has_perm('reservations.can_manage_reservation'))
+            self.assertFalse(user.has_perm('reservations.can_manage_tables'))
+        self.assertEqual(user.get_all_permissions(), User.objects.get(pk=self.employee.pk).get_all_permissions())
+
+    def test_authenticated_requests_resolve_permissions_from_cache(self):
+        self.client.credentials(**self.admin_user.credentials)
+        self.client.get(reverse('reservation-api-list') + '?all=true')
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.get(reverse('reservation-api-list') + '?all=true')
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertFalse(self._role_queries(queries))
+
+    def test_group_membership_change_invalidates_cached_roles(self):
+        self.assertFalse(User.objects.get(pk=self.employee.pk).is_admin)
+        self.employee.groups.add(Role.objects.get(name=Role.ADMIN))
+        user = User.objects.get(pk=self.employee.pk)
+        self.assertTrue(user.is_admin)
+        self.assertTrue(user.has_perm('reservations.can_manage_tables'))
+
+        user.groups.remove(Role.objects.get(name=Role.ADMIN))
+        self.assertFalse(user.is_admin)
+        self.assertFalse(User.objects.get(pk=self.employee.pk).has_perm('reservations.can_manage_tables'))
+
+    def test_invalidation_while_loading_is_not_overwritten(self):
+        admin_role = Role.objects.get(name=Role.ADMIN)
+        self.employee.groups.add(admin_role)
+
+        def revoke_then_cache(user_id, access, version):
+            # The role is removed after the access was read from the database, before it is cached
+            self.employee.groups.remove(admin_role)
+            cache_user_access(user_id, access, version)
+
+        with mock.patch('users.cache.cache_user_access', side_effect=revoke_then_cache):
+            self.assertTrue(User.objects.get(pk=self.employee.pk).is_admin)
+        self.assertFalse(User.objects.get(pk=self.employee.pk).is_admin)
+
+    def test_group_permission_change_invalidates_cached_permissions(self):
+        self.assertFalse(User.objects.get(pk=self.employee.pk).has_perm('users.can_add_employee'))
+        Role.objects.get(name=Role.EMPLOYEE).permissions.add(Permission.objects.get(codename='can_add_employee'))
+        self.assertTrue(User.objects.get(pk=self.employee.pk).has_perm('users.can_add_employee'))
+
+    def test_role_ids_are_held_in_process(self):
+        self.assertEqual(Role.get_id(Role.EMPLOYEE), Role.objects.get(name=Role.EMPLOYEE).pk)
+        with self.assertNumQueries(0):
+            Role.get_id(Role.ADMIN)
+        with self.assertRaises(Role.DoesNotExist):
+            Role.get_id('unknown')
+
+    def test_lookups_are_counted(self):
+        def lookups(result):
+            labels = {'cache': 'user_access', 'result': result}
+            return REGISTRY.get_sample_value('resvy_cache_lookups_total', labels) or 0
+
+        hits, misses = lookups('hit'), lookups('miss')
+        User.objects.get(pk=self.employee.pk).get_roles()
+        User.objects.get(pk=self.employee.pk).get_roles()
+        self.assertEqual((lookups('hit'), lookups('miss')), (hits + 1, misses + 1))
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+@mock.patch('rest_framework.views.APIView.authentication_classes', [StatelessJWTAuthentication])
+class StatelessAuthenticationTestCases(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_user = UserWithTokenFactory()
+        cls.admin_user.groups.add(Role.objects.get(name=Role.ADMIN))
+        cls.employee = UserWithTokenFactory()
+        cls.employee.groups.add(Role.objects.get(name=Role.EMPLOYEE))
+        cls.list_reservation_url = reverse('reservation-api-list')
+
+    def setUp(self) -> None:
+        cache.clear()
+
+    @staticmethod
+    def load_settings(**environ):
+        spec = importlib.util.find_spec('resvy.settings')
+        module = importlib.util.module_from_spec(spec)
+        with mock.patch.dict(os.environ, environ):
+            spec.loader.exec_module(module)
+        return module
+
+    def test_enabled_by_setting_to_one_only(self):
+        for value, enabled in (('0', False), ('1', True)):
+            module = self.load_settings(STATELESS_JWT_AUTH=value)
+            self.assertIs(module.STATELESS_JWT_AUTH, enabled)
+            self.assertEqual(module.REST_FRAMEWORK['DEFAULT_AUTHENTICATION_CLASSES'], (
+                'users.authentication.StatelessJWTAuthentication' if enabled
+                else 'users.authentication.DenylistJWTAuthentication',
+            ))
+
+    def login(self, user):
+        resp = self.client.post(reverse('login'), data={'employee_no': user.employee_no, 'password': 'password'})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        tokens = resp.json()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens["access"]}')
+        return tokens
+
+    @staticmethod
+    def _auth_queries(queries):
+        return [query for query in queries if 'auth_' in query['sql']]
+
+    def test_claims_authentication_does_not_query_users(self):
+        self.login(self.admin_user)
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.get(self.list_reservation_url + '?all=true')
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertFalse(self._auth_queries(queries))
+
+    def test_claims_user_permissions_and_role(self):
+        self.login(self.employee)
+        resp = self.client.get(self.list_reservation_url)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        user = resp.wsgi_request.user
+        self.assertIsInstance(user, ClaimsUser)
+        self.assertEqual(user.id, self.employee.id)
+        self.assertEqual(user.employee_no, self.employee.employee_no)
+        self.assertTrue(user.is_employee)
+        self.assertFalse(user.is_admin)
+        self.assertEqual(user.get_all_permissions(), self.employee.get_all_permissions())
+
+        resp = self.client.get(reverse('tables-api-list'))
+        self.assertEqual(resp.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_token_without_permissions_claim_falls_back_to_database(self):
+        self.client.credentials(**self.admin_user.credentials)
+        resp = self.client.get(self.list_reservation_url)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertIsInstance(resp.wsgi_request.user, User)
+
+    def test_logout_revokes_access_and_refresh_tokens(self):
+        tokens = self.login(self.admin_user)
+        resp = self.client.post(reverse('logout'), data={'refresh': tokens['refresh']})
+        self.assertEqual(resp.status_code, status.HTTP_204_NO_CONTENT)
+
+        resp = self.client.get(self.list_reservation_url)
+        self.assertEqual(resp.status_code, status.HTTP_401_UNAUTHORIZED)
+        resp = self.client.post(reverse('token_refresh'), data={'refresh': tokens['refresh']})
+        self.assertEqual(resp.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_logout_with_invalid_refresh_token_will_fail(self):
+        self.login(self.admin_user)
+        resp = self.client.post(reverse('logout'), data={'refresh': 'invalid'})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        resp = self.client.get(self.list_reservation_url)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+
+    def test_changing_roles_revokes_issued_tokens(self):
+        tokens = self.login(self.employee)
+        with mock.patch('users.cache.time.time', return_value=time.time() + 5):
+            self.employee.groups.add(Role.objects.get(name=Role.ADMIN))
+        resp = self.client.get(self.list_reservation_url)
+        self.assertEqual(resp.status_code, status.HTTP_401_UNAUTHORIZED)
+        resp = self.client.post(reverse('token_refresh'), data={'refresh': tokens['refresh']})
+        self.assertEqual(resp.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivating_user_revokes_issued_tokens(self):
+        self.login(self.employee)
+        with mock.patch('users.cache.time.time', return_value=time.time() + 5):
+            self.employee.is_active = False
+            self.employee.save()
+        resp = self.client.get(self.list_reservation_url)
+        self.assertEqual(resp.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class LastLoginTestCases(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_user = UserFactory()
+        cls.admin_user.groups.add(Role.objects.get(name=Role.ADMIN))
+        cls.employee = UserFactory()
+        cls.employee.groups.add(Role.objects.get(name=Role.EMPLOYEE))
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.buffer = LastLoginBuffer()
+        patcher = mock.patch('users.last_login.last_logins', self.buffer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.buffer.stop)
+
+    def login(self, user):
+        resp = self.client.post(reverse('login'), data={'employee_no': user.employee_no, 'password': 'password'})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        return resp.json()
+
+    def last_login(self, user):
+        return User.objects.get(pk=user.pk).last_login
+
+    @override_settings(LAST_LOGIN_FLUSH_INTERVAL=0)
+    def test_last_login_is_written_during_the_login_without_interval(self):
+        self.login(self.employee)
+        self.assertIsNotNone(self.last_login(self.employee))
+        self.assertFalse(self.buffer.pending)
+
+    @override_settings(LAST_LOGIN_FLUSH_INTERVAL=60)
+    def test_deferred_login_runs_a_single_read(self):
+        self.buffer.start = mock.Mock()
+        self.login(self.admin_user)
+        with CaptureQueriesContext(connection) as queries:
+            self.login(self.admin_user)
+        self.assertEqual(len(queries), 1)
+        self.assertTrue(queries[0]['sql'].startswith('SELECT'))
+        self.assertIsNone(self.last_login(self.admin_user))
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.buffer.flush(), 1)
+        self.assertIsNotNone(self.last_login(self.admin_user))
+        self.assertEqual(self.buffer.flush(), 0)
+
+    def test_logins_are_coalesced_per_user(self):
+        now = timezone.now()
+        self.buffer.add(self.employee.pk, now)
+        self.buffer.add(self.employee.pk, now - datetime.timedelta(minutes=1))
+        self.buffer.add(self.admin_user.pk, now - datetime.timedelta(minutes=1))
+        self.assertEqual(self.buffer.flush(), 2)
+        self.assertEqual(self.last_login(self.employee), now)
+        self.assertEqual(self.last_login(self.admin_user), now - datetime.timedelta(minutes=1))
+
+    def test_failed_flush_keeps_the_logins(self):
+        now = timezone.now()
+        self.buffer.add(self.employee.pk, now)
+        with mock.patch.object(User.objects, 'bulk_update', side_effect=DatabaseError), \
+                self.assertLogs('users.last_login', 'ERROR'):
+            self.assertEqual(self.buffer.flush(), 0)
+        self.assertEqual(self.buffer.pending, {self.employee.pk: now})
+
+    @override_settings(LAST_LOGIN_FLUSH_INTERVAL=0.01)
+    def test_thread_flushes_the_buffer(self):
+        flushed = threading.Event()
+        with mock.patch.object(self.buffer, 'flush', side_effect=flushed.set):
+            self.buffer.start()
+            self.buffer.start()
+            self.assertTrue(flushed.wait(5))
+        self.buffer.stop()
+
+    def test_role_claim_is_the_last_group_of_the_user(self):
+        self.employee.groups.add(Role.objects.get(name=Role.ADMIN))
+        for user in (self.employee, self.admin_user, UserFactory()):
+            token = AccessToken(self.login(user)['access'])
+            group = user.groups.last()
+            self.assertEqual(token['role'], {'id': group.pk, 'name': group.name} if group else {'name': ''})
+
+
+class ImportEmployeesCommandTestCases(TestCase):
+    def write_csv(self, rows, fields=('employee_no', 'first_name', 'last_name', 'password')):
+        csv_file = tempfile.NamedTemporaryFile('w', suffix='.csv', newline='', delete=False)
+        self.addCleanup(os.remove, csv_file.name)
+        with csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(fields)
+            writer.writerows(rows)
+        return csv_file.name
+
+    def import_employees(self, rows, *args):
+        out = io.StringIO()
+        call_command('import-employees', self.write_csv(rows), *args, stdout=out)
+        return out.getvalue()
+
+    def test_import_employees_success(self):
+        out = self.import_employees([
+            ('1001', 'Omar', 'Alomari', 'A23BA123'),
+            ('1002', 'Sara', 'Ali', 'B45CD678'),
+            ('1003', 'Huda', 'Saleh', 'C67EF890'),
+        ], '--workers', '2')
+        self.assertIn('Successfully imported 3 employees', out)
+
+        user = User.objects.get(employee_no='1002')
+        self.assertEqual((user.first_name, user.last_name), ('Sara', 'Ali'))
+        self.assertTrue(user.check_password('B45CD678'))
+        self.assertEqual(user.get_roles(), [Role.EMPLOYEE])
+        self.assertEqual(User.objects.filter(groups__name=Role.EMPLOYEE, employee_no__startswith='100').count(), 3)
+
+    def test_import_admins(self):
+        self.import_employees([('2001', 'Omar', 'Alomari', 'A23BA123')], '--role', Role.ADMIN, '--workers', '1')
+        self.assertTrue(User.objects.get(employee_no='2001').is_admin)
+
+    def test_invalid_rows_import_nothing(self):
+        existing = UserFactory()
+        rows = [
+            ('3001', 'Omar', 'Alomari', 'A23BA123'),
+            ('30a2', 'Sara', 'Ali', 'B45CD678'),
+            ('30033', 'Huda', 'Saleh', 'C67EF890'),
+            ('3004', 'Huda', 'Saleh', '123'),
+            (existing.employee_no, 'Ali', 'Omar', 'D89GH012'),
+            ('3001', 'Omar', 'Alomari', 'A23BA123'),
+        ]
+        with self.assertRaises(CommandError) as error:
+            self.import_employees(rows, '--workers', '1')
+        message = str(error.exception)
+        for line in range(3, 8):
+            self.assertIn(f'Line {line}:', message)
+        self.assertIn('Line 3: employee_no: Only digits are allowed', message)
+        self.assertIn('Line 7: employee_no: Duplicated in the file.', message)
+        self.assertNotIn('Line 2:', message)
+        self.assertFalse(User.objects.filter(employee_no__startswith='300').exists())
+
+    def test_missing_columns_will_fail(self):
+        with self.assertRaises(CommandError):
+            call_command('import-employees', self.write_csv([('4001', 'Omar')], fields=('employee_no', 'first_name')))
+
+    def test_missing_file_will_fail(self):
+        with self.assertRaises(CommandError):
+            call_command('import-employees', '/nonexistent/employees.csv')
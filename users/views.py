@@ -1,10 +1,13 @@
-from rest_framework.generics import CreateAPIView
+from drf_spectacular.utils import extend_schema
+from rest_framework import status
+from rest_framework.generics import CreateAPIView, GenericAPIView
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
 
 
 from .models import User
 from .permissions import CanAddEmployee
-from .serializers import CreateEmployeeSerializer
+from .serializers import CreateEmployeeSerializer, LogoutSerializer
 
 
 class CreateEmployeeView(CreateAPIView):
@@ -12,3 +15,20 @@ class CreateEmployeeView(CreateAPIView):
     permission_classes = (IsAuthenticated, CanAddEmployee, )
     serializer_class = CreateEmployeeSerializer
     queryset = User.objects.none()
+    query_budgets = {'post': 10}
+
+
+class LogoutView(GenericAPIView):
+    permission_classes = (IsAuthenticated, )
+    serializer_class = LogoutSerializer
+    query_budgets = {'post': 1}
+
+    @extend_schema(responses={status.HTTP_204_NO_CONTENT: None})
+    def post(self, request):
+        """
+        Revoke the access token of the request and the given refresh token.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(status=status.HTTP_204_NO_CONTENT)